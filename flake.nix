@@ -69,10 +69,9 @@
           pkgs.ffmpeg
           pkgs.git
           pkgs.gource
-          pkgs.xvfb-run
-          pkgs.bash
+          pkgs.xorg.xorgserver
           pkgs.coreutils
-          pkgs.curl
+          pkgs.util-linux
         ];
 
         envisaged-cli = pkgs.writeShellApplication {
@@ -185,7 +184,7 @@
           shellHook = ''
             unset PYTHONPATH
             echo "Envisaged dev shell"
-            echo "Commands: uv run envisaged --help | uv run envisaged-web | ruff check . | pyright"
+            echo "Commands: uv run envisaged --help | uv run envisaged-web | ruff check . | pyright | uv run pytest"
           '';
         };
       }
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+from collections.abc import Sequence
+
+log = logging.getLogger(__name__)
+_warned_taskset = False
+
+
+def available_cpus() -> list[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_list(text: str) -> tuple[int, ...]:
+    """Parse a taskset-style list such as ``0-3,8,10-11``."""
+    cpus: set[int] = set()
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        lo, sep, hi = part.partition("-")
+        if not lo.isdigit() or (sep and not hi.isdigit()):
+            raise ValueError(f"Invalid CPU list entry: {part!r}")
+        start, end = int(lo), int(hi) if sep else int(lo)
+        if end < start:
+            raise ValueError(f"Invalid CPU range: {part!r}")
+        cpus.update(range(start, end + 1))
+    if not cpus:
+        raise ValueError("Empty CPU list")
+    return tuple(sorted(cpus))
+
+
+def format_cpu_list(cpus: Sequence[int]) -> str:
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+def pinned_argv(argv: list[str], cpus: Sequence[int] | None) -> tuple[list[str], bool]:
+    # taskset pins before exec, so every thread the child starts inherits the
+    # set; without it the caller falls back to sched_setaffinity on the pid.
+    if not cpus:
+        return argv, True
+    taskset = shutil.which("taskset")
+    if taskset is None:
+        global _warned_taskset
+        if not _warned_taskset:
+            _warned_taskset = True
+            log.warning(
+                "taskset not found; pinning to CPUs %s after exec, so threads the "
+                "child starts first may run elsewhere (install util-linux)",
+                format_cpu_list(cpus),
+            )
+        return argv, False
+    return [taskset, "-c", format_cpu_list(cpus), *argv], True
+
+
+def set_affinity(pid: int, cpus: Sequence[int]) -> None:
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(pid, cpus)
+
+
+def encoder_threads(cpus: Sequence[int]) -> int:
+    return max(1, len(cpus))
+
+
+def gource_gl_threads(cpus: Sequence[int]) -> int:
+    # Gource itself is single-threaded; under Xvfb its GL is llvmpipe, which
+    # would otherwise start one rasterizer thread per host core.
+    return max(1, len(cpus) // 2)
+
+
+class CoreAllocator:
+    """Hands concurrent renders disjoint core sets from this host's usable CPUs.
+
+    Each render gets at least ``len(cpus) // slots`` cores, so ``slots``
+    concurrent renders cover the host between them; a render known to be
+    running alone is better left unpinned. Sets are contiguous runs of the
+    least-loaded cores; once every core is taken, new renders share the
+    least-loaded ones. Sets pinned by other processes on the host are passed
+    in as ``busy``.
+    """
+
+    def __init__(self, cpus: Sequence[int] | None = None, *, slots: int = 1) -> None:
+        self.cpus = list(cpus) if cpus else available_cpus()
+        self.slots = max(1, slots)
+        self._load = dict.fromkeys(self.cpus, 0)
+        self._owned: dict[str, tuple[int, ...]] = {}
+
+    def allocate(
+        self, key: str, wanted: int = 0, busy: Sequence[Sequence[int]] = ()
+    ) -> tuple[int, ...]:
+        self.release(key)
+        count = min(max(wanted, len(self.cpus) // self.slots, 1), len(self.cpus))
+        loads = dict(self._load)
+        for cpus in busy:
+            for cpu in cpus:
+                if cpu in loads:
+                    loads[cpu] += 1
+        best: tuple[int, int] | None = None
+        for start in range(len(self.cpus) - count + 1):
+            load = sum(loads[cpu] for cpu in self.cpus[start : start + count])
+            if best is None or load < best[0]:
+                best = (load, start)
+        assert best is not None
+        picked = tuple(self.cpus[best[1] : best[1] + count])
+        for cpu in picked:
+            self._load[cpu] += 1
+        self._owned[key] = picked
+        return picked
+
+    def release(self, key: str) -> None:
+        for cpu in self._owned.pop(key, ()):
+            self._load[cpu] -= 1
+
+    def owned(self, key: str) -> tuple[int, ...] | None:
+        return self._owned.get(key)
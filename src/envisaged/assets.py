@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+from .paths import CACHE_DIR
+
+ASSETS_DIR = CACHE_DIR / "assets"
+BLOBS_DIR = ASSETS_DIR / "blobs"
+URLS_DIR = ASSETS_DIR / "urls"
+SCALED_DIR = ASSETS_DIR / "scaled"
+HTTP_TIMEOUT = 30.0
+MAX_ASSET_BYTES = 32 * 2**20
+# Logos are overlaid at an eighth of the output height.
+LOGO_HEIGHT_DIVISOR = 8
+
+
+class AssetError(RuntimeError):
+    pass
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _write_once(path: Path, data: bytes) -> None:
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    part = path.with_name(f".{path.name}.{uuid4().hex[:8]}.part")
+    part.write_bytes(data)
+    os.replace(part, path)
+
+
+def _load_meta(path: Path) -> dict[str, Any]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _fetch_url(url: str) -> Path:
+    meta_path = URLS_DIR / f"{_sha256(url.encode('utf-8'))[:32]}.json"
+    meta = _load_meta(meta_path)
+    cached = BLOBS_DIR / meta["sha256"] if meta.get("sha256") else None
+    if cached is not None and not cached.is_file():
+        cached, meta = None, {}
+
+    request = urllib.request.Request(url, headers={"User-Agent": "envisaged"})
+    if cached is not None:
+        if meta.get("etag"):
+            request.add_header("If-None-Match", meta["etag"])
+        if meta.get("last_modified"):
+            request.add_header("If-Modified-Since", meta["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            data = response.read(MAX_ASSET_BYTES + 1)
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and cached is not None:
+            return cached
+        raise AssetError(f"Cannot fetch {url}: HTTP {exc.code}") from exc
+    except (urllib.error.URLError, OSError) as exc:
+        # Offline or unreachable: the last good copy is still the asset.
+        if cached is not None:
+            return cached
+        raise AssetError(f"Cannot fetch {url}: {exc}") from exc
+    if len(data) > MAX_ASSET_BYTES:
+        raise AssetError(f"{url} is larger than {MAX_ASSET_BYTES // 2**20} MB")
+
+    digest = _sha256(data)
+    blob = BLOBS_DIR / digest
+    _write_once(blob, data)
+    meta = {
+        "url": url,
+        "sha256": digest,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_at": time.time(),
+    }
+    with contextlib.suppress(OSError):
+        URLS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = meta_path.with_name(f".{meta_path.name}.{uuid4().hex[:8]}.part")
+        tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        os.replace(tmp, meta_path)
+    return blob
+
+
+def fetch_asset(ref: str) -> Path:
+    """Resolve an http(s) URL, ``file://`` URL or local path to a local file.
+
+    URLs are downloaded once into a content-addressed store and revalidated
+    with ETag/Last-Modified on later uses; local files are used in place.
+    """
+    parsed = urllib.parse.urlparse(ref)
+    if parsed.scheme in {"http", "https"}:
+        return _fetch_url(ref)
+    if parsed.scheme == "file":
+        if parsed.netloc not in {"", "localhost"}:
+            raise AssetError(f"Unsupported file URL host: {ref}")
+        path = Path(urllib.request.url2pathname(parsed.path))
+    else:
+        path = Path(ref).expanduser()
+    path = path.resolve()
+    if not path.is_file():
+        raise AssetError(f"Logo not found: {path}")
+    return path
+
+
+def asset_digest(path: Path) -> str:
+    if path.parent == BLOBS_DIR:
+        return path.name
+    try:
+        return _sha256(path.read_bytes())
+    except OSError as exc:
+        raise AssetError(f"Cannot read {path}: {exc}") from exc
+
+
+def logo_height(frame_height: int) -> int:
+    return max(1, frame_height // LOGO_HEIGHT_DIVISOR)
+
+
+def scaled_logo_path(digest: str, frame_height: int) -> Path:
+    return SCALED_DIR / f"{digest}-h{logo_height(frame_height)}.png"
+
+
+def scale_logo_cmd(source: Path, frame_height: int, out: Path) -> list[str]:
+    return [
+        "ffmpeg",
+        "-y",
+        "-i",
+        str(source),
+        "-vf",
+        f"scale=-1:{logo_height(frame_height)}",
+        "-frames:v",
+        "1",
+        "-f",
+        "image2",
+        "-c:v",
+        "png",
+        str(out),
+    ]
@@ -0,0 +1,400 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import tempfile
+import time
+import tomllib
+from dataclasses import dataclass, fields, replace
+from pathlib import Path
+from typing import Any
+
+import typer
+from rich.table import Table
+
+from .affinity import CoreAllocator
+from .cli import (
+    ALLOWED_FPS,
+    RESOLUTION_MAP,
+    OutputVariant,
+    PreparedLogs,
+    RenderConfig,
+    console,
+    prepare_logs,
+    render_async,
+    resolve_sync_timing,
+)
+from .pacing import DEFAULT_AUTO_SKIP, DEFAULT_SECONDS_PER_DAY, DEFAULT_TIME_SCALE
+from .supervisor import Supervisor
+from .templates import DEFAULT_TEMPLATE, TEMPLATES
+
+batch_app = typer.Typer(add_completion=False, rich_markup_mode="rich")
+
+DEFAULT_OUTPUT_PATTERN = "{source}-{template}-{resolution}.mp4"
+
+# Mirrors the single-render CLI defaults so a manifest only lists what differs.
+RENDER_DEFAULTS: dict[str, Any] = {
+    "resolution": "1080p",
+    "fps": 60,
+    "title": "{source}",
+    "template": DEFAULT_TEMPLATE,
+    "logo": None,
+    "system_log_since": "24 hours ago",
+    "system_log_limit": 5000,
+    "sync_timing": "auto",
+    "sync_span": 31536000,
+    "legend": "auto",
+    "legend_limit": 8,
+    "seconds_per_day": DEFAULT_SECONDS_PER_DAY,
+    "time_scale": DEFAULT_TIME_SCALE,
+    "user_scale": 1.35,
+    "auto_skip": DEFAULT_AUTO_SKIP,
+    "crf": 22,
+    "preset": "medium",
+}
+
+SOURCE_KEYS = {"repo", "multi_dir", "system_log"}
+RENDER_KEYS = {f.name for f in fields(RenderConfig)} - {
+    "output",
+    "input_repo",
+    "multi_dir",
+    "system_log",
+    "variants",
+    "cpus",
+}
+PATH_KEYS = {"job_dir"}
+
+
+@dataclass
+class BatchItem:
+    source: str
+    config: RenderConfig
+    log_key: tuple[Any, ...]
+    fanout_key: tuple[Any, ...] | None = None
+    status: str = "pending"
+    error: str | None = None
+    log_seconds: float = 0.0
+    render_seconds: float = 0.0
+
+
+def _format(value: Any, context: dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        return value.format(**context)
+    return value
+
+
+def log_key(config: RenderConfig) -> tuple[Any, ...]:
+    # Everything prepare_logs() reads; renders that agree on these share one log.
+    sync_timing = resolve_sync_timing(config)
+    return (
+        config.input_repo,
+        str(config.multi_dir) if config.multi_dir else None,
+        config.multi_depth if config.multi_dir else None,
+        tuple(config.multi_ignore) if config.multi_dir else None,
+        config.system_log,
+        config.system_log_since if config.system_log else None,
+        config.system_log_limit if config.system_log else None,
+        sync_timing,
+        config.sync_span if sync_timing in {"true", "smart"} else None,
+        config.sync_mapping if sync_timing in {"true", "smart"} else None,
+    )
+
+
+def fanout_key(config: RenderConfig) -> tuple[Any, ...] | None:
+    # Renders that agree on everything except output, resolution and template
+    # can share one Gource run (see --variant).
+    if config.segments > 1 or (config.template == "split-quad" and config.multi_dir):
+        return None
+    return (
+        log_key(config),
+        config.fps,
+        config.title,
+        config.logo,
+        config.legend,
+        config.legend_limit,
+        config.seconds_per_day,
+        config.time_scale,
+        config.user_scale,
+        config.auto_skip,
+        config.crf,
+        config.preset,
+        config.target_duration,
+        config.target_tolerance,
+        config.timeout,
+        config.master,
+        config.master_rescale,
+        config.transport,
+        config.relation_signals,
+    )
+
+
+def group_items(items: list[BatchItem], *, fan_out: bool) -> list[list[BatchItem]]:
+    groups: dict[Any, list[BatchItem]] = {}
+    for n, item in enumerate(items):
+        key = item.fanout_key if fan_out and item.fanout_key is not None else n
+        groups.setdefault(key, []).append(item)
+    return list(groups.values())
+
+
+def expand_manifest(manifest: dict[str, Any], base_dir: Path) -> list[BatchItem]:
+    settings = manifest.get("batch", {})
+    output_dir = (base_dir / Path(settings.get("output_dir", ".")).expanduser()).resolve()
+    output_pattern = settings.get("output", DEFAULT_OUTPUT_PATTERN)
+    defaults = {**RENDER_DEFAULTS, **manifest.get("defaults", {})}
+    matrix: dict[str, list[Any]] = manifest.get("matrix", {})
+    sources: list[dict[str, Any]] = manifest.get("sources", [])
+
+    if not sources:
+        raise typer.BadParameter("Manifest has no [[sources]] entries")
+    for key, values in matrix.items():
+        if key not in RENDER_KEYS:
+            raise typer.BadParameter(f"Unsupported matrix key: {key}")
+        if not isinstance(values, list) or not values:
+            raise typer.BadParameter(f"Matrix key {key} must be a non-empty list")
+    for key in defaults:
+        if key not in RENDER_KEYS:
+            raise typer.BadParameter(f"Unsupported defaults key: {key}")
+
+    items: list[BatchItem] = []
+    seen_outputs: set[Path] = set()
+    combos = [
+        dict(zip(matrix, values, strict=True)) for values in itertools.product(*matrix.values())
+    ]
+
+    for idx, source in enumerate(sources, start=1):
+        name = str(source.get("name") or f"source-{idx}")
+        kinds = SOURCE_KEYS & source.keys()
+        if len(kinds) != 1:
+            raise typer.BadParameter(
+                f"Source {name} needs exactly one of: repo, multi_dir, system_log"
+            )
+        overrides = {k: v for k, v in source.items() if k not in SOURCE_KEYS | {"name"}}
+        for key in overrides:
+            if key not in RENDER_KEYS:
+                raise typer.BadParameter(f"Unsupported key in source {name}: {key}")
+
+        for combo in combos or [{}]:
+            values = {**defaults, **overrides, **combo}
+            context = {"source": name, **values}
+            values = {k: _format(v, context) for k, v in values.items()}
+            for key in PATH_KEYS & values.keys():
+                if values[key] is not None:
+                    values[key] = Path(values[key]).expanduser()
+            if "multi_ignore" in values:
+                values["multi_ignore"] = tuple(values["multi_ignore"])
+
+            if values["template"] not in TEMPLATES:
+                raise typer.BadParameter(f"Unsupported template: {values['template']}")
+            if values["resolution"] not in RESOLUTION_MAP:
+                raise typer.BadParameter(f"Unsupported resolution: {values['resolution']}")
+            if values["fps"] not in ALLOWED_FPS:
+                raise typer.BadParameter("Unsupported fps (supported: 25, 30, 60)")
+
+            output = output_dir / output_pattern.format(**context)
+            if output in seen_outputs:
+                raise typer.BadParameter(f"Duplicate output path in matrix: {output}")
+            seen_outputs.add(output)
+
+            multi_dir = source.get("multi_dir")
+            repo = source.get("repo")
+            if repo and not str(repo).startswith(("http://", "https://", "git@")):
+                repo = str((base_dir / Path(repo).expanduser()).resolve())
+            config = RenderConfig(
+                output=output,
+                multi_dir=(base_dir / Path(multi_dir).expanduser()).resolve()
+                if multi_dir
+                else None,
+                input_repo=repo,
+                system_log=source.get("system_log"),
+                **values,
+            )
+            items.append(
+                BatchItem(
+                    source=name,
+                    config=config,
+                    log_key=log_key(config),
+                    fanout_key=fanout_key(config),
+                )
+            )
+
+    return items
+
+
+class BatchRunner:
+    """Collects each distinct log once, then renders on a bounded worker pool."""
+
+    def __init__(
+        self,
+        items: list[BatchItem],
+        *,
+        workers: int,
+        echo_stderr: bool,
+        fan_out: bool = True,
+    ) -> None:
+        self.items = items
+        self.groups = group_items(items, fan_out=fan_out)
+        self.workers = workers
+        self.echo_stderr = echo_stderr
+        # Concurrent renders get disjoint core sets instead of each encoder
+        # sizing itself for the whole host; a lone render keeps every core.
+        slots = min(workers, len(self.groups))
+        self.cores = CoreAllocator(slots=slots) if slots > 1 else None
+        self._log_tasks: dict[tuple[Any, ...], asyncio.Task[tuple[PreparedLogs, float]]] = {}
+
+    async def run(self, workdir: Path) -> None:
+        log_slots = asyncio.Semaphore(self.workers)
+        render_slots = asyncio.Semaphore(self.workers)
+
+        for n, item in enumerate(self.items):
+            if item.log_key not in self._log_tasks:
+                log_dir = workdir / f"log-{n}"
+                self._log_tasks[item.log_key] = asyncio.create_task(
+                    self._collect(item, log_dir, log_slots)
+                )
+
+        await asyncio.gather(*(self._render(group, render_slots) for group in self.groups))
+
+    async def _collect(
+        self, item: BatchItem, log_dir: Path, slots: asyncio.Semaphore
+    ) -> tuple[PreparedLogs, float]:
+        async with slots:
+            log_dir.mkdir(parents=True, exist_ok=True)
+            started = time.monotonic()
+            supervisor = Supervisor(echo_stderr=self.echo_stderr)
+            logs = await supervisor.run_in_thread(
+                prepare_logs, item.config, log_dir, resolve_sync_timing(item.config)
+            )
+            return logs, time.monotonic() - started
+
+    async def _render(self, group: list[BatchItem], slots: asyncio.Semaphore) -> None:
+        # The largest output drives the Gource run; the rest ride along as variants.
+        primary = max(group, key=lambda item: RESOLUTION_MAP[item.config.resolution])
+        config = replace(
+            primary.config,
+            variants=[
+                OutputVariant(item.config.output, item.config.resolution, item.config.template)
+                for item in group
+                if item is not primary
+            ],
+        )
+        try:
+            logs, log_seconds = await self._log_tasks[primary.log_key]
+        except Exception as exc:
+            for item in group:
+                item.status = "error"
+                item.error = f"log collection failed: {exc}"
+            return
+
+        async with slots:
+            for item in group:
+                item.status = "running"
+                item.log_seconds = log_seconds
+            config.output.parent.mkdir(parents=True, exist_ok=True)
+            started = time.monotonic()
+            status, error = "done", None
+            key = str(config.output)
+            if self.cores is not None:
+                config = replace(config, cpus=self.cores.allocate(key))
+            try:
+                await render_async(config, echo_stderr=self.echo_stderr, logs=logs)
+            except Exception as exc:
+                status, error = "error", str(exc)
+            finally:
+                if self.cores is not None:
+                    self.cores.release(key)
+            elapsed = time.monotonic() - started
+            for item in group:
+                item.status = status
+                item.error = error
+                item.render_seconds = elapsed
+
+
+def print_summary(items: list[BatchItem], wall_seconds: float, *, gource_runs: int) -> None:
+    table = Table(title="Batch summary")
+    table.add_column("Output")
+    table.add_column("Status")
+    table.add_column("Log (s)", justify="right")
+    table.add_column("Render (s)", justify="right")
+    table.add_column("Error")
+    for item in items:
+        style = "green" if item.status == "done" else "red"
+        table.add_row(
+            str(item.config.output.name),
+            f"[{style}]{item.status}[/{style}]",
+            f"{item.log_seconds:.1f}",
+            f"{item.render_seconds:.1f}",
+            (item.error or "").splitlines()[0] if item.error else "",
+        )
+    console.print(table)
+    failed = sum(1 for item in items if item.status != "done")
+    logs = len({item.log_key for item in items})
+    console.print(
+        f"{len(items) - failed}/{len(items)} renders succeeded from {logs} shared log(s) "
+        f"and {gource_runs} Gource run(s) in {wall_seconds:.1f}s"
+    )
+
+
+def write_report(path: Path, items: list[BatchItem], wall_seconds: float) -> None:
+    report = {
+        "wall_seconds": round(wall_seconds, 3),
+        "renders": [
+            {
+                "source": item.source,
+                "output": str(item.config.output),
+                "template": item.config.template,
+                "resolution": item.config.resolution,
+                "status": item.status,
+                "error": item.error,
+                "log_seconds": round(item.log_seconds, 3),
+                "render_seconds": round(item.render_seconds, 3),
+            }
+            for item in items
+        ],
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+@batch_app.command()
+def batch(
+    manifest: Path = typer.Argument(..., help="Batch manifest (TOML)"),
+    workers: int | None = typer.Option(None, "--workers", "-j"),
+    report: Path | None = typer.Option(None, "--report"),
+    fan_out: bool | None = typer.Option(None, "--fan-out/--no-fan-out"),
+    dry_run: bool = typer.Option(False, "--dry-run"),
+    verbose: bool = typer.Option(False, "--verbose", "-v"),
+) -> None:
+    """Expand a manifest into a render matrix and run it with shared logs."""
+    try:
+        data = tomllib.loads(manifest.read_text(encoding="utf-8"))
+    except (OSError, tomllib.TOMLDecodeError) as exc:
+        raise typer.BadParameter(f"Cannot read manifest {manifest}: {exc}") from exc
+
+    items = expand_manifest(data, manifest.resolve().parent)
+    settings = data.get("batch", {})
+    pool = workers or int(settings.get("workers", 1))
+    if pool < 1:
+        raise typer.BadParameter("--workers must be >= 1")
+    if fan_out is None:
+        fan_out = bool(settings.get("fan_out", True))
+
+    runner = BatchRunner(items, workers=pool, echo_stderr=verbose, fan_out=fan_out)
+    console.print(
+        f"Batch: {len(items)} render(s), {len({i.log_key for i in items})} log collection(s), "
+        f"{len(runner.groups)} Gource run(s), {pool} worker(s)"
+    )
+    if dry_run:
+        for item in items:
+            console.print(f"- {item.config.output} ({item.source}, {item.config.template})")
+        return
+
+    started = time.monotonic()
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        asyncio.run(runner.run(Path(tmp)))
+    wall = time.monotonic() - started
+
+    print_summary(items, wall, gource_runs=len(runner.groups))
+    if report:
+        write_report(report, items, wall)
+    if any(item.status != "done" for item in items):
+        raise typer.Exit(code=1)
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import IO, BinaryIO
+
+from .logtable import LogTable, StringPool, np
+
+MAGIC = b"ENVLOG\x00\x01"
+VERSION = 1
+DEFAULT_STRIDE = 4096
+WRITE_CHUNK_RECORDS = 1 << 16
+
+_HEADER = struct.Struct("<8sIIQQ")  # magic, version, stride, records, trailer offset
+_RECORD = struct.Struct("<qBII")  # timestamp, action, user id, path id
+_INDEX = struct.Struct("<qQ")  # timestamp, record number
+_U32 = struct.Struct("<I")
+
+_RECORD_DTYPE = (
+    np.dtype([("ts", "<i8"), ("action", "u1"), ("user", "<u4"), ("path", "<u4")])
+    if np is not None
+    else None
+)
+
+
+class BinaryLogError(ValueError):
+    pass
+
+
+def _native(typecode: str, raw: bytes) -> array:
+    out = array(typecode)
+    out.frombytes(raw)
+    if sys.byteorder == "big":
+        out.byteswap()
+    return out
+
+
+def _write_strings(fh: BinaryIO, values: list[str]) -> None:
+    fh.write(_U32.pack(len(values)))
+    for value in values:
+        raw = value.encode("utf-8", errors="surrogateescape")
+        fh.write(_U32.pack(len(raw)))
+        fh.write(raw)
+
+
+def _read_strings(fh: BinaryIO) -> StringPool:
+    pool = StringPool()
+    (count,) = _U32.unpack(fh.read(_U32.size))
+    for _ in range(count):
+        (size,) = _U32.unpack(fh.read(_U32.size))
+        pool.intern(fh.read(size).decode("utf-8", errors="surrogateescape"))
+    return pool
+
+
+def _encode_records(table: LogTable, lo: int, hi: int) -> bytes:
+    if np is not None and _RECORD_DTYPE is not None:
+        rec = np.empty(hi - lo, dtype=_RECORD_DTYPE)
+        rec["ts"] = table.column("timestamps")[lo:hi]
+        rec["action"] = table.column("actions")[lo:hi]
+        rec["user"] = table.column("users")[lo:hi]
+        rec["path"] = table.column("paths")[lo:hi]
+        return rec.tobytes()
+    pack = _RECORD.pack
+    return b"".join(
+        pack(table.timestamps[i], table.actions[i], table.users[i], table.paths[i])
+        for i in range(lo, hi)
+    )
+
+
+class BinaryLog:
+    """Sidecar for a Gource custom log: fixed-width records plus a trailer.
+
+    Layout: a 32-byte header, ``records`` 17-byte rows (int64 timestamp,
+    action byte, user id, path id) sorted by time, then a trailer holding the
+    user and path string tables and a sparse index with the timestamp of every
+    ``stride``-th record. Time windows are located with a bisect over the index
+    and one short read, so slicing never scans the whole file.
+
+    The text log stays the source of truth; appends rewrite only the trailer
+    and are not crash-safe.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as fh:
+            head = fh.read(_HEADER.size)
+            if len(head) != _HEADER.size:
+                raise BinaryLogError(f"Truncated binary log: {path}")
+            magic, version, self.stride, self.records, self.trailer = _HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise BinaryLogError(f"Not a v{VERSION} binary log: {path}")
+            fh.seek(self.trailer)
+            self.user_pool = _read_strings(fh)
+            self.path_pool = _read_strings(fh)
+            (entries,) = _U32.unpack(fh.read(_U32.size))
+            raw = fh.read(entries * _INDEX.size)
+        self.index = [_INDEX.unpack_from(raw, i * _INDEX.size) for i in range(entries)]
+        self._index_ts = [ts for ts, _ in self.index]
+
+    def __len__(self) -> int:
+        return self.records
+
+    @classmethod
+    def write(cls, path: Path, table: LogTable, *, stride: int = DEFAULT_STRIDE) -> BinaryLog:
+        table = table.sorted_by_time()
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with tmp.open("wb") as fh:
+            fh.write(_HEADER.pack(MAGIC, VERSION, stride, 0, _HEADER.size))
+            _write_strings(fh, [])
+            _write_strings(fh, [])
+            fh.write(_U32.pack(0))
+        os.replace(tmp, path)
+        log = cls(path)
+        log.append(table)
+        return log
+
+    def append(self, table: LogTable) -> None:
+        if not len(table):
+            return
+        table = table.sorted_by_time()
+        last = self.last_timestamp()
+        if last is not None and table.timestamps[0] < last:
+            raise BinaryLogError("Appended rows must not start before the last stored row")
+
+        table = table.rekeyed(self.user_pool, self.path_pool)
+
+        first = self.records
+        for n in range(-(-first // self.stride) * self.stride, first + len(table), self.stride):
+            self.index.append((table.timestamps[n - first], n))
+        self._index_ts = [ts for ts, _ in self.index]
+
+        with self.path.open("r+b") as fh:
+            fh.seek(_HEADER.size + first * _RECORD.size)
+            for lo in range(0, len(table), WRITE_CHUNK_RECORDS):
+                fh.write(_encode_records(table, lo, min(lo + WRITE_CHUNK_RECORDS, len(table))))
+            trailer = fh.tell()
+            _write_strings(fh, self.user_pool.values)
+            _write_strings(fh, self.path_pool.values)
+            fh.write(_U32.pack(len(self.index)))
+            fh.write(b"".join(_INDEX.pack(ts, n) for ts, n in self.index))
+            fh.truncate()
+            self.records = first + len(table)
+            self.trailer = trailer
+            fh.seek(0)
+            fh.write(_HEADER.pack(MAGIC, VERSION, self.stride, self.records, self.trailer))
+
+    def _read_raw(self, fh: BinaryIO, lo: int, hi: int) -> bytes:
+        fh.seek(_HEADER.size + lo * _RECORD.size)
+        return fh.read((hi - lo) * _RECORD.size)
+
+    def _timestamps(self, raw: bytes) -> list[int]:
+        if np is not None and _RECORD_DTYPE is not None:
+            return np.frombuffer(raw, dtype=_RECORD_DTYPE)["ts"].tolist()
+        return [row[0] for row in _RECORD.iter_unpack(raw)]
+
+    def timestamps(self) -> array:
+        with self.path.open("rb") as fh:
+            return array("q", self._timestamps(self._read_raw(fh, 0, self.records)))
+
+    def last_timestamp(self) -> int | None:
+        if not self.records:
+            return None
+        with self.path.open("rb") as fh:
+            return self._timestamps(self._read_raw(fh, self.records - 1, self.records))[0]
+
+    def locate(self, ts: int) -> int:
+        """Record number of the first row at or after ``ts``."""
+        k = bisect_left(self._index_ts, ts)
+        lo = self.index[k - 1][1] if k > 0 else 0
+        hi = self.index[k][1] if k < len(self.index) else self.records
+        with self.path.open("rb") as fh:
+            return lo + bisect_left(self._timestamps(self._read_raw(fh, lo, hi)), ts)
+
+    def read(self, start: int | None = None, end: int | None = None) -> LogTable:
+        """Rows with ``start <= ts < end``; ids refer to this log's string tables."""
+        lo = 0 if start is None else self.locate(start)
+        hi = self.records if end is None else self.locate(end)
+        table = LogTable(user_pool=self.user_pool, path_pool=self.path_pool)
+        if hi <= lo:
+            return table
+        with self.path.open("rb") as fh:
+            raw = self._read_raw(fh, lo, hi)
+        if np is not None and _RECORD_DTYPE is not None:
+            rec = np.frombuffer(raw, dtype=_RECORD_DTYPE)
+            table.timestamps = _native("q", rec["ts"].astype("<i8").tobytes())
+            table.actions = _native("B", rec["action"].tobytes())
+            table.users = _native("I", rec["user"].astype("<u4").tobytes())
+            table.paths = _native("I", rec["path"].astype("<u4").tobytes())
+            return table
+        for ts, action, user, path in _RECORD.iter_unpack(raw):
+            table.timestamps.append(ts)
+            table.actions.append(action)
+            table.users.append(user)
+            table.paths.append(path)
+        return table
+
+    def export_text(self, out: IO[str], start: int | None = None, end: int | None = None) -> None:
+        self.read(start, end).write(out)
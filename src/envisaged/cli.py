@@ -1,18 +1,63 @@
 from __future__ import annotations
 
+import asyncio
+import functools
 import json
+import os
 import re
 import shutil
-import subprocess
+import sys
 import tempfile
-from dataclasses import dataclass
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal
 
 import typer
 from rich.console import Console
 
+from .affinity import available_cpus, encoder_threads, gource_gl_threads, parse_cpu_list
+from .assets import AssetError, asset_digest, fetch_asset, scale_logo_cmd, scaled_logo_path
+from .binlog import BinaryLog
+from .discovery import DEFAULT_MULTI_DEPTH, FoundRepo, RepoScanCache
+from .filtergraph import FilterGraph, split_chain
+from .framepipe import PIX_FMT
+from .logscan import decoded, scan_fields
+from .logtable import LogTable
+from .masters import (
+    MASTER_ENCODER_ARGS,
+    evict_masters,
+    find_master,
+    master_part,
+    master_path,
+    touch_master,
+)
+from .normalize import SyncMapping, normalize_tables, with_sync_pulses
+from .pacing import (
+    DEFAULT_AUTO_SKIP,
+    DEFAULT_SECONDS_PER_DAY,
+    DEFAULT_TIME_SCALE,
+    DEFAULT_TOLERANCE,
+    LogTimeline,
+    Pacing,
+    read_log_timeline,
+    tune_pacing,
+    within_tolerance,
+)
+from .paths import RENDER_JOBS_DIR
+from .relations import build_relationship_lines
+from .segments import (
+    SegmentManifest,
+    concat_list,
+    plan_boundaries,
+    remove_job_files,
+    render_key,
+    segment_files,
+    write_segment_logs,
+)
+from .supervisor import ProcessSpec, Runner, Supervisor, run_process
 from .templates import DEFAULT_TEMPLATE, TEMPLATES, is_compare, is_relation, is_split
+from .xvfb import DISPLAY_POOL
 
 app = typer.Typer(add_completion=False, rich_markup_mode="rich")
 console = Console()
@@ -21,6 +66,7 @@ Resolution = Literal["2160p", "1440p", "1080p", "720p"]
 SyncMode = Literal["auto", "true", "false", "smart"]
 LegendMode = Literal["auto", "none", "repos", "files", "actions", "services", "all"]
 SystemLogSource = Literal["journal", "kernel", "auth"]
+FrameTransport = Literal["raw", "ppm"]
 
 RESOLUTION_MAP: dict[str, tuple[int, int]] = {
     "2160p": (3840, 2160),
@@ -32,6 +78,13 @@ RESOLUTION_MAP: dict[str, tuple[int, int]] = {
 ALLOWED_FPS = {25, 30, 60}
 
 
+@dataclass
+class OutputVariant:
+    output: Path
+    resolution: Resolution | None = None  # None inherits the main render's setting
+    template: str | None = None
+
+
 @dataclass
 class RenderConfig:
     output: Path
@@ -55,6 +108,49 @@ class RenderConfig:
     auto_skip: float
     crf: int
     preset: str
+    target_duration: float | None = None
+    target_tolerance: float = DEFAULT_TOLERANCE
+    timeout: float | None = None
+    segments: int = 1
+    job_dir: Path | None = None
+    variants: list[OutputVariant] = field(default_factory=list)
+    master: bool = False
+    master_rescale: bool = False  # reuse larger or other-aspect masters via cover_filter
+    relation_signals: bool = False
+    sync_mapping: SyncMapping = "linear"
+    cpus: tuple[int, ...] | None = None  # core set for Gource/ffmpeg; None leaves them unpinned
+    transport: FrameTransport = "raw"
+    multi_depth: int = DEFAULT_MULTI_DEPTH
+    multi_ignore: tuple[str, ...] = ()
+
+
+def parse_variant(spec: str) -> OutputVariant:
+    # PATH[:RESOLUTION][:TEMPLATE]; trailing fields are matched by name so the
+    # order does not matter and paths may still contain colons.
+    parts = spec.split(":")
+    variant = OutputVariant(output=Path())
+    while len(parts) > 1:
+        if parts[-1] in RESOLUTION_MAP and variant.resolution is None:
+            variant.resolution = parts.pop()  # type: ignore[assignment]
+        elif parts[-1] in TEMPLATES and variant.template is None:
+            variant.template = parts.pop()
+        else:
+            break
+    path = ":".join(parts)
+    if not path:
+        raise typer.BadParameter(f"--variant needs an output path: {spec}")
+    variant.output = Path(path)
+    return variant
+
+
+def variant_config(config: RenderConfig, variant: OutputVariant) -> RenderConfig:
+    return replace(
+        config,
+        output=variant.output,
+        resolution=variant.resolution or config.resolution,
+        template=variant.template or config.template,
+        variants=[],
+    )
 
 
 def require_bin(name: str) -> None:
@@ -62,15 +158,6 @@ def require_bin(name: str) -> None:
         raise typer.BadParameter(f"Required binary not found in PATH: {name}")
 
 
-def run(cmd: list[str], *, cwd: Path | None = None, stdout=None) -> None:
-    subprocess.run(cmd, check=True, cwd=cwd, stdout=stdout)
-
-
-def sh(cmd: str, *, cwd: Path | None = None) -> str:
-    proc = subprocess.run(["bash", "-lc", cmd], check=True, capture_output=True, text=True, cwd=cwd)
-    return proc.stdout.strip()
-
-
 def ffmpeg_escape(text: str) -> str:
     value = text
     for a, b in [
@@ -98,6 +185,7 @@ def build_system_log(
     source: SystemLogSource,
     since: str,
     limit: int,
+    runner: Runner = run_process,
 ) -> None:
     require_bin("journalctl")
 
@@ -105,12 +193,17 @@ def build_system_log(
     if source == "kernel":
         cmd.insert(1, "-k")
 
-    proc = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    entries = out_log.with_suffix(".json")
+    runner(ProcessSpec("journalctl", cmd, stdout=entries))
+    try:
+        journal = entries.read_text(encoding="utf-8", errors="replace")
+    finally:
+        entries.unlink(missing_ok=True)
 
     auth_markers = ["auth", "sudo", "sshd", "login", "password", "pam", "session", "su["]
 
     rows: list[str] = []
-    for raw in proc.stdout.splitlines():
+    for raw in journal.splitlines():
         raw = raw.strip()
         if not raw or not raw.startswith("{"):
             continue
@@ -160,70 +253,8 @@ def build_system_log(
     out_log.write_text("\n".join(rows) + "\n", encoding="utf-8")
 
 
-def normalize_log_timestamps(in_log: Path, out_log: Path, sync_span: int) -> None:
-    cmd = (
-        f"min=$(awk -F'|' 'NR==1{{m=$1}} $1<m{{m=$1}} END{{print m+0}}' {in_log});"
-        f"max=$(awk -F'|' 'NR==1{{m=$1}} $1>m{{m=$1}} END{{print m+0}}' {in_log});"
-        f"awk -F'|' -v OFS='|' -v min=\"$min\" -v max=\"$max\" -v target={sync_span} -v base=946684800 "
-        f"'{{span=max-min; if(span<=0)span=1; t=int(((($1-min)/span)*target)+base); print t,$2,$3,$4;}}' {in_log} > {out_log}"
-    )
-    sh(cmd)
-
-
-def inject_sync_blanks(in_log: Path, out_log: Path, sync_span: int, repo_name: str) -> None:
-    start_ts = int(sh(f"awk -F'|' 'NR==1{{m=$1}} $1<m{{m=$1}} END{{print m+0}}' {in_log}"))
-    end_ts = int(sh(f"awk -F'|' 'NR==1{{m=$1}} $1>m{{m=$1}} END{{print m+0}}' {in_log}"))
-
-    interval = max(sync_span // 8, 1)
-    tmp = out_log.with_suffix(".tmp")
-    shutil.copy(in_log, tmp)
-    with tmp.open("a", encoding="utf-8") as fh:
-        fh.write(f"{start_ts}|_sync_|M|/{repo_name}/.sync/anchor\n")
-        fh.write(f"{end_ts}|_sync_|M|/{repo_name}/.sync/anchor\n")
-        t = start_ts + interval
-        while t < end_ts:
-            fh.write(f"{t}|_sync_|M|/{repo_name}/.sync/pulse\n")
-            t += interval
-
-    sh(f"sort -n {tmp} > {out_log}")
-    tmp.unlink(missing_ok=True)
-
-
-def build_relationship_lines(repo_names: list[str], max_rel: int = 8) -> list[str]:
-    lines = ["RELATIONSHIPS", ""]
-    count = 0
-
-    for i in range(len(repo_names)):
-        for j in range(i + 1, len(repo_names)):
-            a = repo_names[i]
-            b = repo_names[j]
-            abase = a.removesuffix("-nix")
-            bbase = b.removesuffix("-nix")
-
-            if abase in bbase or bbase in abase:
-                lines.append(f"- {a} <-> {b} (variant line)")
-                count += 1
-            else:
-                shared = ""
-                for tok in abase.split("-"):
-                    if len(tok) >= 4 and tok in bbase:
-                        shared = tok
-                        break
-                if shared:
-                    lines.append(f"- {a} <-> {b} (shared: {shared})")
-                    count += 1
-
-            if count >= max_rel:
-                return lines
-
-    if count == 0:
-        lines.append("- Similar stack family inferred from naming and cadence")
-
-    return lines
-
-
-def gource_log(repo_dir: Path, out_log: Path) -> None:
-    run(["gource", "--output-custom-log", str(out_log), str(repo_dir)], stdout=subprocess.DEVNULL)
+def gource_log(repo_dir: Path, out_log: Path, runner: Runner = run_process) -> None:
+    runner(ProcessSpec("gource", ["gource", "--output-custom-log", str(out_log), str(repo_dir)]))
 
 
 def _extension_label(path_text: str) -> str:
@@ -235,23 +266,11 @@ def _extension_label(path_text: str) -> str:
 
 
 def summarize_log_for_legend(log_path: Path, *, limit: int) -> tuple[list[str], list[str], list[str]]:
-    ext_counts: dict[str, int] = {}
+    counts = scan_fields(log_path)
+    ext_counts = decoded(counts.names, lambda name: _extension_label(name.strip()))
     action_counts: dict[str, int] = {"A": 0, "M": 0, "D": 0}
-    service_counts: dict[str, int] = {}
-
-    with log_path.open("r", encoding="utf-8", errors="ignore") as fh:
-        for raw in fh:
-            parts = raw.rstrip("\n").split("|", 3)
-            if len(parts) != 4:
-                continue
-            actor = parts[1].strip()
-            action = parts[2].strip().upper() or "?"
-            path_text = parts[3].strip()
-
-            action_counts[action] = action_counts.get(action, 0) + 1
-            ext = _extension_label(path_text)
-            ext_counts[ext] = ext_counts.get(ext, 0) + 1
-            service_counts[actor] = service_counts.get(actor, 0) + 1
+    action_counts.update(decoded(counts.actions, lambda action: action.strip().upper() or "?"))
+    service_counts = decoded(counts.users, str.strip)
 
     top_ext = sorted(ext_counts.items(), key=lambda kv: (-kv[1], kv[0]))[: max(1, limit)]
     ext_lines = [f"- {ext}: {count}" for ext, count in top_ext]
@@ -274,56 +293,53 @@ def build_multi_logs(
     log_dir: Path,
     sync_timing: SyncMode,
     sync_span: int,
+    sync_mapping: SyncMapping = "linear",
+    *,
+    max_depth: int = DEFAULT_MULTI_DEPTH,
+    ignore: Sequence[str] = (),
+    runner: Runner = run_process,
 ) -> tuple[list[str], list[Path], Path]:
-    repo_names: list[str] = []
-    repo_logs: list[Path] = []
-
-    for d in sorted(base_dir.iterdir()):
-        if not (d / ".git").is_dir():
-            continue
-
-        name = d.name
-        console.print(f"Collecting: [cyan]{name}[/cyan]")
-        raw = log_dir / f"{name}.raw.log"
-        prepared = log_dir / f"{name}.log"
-        gource_log(d, raw)
+    def collect(repo: FoundRepo, raw: Path) -> None:
+        console.print(f"Collecting: [cyan]{repo.name}[/cyan]")
+        gource_log(repo.path, raw, runner)
 
-        if sync_timing in {"true", "smart"}:
-            normalize_log_timestamps(raw, prepared, sync_span)
-            if sync_timing == "smart":
-                smart = log_dir / f"{name}.smart.log"
-                inject_sync_blanks(prepared, smart, sync_span, name)
-                prepared = smart
-        else:
-            shutil.copy(raw, prepared)
-
-        prefixed = log_dir / f"{name}.prefixed.log"
-        sh(
-            "sed -E 's#^([0-9]+\\|[^|]+\\|[^|]+\\|)#\\1/{name}#' {inp} > {out}".format(
-                name=name, inp=prepared, out=prefixed
-            )
-        )
+    scan = RepoScanCache(base_dir, max_depth=max_depth, ignore=ignore)
+    collected = scan.collect(collect)
+    if not collected:
+        raise typer.BadParameter(f"No git repos found in {base_dir}")
+    reused = [repo.name for repo, _, cached in collected if cached]
+    if reused:
+        console.print(f"Unchanged since last scan: [cyan]{' '.join(reused)}[/cyan]")
+
+    repo_names = [repo.name for repo, _, _ in collected]
+    slugs = [repo.slug for repo, _, _ in collected]
+    tables = [LogTable.load(raw) for _, raw, _ in collected]
+
+    if sync_timing in {"true", "smart"}:
+        tables = normalize_tables(tables, sync_span, sync_mapping)
+        if sync_timing == "smart":
+            tables = [
+                with_sync_pulses(table, sync_span, name)
+                for table, name in zip(tables, repo_names, strict=True)
+            ]
 
-        repo_names.append(name)
+    repo_logs: list[Path] = []
+    for idx, name in enumerate(repo_names):
+        tables[idx] = tables[idx].with_path_prefix(f"/{name}")
+        prefixed = log_dir / f"{slugs[idx]}.prefixed.log"
+        tables[idx].save(prefixed)
         repo_logs.append(prefixed)
 
-    if not repo_logs:
-        raise typer.BadParameter(f"No git repos found in {base_dir}")
-
     merged = log_dir / "development.log"
-    cat_cmd = "cat {files} | sort -n > {out}".format(
-        files=" ".join(str(p) for p in repo_logs),
-        out=merged,
-    )
-    sh(cat_cmd)
+    LogTable.concat(tables).sorted_by_time().save(merged)
     return repo_names, repo_logs, merged
 
 
-def clone_or_use_repo(src: str, workdir: Path) -> Path:
+def clone_or_use_repo(src: str, workdir: Path, runner: Runner = run_process) -> Path:
     if src.startswith("http://") or src.startswith("https://") or src.startswith("git@"):
         repo = workdir / "repo"
         console.print(f"Cloning [cyan]{src}[/cyan]")
-        run(["git", "clone", "--quiet", src, str(repo)])
+        runner(ProcessSpec("git", ["git", "clone", "--quiet", src, str(repo)]))
         return repo
 
     repo = Path(src).expanduser().resolve()
@@ -343,209 +359,462 @@ def frame_for_template(template: str) -> int:
     return 0
 
 
-def split_filter(template: str, quad_multi: bool) -> str:
+def split_filter(template: str, quad_multi: bool) -> FilterGraph:
+    graph = FilterGraph()
+    quarter = "scale=iw/2:ih/2"
+
     if template == "split-quad":
         if quad_multi:
-            return (
-                "[0:v]scale=iw/2:ih/2,eq=saturation=1.25:contrast=1.1[a1];"
-                "[1:v]scale=iw/2:ih/2,hue=s=0,eq=contrast=1.2[b1];"
-                "[2:v]scale=iw/2:ih/2,colorbalance=rs=.12:gs=-.02:bs=-.08[c1];"
-                "[3:v]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.2:gg=1.0:gb=0.05:br=0:bg=0:bb=0[d1];"
-                "[a1][b1][c1][d1]xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0[outv]"
-            )
-        return (
-            "[0:v]split=4[a][b][c][d];"
-            "[a]scale=iw/2:ih/2,eq=saturation=1.25:contrast=1.1[a1];"
-            "[b]scale=iw/2:ih/2,hue=s=0,eq=contrast=1.2[b1];"
-            "[c]scale=iw/2:ih/2,colorbalance=rs=.12:gs=-.02:bs=-.08[c1];"
-            "[d]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.2:gg=1.0:gb=0.05:br=0:bg=0:bb=0[d1];"
-            "[a1][b1][c1][d1]xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0[outv]"
+            sources = ["0:v", "1:v", "2:v", "3:v"]
+        else:
+            sources = ["a", "b", "c", "d"]
+            graph.add("0:v", "split=4", sources)
+        looks = [
+            "eq=saturation=1.25:contrast=1.1",
+            "hue=s=0,eq=contrast=1.2",
+            "colorbalance=rs=.12:gs=-.02:bs=-.08",
+            "colorchannelmixer=rr=0:rg=0:rb=0:gr=0.2:gg=1.0:gb=0.05:br=0:bg=0:bb=0",
+        ]
+        for src, look, out in zip(sources, looks, ["a1", "b1", "c1", "d1"], strict=True):
+            graph.add(src, f"{quarter},{look}", out)
+        return graph.add(
+            ["a1", "b1", "c1", "d1"], "xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0", "outv"
         )
 
     if template == "split-vertical":
         return (
-            "[0:v]split=2[a][b];"
-            "[a]eq=saturation=1.3:contrast=1.12[a1];"
-            "[b]hue=s=0,eq=contrast=1.25[b1];"
-            "[a1][b1]hstack=inputs=2[outv]"
+            graph.add("0:v", "split=2", ["a", "b"])
+            .add("a", "eq=saturation=1.3:contrast=1.12", "a1")
+            .add("b", "hue=s=0,eq=contrast=1.25", "b1")
+            .add(["a1", "b1"], "hstack=inputs=2", "outv")
         )
 
     if template == "split-triple":
         return (
-            "[0:v]split=3[a][b][c];"
-            "[a]crop=iw/2:ih:0:0,eq=saturation=1.22:contrast=1.08[a1];"
-            "[b]crop=iw/4:ih:iw/4:0,hue=s=0,eq=contrast=1.2[b1];"
-            "[c]crop=iw/4:ih:3*iw/4:0,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.18:gg=1.0:gb=0.05:br=0:bg=0:bb=0[c1];"
-            "[a1][b1][c1]hstack=inputs=3[outv]"
+            graph.add("0:v", "split=3", ["a", "b", "c"])
+            .add("a", "crop=iw/2:ih:0:0,eq=saturation=1.22:contrast=1.08", "a1")
+            .add("b", "crop=iw/4:ih:iw/4:0,hue=s=0,eq=contrast=1.2", "b1")
+            .add(
+                "c",
+                "crop=iw/4:ih:3*iw/4:0,"
+                "colorchannelmixer=rr=0:rg=0:rb=0:gr=0.18:gg=1.0:gb=0.05:br=0:bg=0:bb=0",
+                "c1",
+            )
+            .add(["a1", "b1", "c1"], "hstack=inputs=3", "outv")
         )
 
     if template == "split-focus":
         return (
-            "[0:v]split=2[a][b];"
-            "[a]scale=iw:ih,eq=saturation=1.18:contrast=1.1,drawbox=x=8:y=8:w=iw-16:h=ih-16:color=#87b7ff@0.35:t=3[base];"
-            "[b]scale=iw/3:ih/3,hue=s=0,eq=contrast=1.24[mini];"
-            "[base][mini]overlay=W-w-28:28[outv]"
+            graph.add("0:v", "split=2", ["a", "b"])
+            .add(
+                "a",
+                "scale=iw:ih,eq=saturation=1.18:contrast=1.1,"
+                "drawbox=x=8:y=8:w=iw-16:h=ih-16:color=#87b7ff@0.35:t=3",
+                "base",
+            )
+            .add("b", "scale=iw/3:ih/3,hue=s=0,eq=contrast=1.24", "mini")
+            .add(["base", "mini"], "overlay=W-w-28:28", "outv")
         )
 
     if template == "split-matrix":
-        return (
-            "[0:v]split=4[a][b][c][d];"
-            "[a]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.2:gg=1.0:gb=0.05:br=0:bg=0:bb=0[a1];"
-            "[b]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.15:gg=0.9:gb=0.03:br=0:bg=0:bb=0[b1];"
-            "[c]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.22:gg=1.05:gb=0.07:br=0:bg=0:bb=0[c1];"
-            "[d]scale=iw/2:ih/2,colorchannelmixer=rr=0:rg=0:rb=0:gr=0.18:gg=0.95:gb=0.05:br=0:bg=0:bb=0[d1];"
-            "[a1][b1][c1][d1]xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0,drawgrid=w=64:h=28:t=1:c=#00ff66@0.12[outv]"
+        graph.add("0:v", "split=4", ["a", "b", "c", "d"])
+        greens = [
+            "gr=0.2:gg=1.0:gb=0.05",
+            "gr=0.15:gg=0.9:gb=0.03",
+            "gr=0.22:gg=1.05:gb=0.07",
+            "gr=0.18:gg=0.95:gb=0.05",
+        ]
+        for src, green in zip(["a", "b", "c", "d"], greens, strict=True):
+            graph.add(
+                src,
+                f"{quarter},colorchannelmixer=rr=0:rg=0:rb=0:{green}:br=0:bg=0:bb=0",
+                f"{src}1",
+            )
+        return graph.add(
+            ["a1", "b1", "c1", "d1"],
+            [
+                "xstack=inputs=4:layout=0_0|w0_0|0_h0|w0_h0",
+                "drawgrid=w=64:h=28:t=1:c=#00ff66@0.12",
+            ],
+            "outv",
         )
 
     raise RuntimeError(f"Unhandled split template: {template}")
 
 
-def overlay_lines_filter(
+def _mask_color(color: str) -> str:
+    # Same opacity, drawn white: the alpha mask of a panel layer.
+    _, _, alpha = color.partition("@")
+    return f"#ffffff@{alpha}" if alpha else "#ffffff"
+
+
+def overlay_lines_chain(
     *,
     box_x: int,
     box_y: int,
     box_w: int,
     box_h: int,
     border_color: str,
-    lines: list[str],
+    lines: Sequence[str],
     font_size: int,
     line_spacing: int,
     text_x: int,
     text_y: int,
-) -> str:
-    filt = (
-        f"drawbox=x={box_x}:y={box_y}:w={box_w}:h={box_h}:color=#000000@0.42:t=fill,"
-        f"drawbox=x={box_x}:y={box_y}:w={box_w}:h={box_h}:color={border_color}:t=2"
-    )
+    mask: bool = False,
+) -> list[str]:
+    fill_color = "#000000@0.42"
+    if mask:
+        fill_color, border_color = _mask_color(fill_color), _mask_color(border_color)
+    chain = [
+        f"drawbox=x={box_x}:y={box_y}:w={box_w}:h={box_h}:color={fill_color}:t=fill",
+        f"drawbox=x={box_x}:y={box_y}:w={box_w}:h={box_h}:color={border_color}:t=2",
+    ]
     y = text_y
     for line in lines:
         if line:
             esc = ffmpeg_escape(line)
-            filt += (
-                f",drawtext=font='DejaVu Sans':text='{esc}':x={text_x}:y={y}:"
+            chain.append(
+                f"drawtext=font='DejaVu Sans':text='{esc}':x={text_x}:y={y}:"
                 f"fontsize={font_size}:fontcolor=white:text_shaping=0"
             )
         y += font_size + line_spacing
-    return filt
+    return chain
+
+
+def panel_layer(width: int, height: int, panels: list[dict[str, Any]]) -> FilterGraph:
+    # Panels are drawn once in colour over black and once as a white alpha
+    # mask; merged, they form a premultiplied RGBA layer for a single overlay.
+    color = [f for panel in panels for f in overlay_lines_chain(**panel)]
+    mask = [f for panel in panels for f in overlay_lines_chain(**panel, mask=True)]
+    layer = (
+        FilterGraph()
+        .add("0:v", "split=2", ["color", "mask"])
+        .add("color", ["format=rgb24", *color], "color_drawn")
+        .add("mask", ["format=rgb24", *mask], "mask_drawn")
+        .add(["color_drawn", "mask_drawn"], ["alphamerge", "format=rgba"], "layer")
+    )
+    layer.validate(inputs=1, outputs=["layer"])
+    return layer
 
 
-def render(config: RenderConfig) -> None:
-    for bin_name in ["gource", "ffmpeg", "xvfb-run", "bash"]:
-        require_bin(bin_name)
-    if not config.system_log:
-        require_bin("git")
+def apply_target_duration(config: RenderConfig, devlog: Path) -> RenderConfig:
+    return apply_pacing(config, pace_for_target(config, read_log_timeline(devlog)))
 
-    width, height = RESOLUTION_MAP[config.resolution]
-    if config.fps not in ALLOWED_FPS:
-        raise typer.BadParameter("Unsupported fps (supported: 25, 30, 60)")
 
-    if config.template not in TEMPLATES:
-        raise typer.BadParameter(f"Unsupported template: {config.template}")
+def pace_for_target(config: RenderConfig, timeline: LogTimeline) -> Pacing:
+    target = config.target_duration or 0.0
+    try:
+        pacing = tune_pacing(
+            timeline,
+            target_seconds=target,
+            time_scale=config.time_scale,
+            auto_skip=config.auto_skip,
+            tolerance=config.target_tolerance,
+        )
+    except ValueError as exc:
+        raise typer.BadParameter(f"--target-duration: {exc}") from exc
+
+    console.print(
+        f"Pacing for {target:g}s target: {timeline.events} events over "
+        f"{timeline.span_days:.1f} days ({timeline.active_days} active) -> "
+        f"seconds-per-day={pacing.seconds_per_day:g}, time-scale={pacing.time_scale:g}, "
+        f"auto-skip={pacing.auto_skip:g} (~{pacing.estimated_seconds:.0f}s)"
+    )
+    if not within_tolerance(pacing, target, config.target_tolerance):
+        console.print(
+            f"[yellow]Warning:[/yellow] estimated {pacing.estimated_seconds:.0f}s is outside "
+            f"±{config.target_tolerance:.0%} of the target; Gource limits were hit"
+        )
+    return pacing
 
-    is_compare_template = is_compare(config.template)
-    is_split_template = is_split(config.template)
-    is_relation_template = is_relation(config.template)
 
-    sync_timing = config.sync_timing
-    if sync_timing == "auto":
-        if config.multi_dir and (is_compare_template or is_split_template or is_relation_template):
-            sync_timing = "smart"
-        else:
-            sync_timing = "false"
+def apply_pacing(config: RenderConfig, pacing: Pacing) -> RenderConfig:
+    return replace(
+        config,
+        seconds_per_day=pacing.seconds_per_day,
+        time_scale=pacing.time_scale,
+        auto_skip=pacing.auto_skip,
+    )
 
-    with tempfile.TemporaryDirectory() as tmp:
-        workdir = Path(tmp)
-        log_dir = workdir / "logs"
-        log_dir.mkdir(parents=True, exist_ok=True)
 
-        repo_names: list[str] = []
-        repo_logs: list[Path] = []
+@dataclass
+class PreparedLogs:
+    devlog: Path
+    repo_names: list[str]
+    repo_logs: list[Path]
 
-        if config.system_log:
-            devlog = workdir / "system.log"
-            build_system_log(
-                out_log=devlog,
-                source=config.system_log,
-                since=config.system_log_since,
-                limit=config.system_log_limit,
-            )
-        elif config.multi_dir:
-            repo_names, repo_logs, devlog = build_multi_logs(
-                config.multi_dir, log_dir, sync_timing, config.sync_span
-            )
-        else:
-            repo = clone_or_use_repo(config.input_repo or "", workdir)
-            devlog = workdir / "development.log"
-            gource_log(repo, devlog)
 
-        frame = frame_for_template(config.template)
-        inner_w = width - (frame * 2)
-        inner_h = height - (frame * 2)
+def resolve_sync_timing(config: RenderConfig) -> SyncMode:
+    if config.sync_timing != "auto":
+        return config.sync_timing
+    template = config.template
+    if config.multi_dir and (is_compare(template) or is_split(template) or is_relation(template)):
+        return "smart"
+    return "false"
 
-        use_quad_multi = (
-            config.template == "split-quad" and config.multi_dir is not None and len(repo_logs) >= 4
+
+def prepare_logs(
+    config: RenderConfig,
+    workdir: Path,
+    sync_timing: SyncMode,
+    *,
+    runner: Runner = run_process,
+) -> PreparedLogs:
+    log_dir = workdir / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    if config.system_log:
+        devlog = workdir / "system.log"
+        build_system_log(
+            out_log=devlog,
+            source=config.system_log,
+            since=config.system_log_since,
+            limit=config.system_log_limit,
+            runner=runner,
         )
-        quad_repo_names = repo_names[:4] if use_quad_multi else []
-        if use_quad_multi:
-            repo_names = quad_repo_names
+        return PreparedLogs(devlog=devlog, repo_names=[], repo_logs=[])
+
+    if config.multi_dir:
+        repo_names, repo_logs, devlog = build_multi_logs(
+            config.multi_dir,
+            log_dir,
+            sync_timing,
+            config.sync_span,
+            config.sync_mapping,
+            max_depth=config.multi_depth,
+            ignore=config.multi_ignore,
+            runner=runner,
+        )
+        return PreparedLogs(devlog=devlog, repo_names=repo_names, repo_logs=repo_logs)
+
+    repo = clone_or_use_repo(config.input_repo or "", workdir, runner)
+    devlog = workdir / "development.log"
+    gource_log(repo, devlog, runner)
+    return PreparedLogs(devlog=devlog, repo_names=[], repo_logs=[])
+
+
+def gource_args(
+    config: RenderConfig,
+    *,
+    title: str,
+    log: Path,
+    inner_w: int,
+    inner_h: int,
+) -> list[str]:
+    hide_flags = "mouse,date,filenames" if config.system_log else "usernames,mouse,date,filenames"
+    return [
+        "gource",
+        "--seconds-per-day",
+        str(config.seconds_per_day),
+        "--user-scale",
+        str(config.user_scale),
+        "--time-scale",
+        str(config.time_scale),
+        "--auto-skip-seconds",
+        str(config.auto_skip),
+        "--title",
+        title,
+        "--background-colour",
+        "000000",
+        "--font-colour",
+        "FFFFFF",
+        "--camera-mode",
+        "overview",
+        "--hide",
+        hide_flags,
+        "--font-size",
+        "42",
+        "--dir-name-depth",
+        "3",
+        "--filename-time",
+        "2",
+        "--max-user-speed",
+        "500",
+        "--bloom-multiplier",
+        "1.2",
+        f"--{inner_w}x{inner_h}",
+        "--stop-at-end",
+        str(log),
+        "-r",
+        str(config.fps),
+        "-o",
+        "-",
+    ]
+
+
+def frame_input_args(config: RenderConfig, width: int, height: int) -> list[str]:
+    if config.transport == "ppm":
+        return ["-r", str(config.fps), "-f", "image2pipe", "-probesize", "100M", "-i", "-"]
+    # Headerless frames of a known size: nothing to parse or probe.
+    return [
+        "-f",
+        "rawvideo",
+        "-pix_fmt",
+        PIX_FMT,
+        "-video_size",
+        f"{width}x{height}",
+        "-framerate",
+        str(config.fps),
+        "-i",
+        "-",
+    ]
+
 
-        base_filter = ""
-        use_complex = False
-        complex_filter = ""
-        final_label = ""
+def frame_relay(config: RenderConfig, width: int, height: int) -> list[ProcessSpec]:
+    # Gource only writes PPM; for rawvideo a relay strips the frame headers.
+    if config.transport == "ppm":
+        return []
+    argv = [sys.executable, "-m", "envisaged.framepipe", f"{width}x{height}"]
+    return [ProcessSpec("frame-relay", argv)]
+
+
+def encoder_args(config: RenderConfig) -> list[str]:
+    args = [
+        "-vcodec",
+        "libx264",
+        "-pix_fmt",
+        "yuv420p",
+        "-crf",
+        str(config.crf),
+        "-preset",
+        config.preset,
+        "-bf",
+        "0",
+    ]
+    if config.cpus:
+        # Sized to the render's core set instead of libx264's default of
+        # 1.5 threads per host core.
+        threads = encoder_threads(config.cpus)
+        lookahead = max(1, threads // 4)
+        args += ["-threads", str(threads), "-x264-params", f"lookahead-threads={lookahead}"]
+    return args
+
+
+@dataclass(frozen=True)
+class FilterPlan:
+    graph: FilterGraph
+    output: str
+    inputs: int
+    simple: bool  # a single chain on [0:v], usable as plain -vf
+    extra_inputs: tuple[str, ...] = ()  # "layer" / "logo", in input order after the sources
+    layer: FilterGraph | None = None  # rasterized once to PNG by layer_cmd()
+    size: tuple[int, int] = (0, 0)
+
+
+def filter_args(plan: FilterPlan) -> list[str]:
+    if not plan.simple:
+        return ["-filter_complex", plan.graph.compile(), "-map", f"[{plan.output}]"]
+    filters = plan.graph.chains[0].filters
+    return ["-vf", ",".join(filters)] if filters else []
+
+
+def build_filter_plan(
+    config: RenderConfig,
+    *,
+    width: int,
+    height: int,
+    frame: int,
+    devlog: Path,
+    repo_names: list[str],
+    sync_timing: SyncMode,
+    repo_logs: Sequence[Path] = (),
+    quad_multi: bool = False,
+    logo_file: Path | None = None,
+) -> FilterPlan:
+    is_compare_template = is_compare(config.template)
+    is_split_template = is_split(config.template)
+    is_relation_template = is_relation(config.template)
 
-        if is_split_template:
-            use_complex = True
-            complex_filter = split_filter(config.template, use_quad_multi)
-            final_label = "outv"
+    resolved_legend = config.legend
+    if resolved_legend == "auto":
+        if config.system_log:
+            resolved_legend = "services"
+        elif is_compare_template or is_split_template or is_relation_template:
+            resolved_legend = "repos"
         else:
-            simple = TEMPLATES[config.template].simple_filter or ""
-            base_filter = simple.format(w=width, h=height, frame=frame)
-
-        resolved_legend = config.legend
-        if resolved_legend == "auto":
-            if config.system_log:
-                resolved_legend = "services"
-            elif is_compare_template or is_split_template or is_relation_template:
-                resolved_legend = "repos"
-            else:
-                resolved_legend = "none"
-
-        legend_lines: list[str] = []
-        if resolved_legend in {"repos", "all"} and repo_names:
-            legend_lines += ["REPOS", "", *[f"- {r}" for r in repo_names]]
-            if sync_timing in {"true", "smart"}:
-                legend_lines += ["", "timing: unified"]
-                if sync_timing == "smart":
-                    legend_lines += ["sync: smart blank-log pulses"]
-
-        include_file_legend = resolved_legend in {"files", "all"}
-        include_action_legend = resolved_legend in {"actions", "all"}
-        include_service_legend = resolved_legend in {"services", "all"}
-        if include_file_legend or include_action_legend or include_service_legend:
-            ext_lines, action_lines, service_lines = summarize_log_for_legend(
-                devlog, limit=config.legend_limit
-            )
-            if include_file_legend:
-                if legend_lines:
-                    legend_lines += [""]
-                legend_lines += ["FILE TYPES", "", *ext_lines]
-            if include_action_legend:
-                if legend_lines:
-                    legend_lines += [""]
-                legend_lines += ["ACTIONS", "", *action_lines]
-            if include_service_legend:
-                if legend_lines:
-                    legend_lines += [""]
-                legend_lines += ["SERVICES", "", *service_lines]
-
-        if legend_lines:
-            font = 24 if height >= 1080 else 18
-            spacing = 10 if height >= 1080 else 8
-            max_chars = max(len(x) for x in legend_lines) if legend_lines else 0
-            box_w = max(360, min(width - 36, 90 + (max_chars * (font // 2 + 4))))
-            box_h = min(height - 36, 24 + (len(legend_lines) * (font + spacing)) + 24)
-            legend_filter = overlay_lines_filter(
+            resolved_legend = "none"
+
+    legend_lines: list[str] = []
+    if resolved_legend in {"repos", "all"} and repo_names:
+        legend_lines += ["REPOS", "", *[f"- {r}" for r in repo_names]]
+        if sync_timing in {"true", "smart"}:
+            legend_lines += ["", "timing: unified"]
+            if sync_timing == "smart":
+                legend_lines += ["sync: smart blank-log pulses"]
+
+    include_file_legend = resolved_legend in {"files", "all"}
+    include_action_legend = resolved_legend in {"actions", "all"}
+    include_service_legend = resolved_legend in {"services", "all"}
+    if include_file_legend or include_action_legend or include_service_legend:
+        ext_lines, action_lines, service_lines = summarize_log_for_legend(
+            devlog, limit=config.legend_limit
+        )
+        if include_file_legend:
+            if legend_lines:
+                legend_lines += [""]
+            legend_lines += ["FILE TYPES", "", *ext_lines]
+        if include_action_legend:
+            if legend_lines:
+                legend_lines += [""]
+            legend_lines += ["ACTIONS", "", *action_lines]
+        if include_service_legend:
+            if legend_lines:
+                legend_lines += [""]
+            legend_lines += ["SERVICES", "", *service_lines]
+
+    relation_lines: list[str] = []
+    if is_relation_template and len(repo_names) > 1:
+        relation_lines = build_relationship_lines(
+            repo_names,
+            repo_logs=repo_logs,
+            signals=config.relation_signals,
+            # Unified timing rescales every repo onto the same span.
+            windows=sync_timing not in {"true", "smart"},
+        )
+
+    return compile_filter_plan(
+        config.template,
+        width,
+        height,
+        frame,
+        tuple(legend_lines),
+        tuple(relation_lines),
+        logo=logo_file is not None,
+        quad_multi=quad_multi,
+    )
+
+
+@functools.lru_cache(maxsize=128)
+def compile_filter_plan(
+    template: str,
+    width: int,
+    height: int,
+    frame: int,
+    legend_lines: tuple[str, ...],
+    relation_lines: tuple[str, ...],
+    *,
+    logo: bool,
+    quad_multi: bool,
+) -> FilterPlan:
+    graph = FilterGraph()
+    if is_split(template):
+        graph = split_filter(template, quad_multi)
+        head = "outv"
+        tail: list[str] = []
+    else:
+        head = "0:v"
+        simple = TEMPLATES[template].simple_filter or ""
+        tail = split_chain(simple.format(w=width, h=height, frame=frame))
+
+    panels: list[dict[str, Any]] = []
+    if legend_lines:
+        font = 24 if height >= 1080 else 18
+        spacing = 10 if height >= 1080 else 8
+        max_chars = max(len(x) for x in legend_lines)
+        box_w = max(360, min(width - 36, 90 + (max_chars * (font // 2 + 4))))
+        box_h = min(height - 36, 24 + (len(legend_lines) * (font + spacing)) + 24)
+        panels.append(
+            dict(
                 box_x=18,
                 box_y=18,
                 box_w=box_w,
@@ -557,228 +826,669 @@ def render(config: RenderConfig) -> None:
                 text_x=34,
                 text_y=34,
             )
+        )
 
-            if use_complex:
-                complex_filter = f"{complex_filter};[{final_label}]{legend_filter}[outleg]"
-                final_label = "outleg"
-            else:
-                base_filter = f"{base_filter},{legend_filter}" if base_filter else legend_filter
-
-        if is_relation_template and len(repo_names) > 1:
-            lines = build_relationship_lines(repo_names)
-            font = 20 if height >= 1080 else 16
-            spacing = 8 if height >= 1080 else 6
-            max_chars = max(len(x) for x in lines) if lines else 0
-            box_w = max(420, min(width - 36, 90 + (max_chars * (font // 2 + 4))))
-            box_h = min(height - 36, 24 + (len(lines) * (font + spacing)) + 24)
-            box_x = width - box_w - 18
-            rel_filter = overlay_lines_filter(
+    if relation_lines:
+        font = 20 if height >= 1080 else 16
+        spacing = 8 if height >= 1080 else 6
+        max_chars = max(len(x) for x in relation_lines)
+        box_w = max(420, min(width - 36, 90 + (max_chars * (font // 2 + 4))))
+        box_h = min(height - 36, 24 + (len(relation_lines) * (font + spacing)) + 24)
+        box_x = width - box_w - 18
+        panels.append(
+            dict(
                 box_x=box_x,
                 box_y=18,
                 box_w=box_w,
                 box_h=box_h,
                 border_color="#ffd28a@0.24",
-                lines=lines,
+                lines=relation_lines,
                 font_size=font,
                 line_spacing=spacing,
                 text_x=box_x + 18,
                 text_y=36,
             )
+        )
 
-            if use_complex:
-                complex_filter = f"{complex_filter};[{final_label}]{rel_filter}[outrel]"
-                final_label = "outrel"
-            else:
-                base_filter = f"{base_filter},{rel_filter}" if base_filter else rel_filter
+    sources = 4 if quad_multi else 1
+    extra: list[str] = []
+    overlays: list[tuple[str, str, str]] = []
+    layer = panel_layer(width, height, panels) if panels else None
+    if layer is not None:
+        overlays.append(
+            (f"{sources + len(extra)}:v", "overlay=0:0:alpha=premultiplied:format=rgb", "outlayer")
+        )
+        extra.append("layer")
+    if logo:
+        # The logo input is pre-scaled for this height (see prepare_logos).
+        overlays.append((f"{sources + len(extra)}:v", "overlay=W-w-40:H-h-40", "outlogo"))
+        extra.append("logo")
+
+    if overlays:
+        if tail:
+            graph.add(head, tail, "post")
+            head = "post"
+        for src, filt, out in overlays:
+            graph.add([head, src], filt, out)
+            head = out
+        output = head
+    elif head == "0:v":
+        graph.add(head, tail, "outv")
+        output = "outv"
+    elif tail:
+        graph.add(head, tail, "outpost")
+        output = "outpost"
+    else:
+        output = head
+
+    # Validate once per cache entry: a miswired graph fails here, before
+    # Gource or Xvfb are started.
+    inputs = sources + len(extra)
+    graph.validate(inputs=inputs, outputs=[output])
+    return FilterPlan(
+        graph=graph,
+        output=output,
+        inputs=inputs,
+        simple=not is_split(template) and not extra,
+        extra_inputs=tuple(extra),
+        layer=layer,
+        size=(width, height),
+    )
 
-        logo_file: Path | None = None
-        if config.logo:
-            if config.logo.startswith("http://") or config.logo.startswith("https://"):
-                logo_file = workdir / "logo"
-                run(["curl", "-fsSL", config.logo, "-o", str(logo_file)])
-            else:
-                logo_file = Path(config.logo).expanduser().resolve()
-                if not logo_file.exists():
-                    raise typer.BadParameter(f"Logo not found: {logo_file}")
-
-        base_input_count = 4 if use_quad_multi else 1
-        if logo_file:
-            logo_idx = base_input_count
-            if use_complex:
-                complex_filter = (
-                    f"{complex_filter};[{logo_idx}:v]scale=-1:{height}/8[logo];"
-                    f"[{final_label}][logo]overlay=W-w-40:H-h-40[outlogo]"
-                )
-                final_label = "outlogo"
-            else:
-                use_complex = True
-                if base_filter:
-                    complex_filter = (
-                        f"[0:v]{base_filter}[base];[{logo_idx}:v]scale=-1:{height}/8[logo];"
-                        "[base][logo]overlay=W-w-40:H-h-40[outlogo]"
-                    )
-                else:
-                    complex_filter = f"[{logo_idx}:v]scale=-1:{height}/8[logo];[0:v][logo]overlay=W-w-40:H-h-40[outlogo]"
-                final_label = "outlogo"
 
-        console.print(f"Rendering: [green]{config.output}[/green]")
-        console.print(
-            f"Resolution: {width}x{height} ({config.resolution}), fps={config.fps}, "
-            f"template={config.template}, sync={sync_timing}"
+def layer_cmd(plan: FilterPlan, path: Path) -> list[str]:
+    assert plan.layer is not None
+    width, height = plan.size
+    return [
+        "ffmpeg",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"color=c=black:s={width}x{height}",
+        "-filter_complex",
+        plan.layer.compile(),
+        "-map",
+        "[layer]",
+        "-frames:v",
+        "1",
+        str(path),
+    ]
+
+
+async def rasterize_layers(
+    supervisor: Supervisor, targets: list[FanoutTarget], workdir: Path
+) -> None:
+    # Plans come from a cache, so identical variants share one layer PNG.
+    drawn: dict[int, Path] = {}
+    for target in targets:
+        if target.plan.layer is None:
+            continue
+        key = id(target.plan)
+        if key not in drawn:
+            path = workdir / f"layer-{len(drawn)}.png"
+            await supervisor.run(ProcessSpec("ffmpeg", layer_cmd(target.plan, path)))
+            drawn[key] = path
+        target.layer = drawn[key]
+
+
+async def prepare_logos(supervisor: Supervisor, targets: list[FanoutTarget], logo: Path) -> None:
+    # One PNG per output height, scaled once and kept in the asset cache.
+    digest = await asyncio.to_thread(asset_digest, logo)
+    for target in targets:
+        if "logo" not in target.plan.extra_inputs:
+            continue
+        _, height = target.plan.size
+        path = scaled_logo_path(digest, height)
+        if not path.is_file():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            part = path.with_name(f".{path.name}.{os.getpid()}-{id(target)}.part")
+            await supervisor.run(ProcessSpec("ffmpeg", scale_logo_cmd(logo, height, part)))
+            os.replace(part, path)
+        target.logo = path
+
+
+def extra_input_args(plan: FilterPlan, *, layer: Path | None, logo: Path | None) -> list[str]:
+    paths = {"layer": layer, "logo": logo}
+    args: list[str] = []
+    for kind in plan.extra_inputs:
+        args += ["-i", str(paths[kind])]
+    return args
+
+
+@dataclass
+class FanoutTarget:
+    config: RenderConfig
+    plan: FilterPlan
+    inner_w: int
+    inner_h: int
+    layer: Path | None = None
+    logo: Path | None = None
+
+
+def cover_filter(width: int, height: int) -> str:
+    # Scale to cover the target and crop the overflow evenly, so a source of
+    # another aspect ratio (e.g. framed vs. unframed) is never stretched.
+    return (
+        f"scale={width}:{height}:force_original_aspect_ratio=increase,"
+        f"crop={width}:{height},setsar=1"
+    )
+
+
+def fanout_filter(
+    targets: list[FanoutTarget],
+    *,
+    src_w: int,
+    src_h: int,
+    tap_source: bool = False,
+) -> tuple[FilterGraph, list[str], str | None, list[Path]]:
+    branches = len(targets) + (1 if tap_source else 0)
+    graph = FilterGraph().add("0:v", f"split={branches}", [f"src{i}" for i in range(branches)])
+    outputs: list[str] = []
+    extra_paths: list[Path] = []
+    for i, target in enumerate(targets):
+        prefix = f"v{i}_"
+        source = f"src{i}"
+        if (target.inner_w, target.inner_h) != (src_w, src_h):
+            graph.add(source, cover_filter(target.inner_w, target.inner_h), f"{prefix}in")
+            source = f"{prefix}in"
+        # Renumber each plan's layer/logo inputs onto the shared input list.
+        streams = {"0:v": source}
+        for j, kind in enumerate(target.plan.extra_inputs, start=1):
+            path = target.logo if kind == "logo" else target.layer
+            assert path is not None
+            if path not in extra_paths:
+                extra_paths.append(path)
+            streams[f"{j}:v"] = f"{extra_paths.index(path) + 1}:v"
+        graph.extend(target.plan.graph.relabel(prefix, streams))
+        outputs.append(prefix + target.plan.output)
+    # The extra branch carries the untouched Gource frames (for the master).
+    tap = f"src{len(targets)}" if tap_source else None
+    return graph, outputs, tap, extra_paths
+
+
+def fanout_cmd(
+    config: RenderConfig,
+    targets: list[FanoutTarget],
+    *,
+    src_w: int,
+    src_h: int,
+    source: Path | None = None,
+    master: Path | None = None,
+) -> list[str]:
+    graph, labels, tap, extra_paths = fanout_filter(
+        targets, src_w=src_w, src_h=src_h, tap_source=master is not None
+    )
+    graph.validate(inputs=1 + len(extra_paths), outputs=[*labels, *([tap] if tap else [])])
+    cmd = ["ffmpeg", "-y"]
+    cmd += ["-i", str(source)] if source else frame_input_args(config, src_w, src_h)
+    for path in extra_paths:
+        cmd += ["-i", str(path)]
+    cmd += ["-filter_complex", graph.compile()]
+    for target, label in zip(targets, labels, strict=True):
+        target.config.output.parent.mkdir(parents=True, exist_ok=True)
+        cmd += ["-map", f"[{label}]", *encoder_args(target.config), str(target.config.output)]
+    if master is not None:
+        cmd += ["-map", f"[{tap}]", *MASTER_ENCODER_ARGS, "-f", "matroska", str(master)]
+    return cmd
+
+
+def master_key(config: RenderConfig, devlog: Path) -> str:
+    # Only what changes the Gource frames; templates, legends and logos are
+    # applied afterwards and may differ between renders sharing a master.
+    params = {
+        "fps": config.fps,
+        "title": config.title,
+        "system_log": bool(config.system_log),
+        "seconds_per_day": config.seconds_per_day,
+        "time_scale": config.time_scale,
+        "user_scale": config.user_scale,
+        "auto_skip": config.auto_skip,
+    }
+    return render_key(params, devlog)
+
+
+async def run_gource_pipeline(
+    supervisor: Supervisor,
+    *,
+    width: int,
+    height: int,
+    gource_cmd: list[str],
+    ffmpeg_cmd: list[str],
+    relay: Sequence[ProcessSpec] = (),
+) -> None:
+    async with DISPLAY_POOL.lease(width, height) as display:
+        env = display.env()
+        if supervisor.cpus:
+            env = {**env, "LP_NUM_THREADS": str(gource_gl_threads(supervisor.cpus))}
+        await supervisor.run_pipeline(
+            [
+                ProcessSpec("gource", gource_cmd, env=env),
+                *relay,
+                ProcessSpec("ffmpeg", ffmpeg_cmd),
+            ]
         )
 
-        hide_flags = "mouse,date,filenames" if config.system_log else "usernames,mouse,date,filenames"
 
-        if use_quad_multi:
-            console.print(f"Quad mode: using 4 distinct repos ({' '.join(quad_repo_names)})")
-            tmp_videos: list[Path] = []
-            for i in range(4):
-                qv = workdir / f"quad-src-{i}.mp4"
-                tmp_videos.append(qv)
-
-                gource_cmd = (
-                    "SDL_VIDEODRIVER=x11 xvfb-run -a -s '-screen 0 {w}x{h}x24' gource "
-                    "--seconds-per-day {spd} --user-scale {us} --time-scale {ts} --auto-skip-seconds {as_} "
-                    "--title '{title} — {repo}' --background-colour 000000 --font-colour FFFFFF "
-                    "--camera-mode overview --hide {hide_flags} --font-size 42 "
-                    "--dir-name-depth 3 --filename-time 2 --max-user-speed 500 --bloom-multiplier 1.2 "
-                    "--{iw}x{ih} --stop-at-end '{log}' -r {fps} -o -"
-                ).format(
-                    w=width,
-                    h=height,
-                    spd=config.seconds_per_day,
-                    us=config.user_scale,
-                    ts=config.time_scale,
-                    as_=config.auto_skip,
-                    title=config.title,
-                    repo=quad_repo_names[i],
-                    hide_flags=hide_flags,
-                    iw=inner_w,
-                    ih=inner_h,
-                    log=repo_logs[i],
-                    fps=config.fps,
-                )
-                ffmpeg_cmd = (
-                    "ffmpeg -y -r {fps} -f image2pipe -probesize 100M -i - "
-                    "-vcodec libx264 -pix_fmt yuv420p -crf {crf} -preset {preset} -bf 0 '{out}'"
-                ).format(fps=config.fps, crf=config.crf, preset=config.preset, out=qv)
-                sh(f"{gource_cmd} | {ffmpeg_cmd}")
-
-            cmd = ["ffmpeg", "-y"]
-            for qv in tmp_videos:
-                cmd += ["-i", str(qv)]
-            if logo_file:
-                cmd += ["-i", str(logo_file)]
-            cmd += [
-                "-filter_complex",
-                complex_filter,
-                "-map",
-                f"[{final_label or 'outv'}]",
-                "-vcodec",
-                "libx264",
-                "-pix_fmt",
-                "yuv420p",
-                "-crf",
-                str(config.crf),
-                "-preset",
-                config.preset,
-                "-bf",
+# Settings that do not change the rendered segments.
+SEGMENT_KEY_IGNORED = {
+    "output",
+    "job_dir",
+    "timeout",
+    "variants",
+    "master",
+    "master_rescale",
+    "cpus",
+    "transport",
+}
+
+
+def prepare_segment_job(config: RenderConfig, logs: PreparedLogs) -> tuple[Path, SegmentManifest]:
+    params = {k: v for k, v in asdict(config).items() if k not in SEGMENT_KEY_IGNORED}
+    key = render_key(params, logs.devlog)
+    job_dir = config.job_dir or RENDER_JOBS_DIR / key
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest = SegmentManifest.load(job_dir)
+    if manifest is not None and manifest.key == key:
+        return job_dir, manifest
+
+    for stale in segment_files(job_dir):
+        stale.unlink()
+    stored_log = job_dir / "development.log"
+    if logs.devlog != stored_log:
+        shutil.copy(logs.devlog, stored_log)
+    # The per-repo logs feed relation signals and legend data, so a resumed
+    # render keeps them too.
+    repo_logs: list[str] = []
+    for index, repo_log in enumerate(logs.repo_logs):
+        stored = job_dir / f"repo-{index:02d}.log"
+        if repo_log != stored:
+            shutil.copy(repo_log, stored)
+        repo_logs.append(stored.name)
+    binlog = BinaryLog.write(job_dir / "development.evlog", LogTable.load(stored_log))
+    boundaries = plan_boundaries(
+        binlog,
+        config.segments,
+        seconds_per_day=config.seconds_per_day,
+        time_scale=config.time_scale,
+        auto_skip=config.auto_skip,
+    )
+    manifest = SegmentManifest(
+        key=key,
+        devlog=stored_log.name,
+        repo_names=logs.repo_names,
+        repo_logs=repo_logs,
+        segments=write_segment_logs(binlog, boundaries, job_dir),
+    )
+    manifest.save(job_dir)
+    return job_dir, manifest
+
+
+def load_resumable_logs(config: RenderConfig) -> PreparedLogs | None:
+    # Only an explicit --job-dir can skip log collection: its stored log pins the
+    # input, which matters for system logs whose time window keeps moving.
+    if config.job_dir is None:
+        return None
+    manifest = SegmentManifest.load(config.job_dir)
+    if manifest is None or not (config.job_dir / manifest.devlog).is_file():
+        return None
+    console.print(f"Resuming from [cyan]{config.job_dir}[/cyan]")
+    return PreparedLogs(
+        devlog=config.job_dir / manifest.devlog,
+        repo_names=manifest.repo_names,
+        repo_logs=[config.job_dir / name for name in manifest.repo_logs],
+    )
+
+
+async def render_segments(
+    supervisor: Supervisor,
+    config: RenderConfig,
+    *,
+    job_dir: Path,
+    manifest: SegmentManifest,
+    width: int,
+    height: int,
+    inner_w: int,
+    inner_h: int,
+    encode_cmd: Callable[[Path], list[str]],
+) -> None:
+    total = len(manifest.segments)
+    done = total - len(manifest.pending())
+    if done:
+        console.print(f"Segments: {done}/{total} already rendered, resuming")
+
+    for seg in manifest.pending():
+        console.print(f"Segment {seg.index + 1}/{total}")
+        part = job_dir / f"seg-{seg.index:03d}.part.mp4"
+        await run_gource_pipeline(
+            supervisor,
+            width=width,
+            height=height,
+            gource_cmd=gource_args(
+                config,
+                title=config.title,
+                log=job_dir / seg.log,
+                inner_w=inner_w,
+                inner_h=inner_h,
+            ),
+            ffmpeg_cmd=encode_cmd(part),
+            relay=frame_relay(config, inner_w, inner_h),
+        )
+        os.replace(part, job_dir / seg.file)
+        seg.done = True
+        manifest.save(job_dir)
+
+    listing = concat_list(job_dir, manifest)
+    await supervisor.run(
+        ProcessSpec(
+            "ffmpeg",
+            [
+                "ffmpeg",
+                "-y",
+                "-f",
+                "concat",
+                "-safe",
                 "0",
+                "-i",
+                str(listing),
+                "-c",
+                "copy",
                 str(config.output),
-            ]
-            run(cmd)
-        else:
-            pipe = workdir / "gource.pipe"
-            run(["mkfifo", str(pipe)])
-            gource_cmd = (
-                "SDL_VIDEODRIVER=x11 xvfb-run -a -s '-screen 0 {w}x{h}x24' gource "
-                "--seconds-per-day {spd} --user-scale {us} --time-scale {ts} --auto-skip-seconds {as_} "
-                "--title '{title}' --background-colour 000000 --font-colour FFFFFF --camera-mode overview "
-                "--hide {hide_flags} --font-size 42 --dir-name-depth 3 --filename-time 2 "
-                "--max-user-speed 500 --bloom-multiplier 1.2 --{iw}x{ih} --stop-at-end '{log}' -r {fps} -o - > '{pipe}'"
-            ).format(
-                w=width,
-                h=height,
-                spd=config.seconds_per_day,
-                us=config.user_scale,
-                ts=config.time_scale,
-                as_=config.auto_skip,
-                title=config.title,
-                hide_flags=hide_flags,
-                iw=inner_w,
-                ih=inner_h,
-                log=devlog,
-                fps=config.fps,
-                pipe=pipe,
+            ],
+        )
+    )
+    remove_job_files(job_dir)
+
+
+async def render_via_master(
+    supervisor: Supervisor,
+    config: RenderConfig,
+    *,
+    targets: list[FanoutTarget],
+    devlog: Path,
+    width: int,
+    height: int,
+    inner_w: int,
+    inner_h: int,
+) -> None:
+    # Masters hold the Gource output at the largest target's inner size, so
+    # that target matches a normal render exactly; other templates at that size
+    # reuse it as is, and --master-rescale derives other sizes with cover_filter.
+    key = await asyncio.to_thread(master_key, config, devlog)
+    found = find_master(key, inner_w, inner_h, rescale=config.master_rescale)
+    if found is not None:
+        master, src_w, src_h = found
+        touch_master(master)
+        console.print(f"Reusing master [cyan]{master}[/cyan]; skipping Gource")
+        await supervisor.run(
+            ProcessSpec(
+                "ffmpeg",
+                fanout_cmd(
+                    config,
+                    targets,
+                    src_w=src_w,
+                    src_h=src_h,
+                    source=master,
+                ),
             )
-            gource_proc = subprocess.Popen(["bash", "-lc", gource_cmd])
+        )
+        return
+
+    master = master_path(key, inner_w, inner_h)
+    master.parent.mkdir(parents=True, exist_ok=True)
+    part = master_part(master)
+    try:
+        await run_gource_pipeline(
+            supervisor,
+            width=width,
+            height=height,
+            gource_cmd=gource_args(
+                config, title=config.title, log=devlog, inner_w=inner_w, inner_h=inner_h
+            ),
+            ffmpeg_cmd=fanout_cmd(
+                config,
+                targets,
+                src_w=inner_w,
+                src_h=inner_h,
+                master=part,
+            ),
+            relay=frame_relay(config, inner_w, inner_h),
+        )
+        os.replace(part, master)
+    finally:
+        part.unlink(missing_ok=True)
+    await asyncio.to_thread(evict_masters, keep=master)
+
+
+def render(config: RenderConfig) -> None:
+    asyncio.run(render_async(config))
+
+
+async def render_async(
+    config: RenderConfig,
+    *,
+    echo_stderr: bool = True,
+    logs: PreparedLogs | None = None,
+    on_stage: Callable[[str], None] | None = None,
+    on_logs: Callable[[PreparedLogs], None] | None = None,
+) -> None:
+    for bin_name in ["gource", "ffmpeg", "Xvfb"]:
+        require_bin(bin_name)
+    if not config.system_log:
+        require_bin("git")
+
+    width, height = RESOLUTION_MAP[config.resolution]
+    if config.fps not in ALLOWED_FPS:
+        raise typer.BadParameter("Unsupported fps (supported: 25, 30, 60)")
+
+    if config.template not in TEMPLATES:
+        raise typer.BadParameter(f"Unsupported template: {config.template}")
+
+    sync_timing = resolve_sync_timing(config)
+
+    segmented = config.segments > 1
+    if segmented and config.template == "split-quad" and config.multi_dir:
+        console.print("[yellow]Warning:[/yellow] --segments is not supported for multi-repo quad")
+        segmented = False
+    if config.master and (segmented or (config.template == "split-quad" and config.multi_dir)):
+        console.print(
+            "[yellow]Warning:[/yellow] --master is ignored for segmented and quad renders"
+        )
+    if config.variants:
+        if segmented:
+            raise typer.BadParameter("--variant cannot be combined with --segments")
+        if config.template == "split-quad" and config.multi_dir:
+            raise typer.BadParameter("--variant is not supported for multi-repo quad")
+        for variant in config.variants:
+            if variant.template and variant.template not in TEMPLATES:
+                raise typer.BadParameter(f"Unsupported template: {variant.template}")
+
+    supervisor = Supervisor(echo_stderr=echo_stderr, cpus=config.cpus)
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        workdir = Path(tmp)
+        if on_stage is not None:
+            on_stage("collecting logs")
+        if logs is None and segmented:
+            logs = load_resumable_logs(config)
+        if logs is None:
+            logs = await supervisor.run_in_thread(prepare_logs, config, workdir, sync_timing)
+        if on_logs is not None:
+            await asyncio.to_thread(on_logs, logs)
+        if on_stage is not None:
+            on_stage("rendering")
+        devlog = logs.devlog
+        repo_names = logs.repo_names
+        repo_logs = logs.repo_logs
+
+        if config.target_duration:
+            config = await asyncio.to_thread(apply_target_duration, config, devlog)
+
+        frame = frame_for_template(config.template)
+        inner_w = width - (frame * 2)
+        inner_h = height - (frame * 2)
+
+        use_quad_multi = (
+            config.template == "split-quad" and config.multi_dir is not None and len(repo_logs) >= 4
+        )
+        quad_repo_names = repo_names[:4] if use_quad_multi else []
+        if use_quad_multi:
+            repo_names = quad_repo_names
 
+        logo_file: Path | None = None
+        if config.logo:
             try:
-                if use_complex:
-                    cmd = [
-                        "ffmpeg",
-                        "-y",
-                        "-r",
-                        str(config.fps),
-                        "-f",
-                        "image2pipe",
-                        "-probesize",
-                        "100M",
-                        "-i",
-                        str(pipe),
-                    ]
-                    if logo_file:
-                        cmd += ["-i", str(logo_file)]
-                    cmd += [
-                        "-filter_complex",
-                        complex_filter,
-                        "-map",
-                        f"[{final_label or 'outv'}]",
-                        "-vcodec",
-                        "libx264",
-                        "-pix_fmt",
-                        "yuv420p",
-                        "-crf",
-                        str(config.crf),
-                        "-preset",
-                        config.preset,
-                        "-bf",
-                        "0",
-                        str(config.output),
-                    ]
+                logo_file = await asyncio.to_thread(fetch_asset, config.logo)
+            except AssetError as exc:
+                raise typer.BadParameter(str(exc)) from exc
+
+        plan = build_filter_plan(
+            config,
+            width=width,
+            height=height,
+            frame=frame,
+            devlog=devlog,
+            repo_names=repo_names,
+            sync_timing=sync_timing,
+            repo_logs=repo_logs,
+            quad_multi=use_quad_multi,
+            logo_file=logo_file,
+        )
+
+        # Every fan-out output shares one Gource run, rendered at the largest
+        # inner size so the smaller variants only ever scale down.
+        targets = [FanoutTarget(config, plan, inner_w, inner_h)]
+        for variant in config.variants:
+            vcfg = variant_config(config, variant)
+            v_width, v_height = RESOLUTION_MAP[vcfg.resolution]
+            v_frame = frame_for_template(vcfg.template)
+            v_plan = build_filter_plan(
+                vcfg,
+                width=v_width,
+                height=v_height,
+                frame=v_frame,
+                devlog=devlog,
+                repo_names=repo_names,
+                sync_timing=sync_timing,
+                repo_logs=repo_logs,
+                logo_file=logo_file,
+            )
+            targets.append(
+                FanoutTarget(vcfg, v_plan, v_width - (v_frame * 2), v_height - (v_frame * 2))
+            )
+        source = max(targets, key=lambda t: t.inner_w * t.inner_h)
+        display_w, display_h = RESOLUTION_MAP[source.config.resolution]
+
+        console.print(f"Rendering: [green]{config.output}[/green]")
+        console.print(
+            f"Resolution: {width}x{height} ({config.resolution}), fps={config.fps}, "
+            f"template={config.template}, sync={sync_timing}"
+        )
+        if config.variants:
+            console.print(f"Fan-out: {len(targets)} outputs from one Gource run")
+
+        try:
+            async with asyncio.timeout(config.timeout):
+                await rasterize_layers(supervisor, targets, workdir)
+                if logo_file is not None:
+                    await prepare_logos(supervisor, targets, logo_file)
+                layer_file = targets[0].layer
+                logo_input = targets[0].logo
+                if use_quad_multi:
+                    console.print(
+                        f"Quad mode: using 4 distinct repos ({' '.join(quad_repo_names)})"
+                    )
+                    tmp_videos: list[Path] = []
+                    for i in range(4):
+                        qv = workdir / f"quad-src-{i}.mp4"
+                        tmp_videos.append(qv)
+                        await run_gource_pipeline(
+                            supervisor,
+                            width=width,
+                            height=height,
+                            gource_cmd=gource_args(
+                                config,
+                                title=f"{config.title} — {quad_repo_names[i]}",
+                                log=repo_logs[i],
+                                inner_w=inner_w,
+                                inner_h=inner_h,
+                            ),
+                            ffmpeg_cmd=[
+                                "ffmpeg",
+                                "-y",
+                                *frame_input_args(config, inner_w, inner_h),
+                                *encoder_args(config),
+                                str(qv),
+                            ],
+                            relay=frame_relay(config, inner_w, inner_h),
+                        )
+
+                    cmd = ["ffmpeg", "-y"]
+                    for qv in tmp_videos:
+                        cmd += ["-i", str(qv)]
+                    cmd += extra_input_args(plan, layer=layer_file, logo=logo_input)
+                    cmd += [*filter_args(plan), *encoder_args(config), str(config.output)]
+                    await supervisor.run(ProcessSpec("ffmpeg", cmd))
                 else:
-                    cmd = [
-                        "ffmpeg",
-                        "-y",
-                        "-r",
-                        str(config.fps),
-                        "-f",
-                        "image2pipe",
-                        "-probesize",
-                        "100M",
-                        "-i",
-                        str(pipe),
-                    ]
-                    if base_filter:
-                        cmd += ["-vf", base_filter]
-                    cmd += [
-                        "-vcodec",
-                        "libx264",
-                        "-pix_fmt",
-                        "yuv420p",
-                        "-crf",
-                        str(config.crf),
-                        "-preset",
-                        config.preset,
-                        "-bf",
-                        "0",
-                        str(config.output),
-                    ]
-                run(cmd)
-            finally:
-                gource_proc.wait()
-
-        console.print(f"[bold green]Done:[/bold green] {config.output}")
+
+                    def encode_cmd(output: Path) -> list[str]:
+                        cmd = ["ffmpeg", "-y", *frame_input_args(config, inner_w, inner_h)]
+                        cmd += extra_input_args(plan, layer=layer_file, logo=logo_input)
+                        return [*cmd, *filter_args(plan), *encoder_args(config), str(output)]
+
+                    if segmented:
+                        job_dir, manifest = await asyncio.to_thread(
+                            prepare_segment_job, config, logs
+                        )
+                        await render_segments(
+                            supervisor,
+                            config,
+                            job_dir=job_dir,
+                            manifest=manifest,
+                            width=width,
+                            height=height,
+                            inner_w=inner_w,
+                            inner_h=inner_h,
+                            encode_cmd=encode_cmd,
+                        )
+                    elif config.master:
+                        await render_via_master(
+                            supervisor,
+                            config,
+                            targets=targets,
+                            devlog=devlog,
+                            width=display_w,
+                            height=display_h,
+                            inner_w=source.inner_w,
+                            inner_h=source.inner_h,
+                        )
+                    else:
+                        await run_gource_pipeline(
+                            supervisor,
+                            width=display_w,
+                            height=display_h,
+                            gource_cmd=gource_args(
+                                config,
+                                title=config.title,
+                                log=devlog,
+                                inner_w=source.inner_w,
+                                inner_h=source.inner_h,
+                            ),
+                            ffmpeg_cmd=fanout_cmd(
+                                config,
+                                targets,
+                                src_w=source.inner_w,
+                                src_h=source.inner_h,
+                            )
+                            if config.variants
+                            else encode_cmd(config.output),
+                            relay=frame_relay(config, source.inner_w, source.inner_h),
+                        )
+        except TimeoutError:
+            raise RuntimeError(f"Render timed out after {config.timeout:g}s") from None
+
+        for target in targets:
+            console.print(f"[bold green]Done:[/bold green] {target.config.output}")
 
 
 @app.command(context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
@@ -791,6 +1501,12 @@ def cli(
     template: str = typer.Option(DEFAULT_TEMPLATE, "--template"),
     logo: str | None = typer.Option(None, "--logo"),
     multi_dir: Path | None = typer.Option(None, "--multi-dir"),
+    multi_depth: int = typer.Option(
+        DEFAULT_MULTI_DEPTH, "--multi-depth", help="Levels below --multi-dir searched for repos"
+    ),
+    multi_ignore: list[str] | None = typer.Option(
+        None, "--multi-ignore", help="Skip directories matching this glob (name or path)"
+    ),
     system_log: SystemLogSource | None = typer.Option(None, "--system-log"),
     system_log_since: str = typer.Option("24 hours ago", "--system-log-since"),
     system_log_limit: int = typer.Option(5000, "--system-log-limit"),
@@ -798,12 +1514,31 @@ def cli(
     sync_span: int = typer.Option(31536000, "--sync-span"),
     legend: LegendMode = typer.Option("auto", "--legend"),
     legend_limit: int = typer.Option(8, "--legend-limit"),
-    seconds_per_day: float = typer.Option(0.12, "--seconds-per-day"),
-    time_scale: float = typer.Option(1.6, "--time-scale"),
+    seconds_per_day: float = typer.Option(DEFAULT_SECONDS_PER_DAY, "--seconds-per-day"),
+    time_scale: float = typer.Option(DEFAULT_TIME_SCALE, "--time-scale"),
     user_scale: float = typer.Option(1.35, "--user-scale"),
-    auto_skip: float = typer.Option(0.5, "--auto-skip"),
+    auto_skip: float = typer.Option(DEFAULT_AUTO_SKIP, "--auto-skip"),
     crf: int = typer.Option(22, "--crf"),
     preset: str = typer.Option("medium", "--preset"),
+    target_duration: float | None = typer.Option(None, "--target-duration"),
+    target_tolerance: float = typer.Option(DEFAULT_TOLERANCE, "--target-tolerance"),
+    timeout: float | None = typer.Option(None, "--timeout"),
+    segments: int = typer.Option(1, "--segments"),
+    job_dir: Path | None = typer.Option(None, "--job-dir"),
+    variant: list[str] | None = typer.Option(None, "--variant"),
+    master: bool = typer.Option(False, "--master"),
+    master_rescale: bool = typer.Option(
+        False, "--master-rescale", help="Also reuse larger masters, scaled and cropped to fit"
+    ),
+    relation_signals: bool = typer.Option(False, "--relation-signals"),
+    sync_mapping: SyncMapping = typer.Option("linear", "--sync-mapping"),
+    cpus: str | None = typer.Option(None, "--cpus", help="Pin Gource/ffmpeg to cores, e.g. 0-3"),
+    transport: FrameTransport = typer.Option(
+        "raw", "--transport", help="Gource -> ffmpeg frames: headerless rawvideo or PPM stream"
+    ),
+    plan: bool = typer.Option(
+        False, "--plan", help="Collect logs and print the pacing, filter graph and estimates only"
+    ),
 ) -> None:
     """Render Git history videos with Gource + FFmpeg."""
     if system_log and (multi_dir or repo):
@@ -818,6 +1553,25 @@ def cli(
         raise typer.BadParameter("--legend-limit must be >= 1")
     if system_log_limit < 1:
         raise typer.BadParameter("--system-log-limit must be >= 1")
+    if target_duration is not None and target_duration <= 0:
+        raise typer.BadParameter("--target-duration must be > 0")
+    if not 0 < target_tolerance < 1:
+        raise typer.BadParameter("--target-tolerance must be between 0 and 1")
+    if timeout is not None and timeout <= 0:
+        raise typer.BadParameter("--timeout must be > 0")
+    if segments < 1:
+        raise typer.BadParameter("--segments must be >= 1")
+    if multi_depth < 1:
+        raise typer.BadParameter("--multi-depth must be >= 1")
+    core_set: tuple[int, ...] | None = None
+    if cpus is not None:
+        try:
+            core_set = parse_cpu_list(cpus)
+        except ValueError as exc:
+            raise typer.BadParameter(f"--cpus: {exc}") from exc
+        unusable = set(core_set) - set(available_cpus())
+        if unusable:
+            raise typer.BadParameter(f"--cpus: not available here: {sorted(unusable)}")
 
     cfg = RenderConfig(
         output=output,
@@ -841,11 +1595,35 @@ def cli(
         auto_skip=auto_skip,
         crf=crf,
         preset=preset,
+        target_duration=target_duration,
+        target_tolerance=target_tolerance,
+        timeout=timeout,
+        segments=segments,
+        job_dir=job_dir,
+        variants=[parse_variant(spec) for spec in variant or []],
+        master=master or master_rescale,
+        master_rescale=master_rescale,
+        relation_signals=relation_signals,
+        sync_mapping=sync_mapping,
+        cpus=core_set,
+        transport=transport,
+        multi_depth=multi_depth,
+        multi_ignore=tuple(multi_ignore or ()),
     )
+    if plan:
+        from .planner import plan_render, print_plan
+
+        print_plan(plan_render(cfg))
+        return
     render(cfg)
 
 
 def main() -> None:
+    if sys.argv[1:2] == ["batch"]:
+        from .batch import batch_app
+
+        batch_app(args=sys.argv[2:], prog_name="envisaged batch")
+        return
     app()
 
 
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import math
+import os
+import resource
+import socket
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .affinity import CoreAllocator
+from .cli import RESOLUTION_MAP, PreparedLogs, RenderConfig
+from .jobstore import ClaimedJob, HostLoad, RepoSource, WorkerQueue
+from .pacing import LogTimeline, estimate_duration, read_log_timeline, tune_pacing
+from .paths import CACHE_DIR
+from .templates import TEMPLATES
+
+CALIBRATION_PATH = Path(
+    os.environ.get("ENVISAGED_COST_MODEL") or CACHE_DIR / "cost-calibration.json"
+)
+# Weight of the newest timing in the per-kind running averages.
+CALIBRATION_ALPHA = 0.3
+MAX_SOURCES = 500
+
+# Priors used until a kind of render has been timed on this host.
+DEFAULT_SECONDS_PER_MPIX_FRAME = 0.015
+DEFAULT_BYTES_PER_MPIX_FRAME = 4000.0
+DEFAULT_VIDEO_SECONDS = 60.0
+LOG_SECONDS_PER_EVENT = 2e-5
+# Gource keeps roughly one core busy; the encoder about one more per 720p of
+# frame area.
+REFERENCE_PIXELS = 1280 * 720
+# A multi-repo quad renders four full-size Gource passes plus the composite.
+QUAD_PASSES = 5
+# x264 output roughly halves for every +6 CRF; sizes are calibrated at this CRF.
+REFERENCE_CRF = 22
+
+# Memory: Gource grows with the file tree, x264 holds lookahead and reference
+# frames, Xvfb one framebuffer, and with the PPM transport the image2pipe
+# demuxer probes up to 100 MB.
+GOURCE_BASE_MB = 150.0
+GOURCE_BYTES_PER_EVENT = 512
+ENCODER_BASE_MB = 80.0
+ENCODER_FRAME_BUFFERS = 60
+PIPE_PROBE_MB = 100.0
+
+# Jobs behind the head of the queue are admitted around it for at most this
+# long; after that nothing new starts until the head job fits.
+HEAD_WAIT_SECONDS = 300.0
+ADMISSION_LOOKAHEAD = 8
+# Processes reporting the same host id share one budget; override it for
+# containers that share a machine but not a hostname.
+HOST_ID = os.environ.get("ENVISAGED_HOST_ID") or socket.gethostname()
+
+
+@dataclass(frozen=True)
+class RenderCost:
+    cores: float
+    memory_mb: float
+    seconds: float
+    output_mb: float = 0.0
+
+
+@dataclass(frozen=True)
+class Budget:
+    cores: float
+    memory_mb: float
+
+    @classmethod
+    def from_host(cls) -> Budget:
+        cores = os.environ.get("ENVISAGED_CPU_BUDGET")
+        memory = os.environ.get("ENVISAGED_MEMORY_BUDGET_MB")
+        return cls(
+            cores=float(cores) if cores else float(_host_cores()),
+            memory_mb=float(memory) if memory else _host_memory_mb() * 0.8,
+        )
+
+
+def _host_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _host_memory_mb() -> float:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**20
+    except (ValueError, OSError):
+        return 4096.0
+
+
+def _children_cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def render_kind(config: RenderConfig, source: RepoSource | None = None) -> str:
+    multi = config.multi_dir is not None or (source is not None and source.mode == "multi")
+    if config.template == "split-quad" and multi:
+        return "quad"
+    if config.system_log:
+        return "system"
+    template = TEMPLATES.get(config.template)
+    return template.kind if template is not None else "core"
+
+
+def source_key(config: RenderConfig, source: RepoSource | None = None) -> str:
+    if config.system_log:
+        return f"system:{config.system_log}:{config.system_log_since}:{config.system_log_limit}"
+    if source is not None and source.mode == "single":
+        return f"repo:{source.repo.strip()}"
+    if source is not None and source.mode == "multi":
+        entries = " ".join(line.strip() for line in source.multi_repos.splitlines() if line.strip())
+        return f"multi:{entries or source.multi_dir}"
+    if config.multi_dir is not None:
+        return f"multi:{config.multi_dir}"
+    return f"repo:{config.input_repo or '.'}"
+
+
+def _video_per_day(config: RenderConfig) -> float:
+    return config.seconds_per_day / max(config.time_scale, 1e-9)
+
+
+def _crf_factor(crf: int) -> float:
+    return 2 ** ((REFERENCE_CRF - crf) / 6)
+
+
+class CostModel:
+    """Per-render resource estimates, calibrated from timed renders on this host.
+
+    Seconds and output size scale with megapixel-frames (output area x fps x
+    video length) at per-kind rates learned from finished jobs; cores and memory come from the
+    frame size and event count, with the core estimate rescaled by the CPU use
+    observed on renders that ran alone. Sources rendered before remember their
+    log size so queued jobs can be costed before their logs exist.
+    """
+
+    def __init__(self, path: Path = CALIBRATION_PATH) -> None:
+        self.path = path
+        self._data = self._load()
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            data = {}
+        data.setdefault("kinds", {})
+        data.setdefault("sources", {})
+        return data
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self._data, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def kind_stats(self, kind: str) -> dict[str, float]:
+        stats = self._data["kinds"].get(kind, {})
+        return {
+            "seconds_per_mpix_frame": stats.get(
+                "seconds_per_mpix_frame", DEFAULT_SECONDS_PER_MPIX_FRAME
+            ),
+            "cpu_scale": stats.get("cpu_scale", 1.0),
+            "bytes_per_mpix_frame": stats.get("bytes_per_mpix_frame", DEFAULT_BYTES_PER_MPIX_FRAME),
+            "samples": stats.get("samples", 0),
+            "size_samples": stats.get("size_samples", 0),
+        }
+
+    def video_seconds(
+        self,
+        config: RenderConfig,
+        source: RepoSource | None = None,
+        timeline: LogTimeline | None = None,
+    ) -> float:
+        if config.target_duration and timeline is not None:
+            # The tuned pace can miss the target when Gource limits are hit.
+            try:
+                pacing = tune_pacing(
+                    timeline,
+                    target_seconds=config.target_duration,
+                    time_scale=config.time_scale,
+                    auto_skip=config.auto_skip,
+                    tolerance=config.target_tolerance,
+                )
+            except ValueError:
+                return config.target_duration
+            return pacing.estimated_seconds
+        if config.target_duration:
+            return config.target_duration
+        if timeline is not None:
+            seconds = estimate_duration(
+                timeline,
+                seconds_per_day=config.seconds_per_day,
+                time_scale=config.time_scale,
+                auto_skip=config.auto_skip,
+            )
+            return seconds or DEFAULT_VIDEO_SECONDS
+        known = self._data["sources"].get(source_key(config, source))
+        if known is None:
+            return DEFAULT_VIDEO_SECONDS
+        # Rendered before at another pace: scale by the pace ratio, capped by
+        # the same auto-skip ceiling.
+        scaled = known["video_seconds"] * _video_per_day(config) / known["video_per_day"]
+        return min(
+            scaled, known["video_seconds"] * max(config.auto_skip, 1e-9) / known["auto_skip"]
+        )
+
+    def _events(
+        self, config: RenderConfig, source: RepoSource | None, timeline: LogTimeline | None
+    ) -> int:
+        if timeline is not None:
+            return timeline.events
+        known = self._data["sources"].get(source_key(config, source))
+        return known["events"] if known is not None else 0
+
+    def estimate(
+        self,
+        config: RenderConfig,
+        source: RepoSource | None = None,
+        timeline: LogTimeline | None = None,
+        *,
+        video_seconds: float | None = None,
+    ) -> RenderCost:
+        width, height = RESOLUTION_MAP[config.resolution]
+        kind = render_kind(config, source)
+        stats = self.kind_stats(kind)
+        events = self._events(config, source, timeline)
+        passes = QUAD_PASSES if kind == "quad" else 1
+
+        if video_seconds is None:
+            video_seconds = self.video_seconds(config, source, timeline)
+        output_mpix_frames = width * height * config.fps * video_seconds / 1e6
+        mpix_frames = output_mpix_frames * passes
+        seconds = stats["seconds_per_mpix_frame"] * mpix_frames + events * LOG_SECONDS_PER_EVENT
+        output_bytes = stats["bytes_per_mpix_frame"] * output_mpix_frames * _crf_factor(config.crf)
+
+        cores = (1.0 + width * height / REFERENCE_PIXELS) * stats["cpu_scale"]
+        frame_mb = width * height * 1.5 / 2**20
+        memory_mb = (
+            GOURCE_BASE_MB
+            + events * GOURCE_BYTES_PER_EVENT / 2**20
+            + width * height * 4 / 2**20
+            + ENCODER_BASE_MB
+            + ENCODER_FRAME_BUFFERS * frame_mb
+            + (PIPE_PROBE_MB if config.transport == "ppm" else 0.0)
+        )
+        return RenderCost(
+            cores=max(cores, 1.0),
+            memory_mb=round(memory_mb, 1),
+            seconds=round(seconds, 1),
+            output_mb=round(output_bytes / 2**20, 1),
+        )
+
+    def record(
+        self,
+        config: RenderConfig,
+        source: RepoSource | None,
+        timeline: LogTimeline | None,
+        *,
+        seconds: float,
+        cpu_seconds: float | None = None,
+        output_bytes: int | None = None,
+    ) -> None:
+        # Merge with whatever other processes wrote since we loaded.
+        self._data = self._load()
+        kind = render_kind(config, source)
+        width, height = RESOLUTION_MAP[config.resolution]
+        events = timeline.events if timeline is not None else 0
+        passes = QUAD_PASSES if kind == "quad" else 1
+        video_seconds = self.video_seconds(config, source, timeline)
+        output_mpix_frames = width * height * config.fps * video_seconds / 1e6
+        mpix_frames = output_mpix_frames * passes
+
+        stats = self.kind_stats(kind)
+        alpha = CALIBRATION_ALPHA if stats["samples"] else 1.0
+        if mpix_frames > 0:
+            rate = max(seconds - events * LOG_SECONDS_PER_EVENT, 0.0) / mpix_frames
+            stats["seconds_per_mpix_frame"] += alpha * (rate - stats["seconds_per_mpix_frame"])
+        if cpu_seconds is not None and seconds > 0:
+            scale = (cpu_seconds / seconds) / (1.0 + width * height / REFERENCE_PIXELS)
+            stats["cpu_scale"] += alpha * (scale - stats["cpu_scale"])
+        if output_bytes and output_mpix_frames > 0:
+            size_alpha = CALIBRATION_ALPHA if stats["size_samples"] else 1.0
+            rate = output_bytes / (output_mpix_frames * _crf_factor(config.crf))
+            stats["bytes_per_mpix_frame"] += size_alpha * (rate - stats["bytes_per_mpix_frame"])
+            stats["size_samples"] += 1
+        stats["samples"] += 1
+        self._data["kinds"][kind] = stats
+
+        if timeline is not None and not config.target_duration:
+            sources = self._data["sources"]
+            key = source_key(config, source)
+            sources.pop(key, None)
+            sources[key] = {
+                "events": timeline.events,
+                "span_days": round(timeline.span_days, 3),
+                "video_seconds": round(video_seconds, 3),
+                "video_per_day": _video_per_day(config),
+                "auto_skip": max(config.auto_skip, 1e-9),
+            }
+            while len(sources) > MAX_SOURCES:
+                sources.pop(next(iter(sources)))
+        with contextlib.suppress(OSError):
+            self._save()
+
+
+@dataclass
+class _Running:
+    cost: RenderCost
+    shared: bool
+    started: float = 0.0
+    cpu_start: float = 0.0
+    timeline: LogTimeline | None = None
+
+
+class Admission:
+    """Starts queued renders while their estimated cost fits the host budget.
+
+    The first job always starts on an idle host, so a job larger than the whole
+    budget still runs (alone). Lighter jobs further down the queue may start
+    around a head job that does not fit, for up to ``head_wait`` seconds.
+    A job that starts while others run on the host is given a core set sized
+    to its estimate; one that starts alone is left unpinned to use every core.
+
+    With a ``ledger`` (the shared job store), running costs and core sets are
+    published per host, so every web and worker process on a machine admits
+    against what all of them are running rather than the whole budget each.
+    """
+
+    def __init__(
+        self,
+        model: CostModel,
+        budget: Budget,
+        *,
+        head_wait: float = HEAD_WAIT_SECONDS,
+        slots: int = 1,
+        ledger: WorkerQueue | None = None,
+        owner: str = "",
+        host: str = HOST_ID,
+    ) -> None:
+        self.model = model
+        self.budget = budget
+        self.head_wait = head_wait
+        self.cores = CoreAllocator(slots=slots)
+        self.ledger = ledger
+        self.owner = owner
+        self.host = host
+        self.running: dict[str, _Running] = {}
+        self._others: list[HostLoad] = []
+        self._head: tuple[str, float] | None = None
+
+    def refresh(self) -> None:
+        """Re-read what other processes on this host are running."""
+        if self.ledger is not None:
+            self._others = [
+                load for load in self.ledger.host_load(self.host) if load.owner != self.owner
+            ]
+
+    def used(self) -> RenderCost:
+        costs = [run.cost for run in self.running.values()]
+        return RenderCost(
+            cores=sum(cost.cores for cost in costs) + sum(load.cores for load in self._others),
+            memory_mb=sum(cost.memory_mb for cost in costs)
+            + sum(load.memory_mb for load in self._others),
+            seconds=max((cost.seconds for cost in costs), default=0.0),
+        )
+
+    def fits(self, cost: RenderCost) -> bool:
+        if not self.running and not self._others:
+            return True
+        used = self.used()
+        return (
+            used.cores + cost.cores <= self.budget.cores
+            and used.memory_mb + cost.memory_mb <= self.budget.memory_mb
+        )
+
+    def select(self, candidates: Sequence[ClaimedJob]) -> tuple[ClaimedJob, RenderCost] | None:
+        now = time.monotonic()
+        if candidates:
+            self.refresh()
+        for idx, candidate in enumerate(candidates):
+            cost = self.model.estimate(candidate.config, candidate.source)
+            if self.fits(cost):
+                if idx == 0:
+                    self._head = None
+                return candidate, cost
+            if idx == 0:
+                if self._head is None or self._head[0] != candidate.job.id:
+                    self._head = (candidate.job.id, now)
+                if now - self._head[1] > self.head_wait:
+                    return None
+        return None
+
+    def start(self, job_id: str, cost: RenderCost) -> None:
+        shared = bool(self.running)
+        for run in self.running.values():
+            run.shared = True
+        if shared or self._others:
+            self.cores.allocate(
+                job_id, math.ceil(cost.cores), busy=[load.cpus for load in self._others]
+            )
+        self.running[job_id] = _Running(cost=cost, shared=shared)
+        self._publish(job_id)
+
+    def _publish(self, job_id: str) -> None:
+        run = self.running.get(job_id)
+        if self.ledger is None or run is None:
+            return
+        self.ledger.set_load(
+            HostLoad(
+                job_id=job_id,
+                owner=self.owner,
+                host=self.host,
+                cores=run.cost.cores,
+                memory_mb=run.cost.memory_mb,
+                cpus=self.cores.owned(job_id) or (),
+            )
+        )
+
+    def cpus(self, job_id: str) -> tuple[int, ...] | None:
+        return self.cores.owned(job_id)
+
+    def begin(self, job_id: str) -> None:
+        # Called right before render_async; fetching is not part of the timing.
+        run = self.running[job_id]
+        run.started = time.monotonic()
+        run.cpu_start = _children_cpu_seconds()
+
+    def on_logs(
+        self, job_id: str, config: RenderConfig, source: RepoSource | None
+    ) -> Callable[[PreparedLogs], None]:
+        def refine(logs: PreparedLogs) -> None:
+            run = self.running.get(job_id)
+            if run is None:
+                return
+            run.timeline = read_log_timeline(logs.devlog)
+            run.cost = self.model.estimate(config, source, run.timeline)
+            self._publish(job_id)
+
+        return refine
+
+    def finish(
+        self,
+        job_id: str,
+        *,
+        config: RenderConfig | None = None,
+        source: RepoSource | None = None,
+    ) -> None:
+        """Release a job's budget; pass ``config`` to calibrate from a successful run."""
+        self.cores.release(job_id)
+        run = self.running.pop(job_id, None)
+        if run is not None and self.ledger is not None:
+            self.ledger.clear_load(job_id, self.owner)
+        if run is None or config is None or not run.started:
+            return
+        seconds = time.monotonic() - run.started
+        # RUSAGE_CHILDREN is process-wide, so CPU use is only attributable to
+        # renders that had the process to themselves.
+        cpu = None if run.shared else _children_cpu_seconds() - run.cpu_start
+        try:
+            output_bytes = config.output.stat().st_size
+        except OSError:
+            output_bytes = None
+        self.model.record(
+            config,
+            source,
+            run.timeline,
+            seconds=seconds,
+            cpu_seconds=cpu,
+            output_bytes=output_bytes,
+        )
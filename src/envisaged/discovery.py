@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import configparser
+import contextlib
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from .paths import CACHE_DIR
+
+MULTI_SCAN_DIR = CACHE_DIR / "multi-scan"
+DISCOVERY_WORKERS = max(1, int(os.environ.get("ENVISAGED_DISCOVERY_WORKERS", "8")))
+# Levels below --multi-dir searched for repos; 1 only looks at direct children.
+DEFAULT_MULTI_DEPTH = 3
+# Directories never descended into; patterns match the name or the path below
+# the multi dir.
+DEFAULT_IGNORE = (".*", "node_modules", "__pycache__")
+MAX_SCAN_INDEXES = 200
+
+RepoKind = Literal["repo", "linked", "bare"]  # linked: worktree or submodule (.git file)
+
+
+@dataclass(frozen=True)
+class FoundRepo:
+    name: str  # path below the multi dir, e.g. "org/service" or "app/vendor/lib"
+    path: Path
+    git_dir: Path
+    kind: RepoKind
+
+    @property
+    def slug(self) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "__", self.name)
+
+
+def git_dir_of(path: Path) -> tuple[Path, RepoKind] | None:
+    dotgit = path / ".git"
+    if dotgit.is_dir():
+        return dotgit, "repo"
+    if dotgit.is_file():
+        # Worktrees and submodules: ".git" is a file pointing at the real one.
+        with contextlib.suppress(OSError, ValueError):
+            text = dotgit.read_text(encoding="utf-8").strip()
+            if text.startswith("gitdir:"):
+                target = (path / text.removeprefix("gitdir:").strip()).resolve()
+                if target.is_dir():
+                    return target, "linked"
+        return None
+    if (path / "HEAD").is_file() and (path / "objects").is_dir() and (path / "refs").is_dir():
+        return path, "bare"
+    return None
+
+
+def head_fingerprint(git_dir: Path) -> str:
+    """The commit HEAD points at, read from the ref files without running git."""
+    try:
+        head = (git_dir / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+    if not head.startswith("ref:"):
+        return head
+    ref = head.removeprefix("ref:").strip()
+    common = git_dir
+    # Worktrees keep their own HEAD but share refs with the main repository.
+    with contextlib.suppress(OSError):
+        common = (git_dir / (git_dir / "commondir").read_text(encoding="utf-8").strip()).resolve()
+    for base in dict.fromkeys((git_dir, common)):
+        with contextlib.suppress(OSError):
+            return (base / ref).read_text(encoding="utf-8").strip()
+    with contextlib.suppress(OSError):
+        for line in (common / "packed-refs").read_text(encoding="utf-8").splitlines():
+            sha, _, name = line.partition(" ")
+            if name == ref:
+                return sha
+    return f"unborn:{ref}"
+
+
+def _submodule_paths(repo: Path) -> list[str]:
+    parser = configparser.ConfigParser()
+    with contextlib.suppress(OSError, configparser.Error):
+        parser.read_string((repo / ".gitmodules").read_text(encoding="utf-8"))
+    return [
+        parser[section]["path"]
+        for section in parser.sections()
+        if section.startswith("submodule ") and "path" in parser[section]
+    ]
+
+
+def _mtime_ns(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _ignored(name: str, rel: str, ignore: Sequence[str]) -> bool:
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel, p) for p in ignore)
+
+
+@dataclass
+class _Level:
+    repos: list[FoundRepo]
+    subdirs: list[tuple[str, Path]]
+    stamps: dict[str, int]
+
+
+def _scan_dir(rel: str, path: Path, ignore: Sequence[str]) -> _Level:
+    level = _Level(repos=[], subdirs=[], stamps={str(path): _mtime_ns(path)})
+    try:
+        entries = sorted(os.scandir(path), key=lambda entry: entry.name)
+    except OSError:
+        return level
+    for entry in entries:
+        name = f"{rel}/{entry.name}" if rel else entry.name
+        if _ignored(entry.name, name, ignore):
+            continue
+        try:
+            # Follows symlinks: the web UI's multi-repo dirs are made of them.
+            if not entry.is_dir():
+                continue
+        except OSError:
+            continue
+        child = Path(entry.path)
+        # A directory that turns into a repo (or stops being one) changes mtime.
+        level.stamps[str(child)] = _mtime_ns(child)
+        found = git_dir_of(child)
+        if found is None:
+            level.subdirs.append((name, child))
+            continue
+        level.repos.append(FoundRepo(name, child, *found))
+        level.stamps[str(child / ".gitmodules")] = _mtime_ns(child / ".gitmodules")
+        # Submodules are checked out inside the repo; look only where
+        # .gitmodules says instead of walking the working tree.
+        for sub in _submodule_paths(child):
+            sub_path = child / sub
+            sub_found = git_dir_of(sub_path)
+            if sub_found is not None:
+                level.repos.append(FoundRepo(f"{name}/{sub}", sub_path, *sub_found))
+    return level
+
+
+def discover_repos(
+    base: Path,
+    *,
+    max_depth: int = DEFAULT_MULTI_DEPTH,
+    ignore: Sequence[str] = (),
+) -> tuple[list[FoundRepo], dict[str, int]]:
+    """Find git repos up to ``max_depth`` levels below ``base``, one level at a time.
+
+    Returns the repos sorted by name plus the mtimes of everything looked at,
+    which change whenever a repo could have appeared or disappeared.
+    """
+    patterns = (*DEFAULT_IGNORE, *ignore)
+    repos: list[FoundRepo] = []
+    stamps: dict[str, int] = {}
+    seen: set[tuple[int, int]] = set()
+    pending = [("", base)]
+    with ThreadPoolExecutor(max_workers=DISCOVERY_WORKERS) as pool:
+        for _ in range(max(max_depth, 1)):
+            if not pending:
+                break
+            levels = list(pool.map(lambda item: _scan_dir(*item, patterns), pending))
+            pending = []
+            for level in levels:
+                repos += level.repos
+                stamps.update(level.stamps)
+                for rel, path in level.subdirs:
+                    # Symlinked directories may loop back on themselves.
+                    with contextlib.suppress(OSError):
+                        st = path.stat()
+                        if (st.st_dev, st.st_ino) not in seen:
+                            seen.add((st.st_dev, st.st_ino))
+                            pending.append((rel, path))
+
+    # The same repository reached twice (e.g. through a symlink) is rendered once.
+    unique: dict[Path, FoundRepo] = {}
+    for repo in sorted(repos, key=lambda r: r.name):
+        unique.setdefault(repo.git_dir.resolve(), repo)
+    return list(unique.values()), stamps
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+class RepoScanCache:
+    """Remembers a multi dir's repos and their raw Gource logs between renders.
+
+    The repo list is reused while none of the scanned directories (or any
+    ``.gitmodules``) changed. Raw logs are stored per repository and HEAD
+    commit, so an unchanged repo is never collected twice, even when it is
+    reached through another multi dir (as the web UI's per-job dirs do).
+    """
+
+    def __init__(
+        self,
+        base: Path,
+        *,
+        max_depth: int = DEFAULT_MULTI_DEPTH,
+        ignore: Sequence[str] = (),
+        root: Path = MULTI_SCAN_DIR,
+    ) -> None:
+        self.base = base.resolve()
+        self.max_depth = max_depth
+        self.ignore = tuple(ignore)
+        self.logs_dir = root / "logs"
+        self.dirs_dir = root / "dirs"
+        key = json.dumps([str(self.base), max_depth, sorted(self.ignore)])
+        self.index = self.dirs_dir / f"{_digest(key)}.json"
+
+    def repos(self) -> list[FoundRepo]:
+        try:
+            data = json.loads(self.index.read_text(encoding="utf-8"))
+            stamps: dict[str, int] = data["stamps"]
+            if all(_mtime_ns(Path(path)) == mtime for path, mtime in stamps.items()):
+                return [
+                    FoundRepo(r["name"], Path(r["path"]), Path(r["git_dir"]), r["kind"])
+                    for r in data["repos"]
+                ]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        repos, stamps = discover_repos(self.base, max_depth=self.max_depth, ignore=self.ignore)
+        with contextlib.suppress(OSError):
+            self._save_index(repos, stamps)
+        return repos
+
+    def _save_index(self, repos: list[FoundRepo], stamps: dict[str, int]) -> None:
+        self.dirs_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            "base": str(self.base),
+            "stamps": stamps,
+            "repos": [
+                {
+                    "name": repo.name,
+                    "path": str(repo.path),
+                    "git_dir": str(repo.git_dir),
+                    "kind": repo.kind,
+                }
+                for repo in repos
+            ],
+        }
+        tmp = self.index.with_suffix(f".{os.getpid()}-{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, self.index)
+        # Throwaway dirs (web jobs, temp checkouts) leave indexes behind.
+        indexes = sorted(self.dirs_dir.glob("*.json"), key=_mtime_ns, reverse=True)
+        for old in indexes[MAX_SCAN_INDEXES:]:
+            old.unlink(missing_ok=True)
+
+    def collect(
+        self, collect_log: Callable[[FoundRepo, Path], None]
+    ) -> list[tuple[FoundRepo, Path, bool]]:
+        """Return ``(repo, raw log, reused)`` per repo, collecting changed ones in parallel."""
+        self.logs_dir.mkdir(parents=True, exist_ok=True)
+
+        def log_for(repo: FoundRepo) -> tuple[FoundRepo, Path, bool]:
+            repo_key = _digest(str(repo.git_dir.resolve()))
+            head = head_fingerprint(repo.git_dir)
+            log = self.logs_dir / f"{repo_key}.{_digest(head)}.raw.log"
+            if head and log.is_file():
+                return repo, log, True
+            part = log.with_suffix(f".{os.getpid()}-{threading.get_ident()}.part")
+            collect_log(repo, part)
+            os.replace(part, log)
+            # Only the log for the current HEAD is worth keeping.
+            for old in self.logs_dir.glob(f"{repo_key}.*.raw.log"):
+                if old != log:
+                    old.unlink(missing_ok=True)
+            return repo, log, False
+
+        with ThreadPoolExecutor(max_workers=DISCOVERY_WORKERS) as pool:
+            return list(pool.map(log_for, self.repos()))
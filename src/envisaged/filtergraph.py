@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import re
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+_STREAM_RE = re.compile(r"^(\d+):v$")
+_LABEL_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_FILTER_NAME_RE = re.compile(r"^[a-z0-9_]+$")
+
+
+class FilterGraphError(ValueError):
+    pass
+
+
+def split_chain(text: str) -> list[str]:
+    """Split a ``filter,filter`` chain on top-level commas (quotes are kept intact)."""
+    parts: list[str] = []
+    buf: list[str] = []
+    quoted = False
+    escaped = False
+    for ch in text:
+        if escaped:
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == "'":
+            quoted = not quoted
+        elif ch == "," and not quoted:
+            parts.append("".join(buf).strip())
+            buf = []
+            continue
+        buf.append(ch)
+    if quoted:
+        raise FilterGraphError(f"Unterminated quote in filter chain: {text}")
+    tail = "".join(buf).strip()
+    if not parts and not tail:
+        return []
+    parts.append(tail)
+    if not all(parts):
+        raise FilterGraphError(f"Empty filter in chain: {text}")
+    return parts
+
+
+def _option(args: str, key: str, position: int = 0) -> str | None:
+    for idx, item in enumerate(args.split(":") if args else []):
+        name, sep, value = item.partition("=")
+        if sep and name == key:
+            return value
+        if not sep and idx == position:
+            return name
+    return None
+
+
+def pad_counts(filt: str) -> tuple[int, int]:
+    name, _, args = filt.partition("=")
+    if not _FILTER_NAME_RE.match(name):
+        raise FilterGraphError(f"Malformed filter: {filt[:60]}")
+    try:
+        if name == "split":
+            return 1, int(_option(args, "outputs") or 2)
+        if name in {"hstack", "vstack", "xstack"}:
+            return int(_option(args, "inputs") or 2), 1
+    except ValueError as exc:
+        raise FilterGraphError(f"Bad pad count in filter: {filt[:60]}") from exc
+    if name in {"overlay", "alphamerge"}:
+        return 2, 1
+    return 1, 1
+
+
+@dataclass(frozen=True)
+class Chain:
+    inputs: tuple[str, ...]
+    filters: tuple[str, ...]
+    outputs: tuple[str, ...]
+
+    def compile(self) -> str:
+        pads_in = "".join(f"[{label}]" for label in self.inputs)
+        pads_out = "".join(f"[{label}]" for label in self.outputs)
+        return f"{pads_in}{','.join(self.filters) or 'null'}{pads_out}"
+
+
+def _labels(value: str | Iterable[str]) -> tuple[str, ...]:
+    return (value,) if isinstance(value, str) else tuple(value)
+
+
+@dataclass
+class FilterGraph:
+    """An ffmpeg ``-filter_complex`` graph built from labelled chains.
+
+    Input streams are written as ``N:v``; everything else is a link label.
+    ``validate()`` checks the wiring so a broken graph fails before any
+    process is started.
+    """
+
+    chains: list[Chain] = field(default_factory=list)
+
+    def add(
+        self,
+        inputs: str | Iterable[str],
+        filters: str | Iterable[str],
+        outputs: str | Iterable[str],
+    ) -> FilterGraph:
+        chain = split_chain(filters) if isinstance(filters, str) else list(filters)
+        self.chains.append(Chain(_labels(inputs), tuple(chain), _labels(outputs)))
+        return self
+
+    def extend(self, other: FilterGraph) -> FilterGraph:
+        self.chains.extend(other.chains)
+        return self
+
+    def relabel(self, prefix: str, streams: dict[str, str] | None = None) -> FilterGraph:
+        # Prefix every link label and optionally rewire input streams, so the
+        # same graph can be instantiated several times inside one ffmpeg run.
+        streams = streams or {}
+
+        def rename(label: str) -> str:
+            if _STREAM_RE.match(label):
+                return streams.get(label, label)
+            return prefix + label
+
+        return FilterGraph(
+            [
+                Chain(
+                    tuple(rename(x) for x in chain.inputs),
+                    chain.filters,
+                    tuple(prefix + x for x in chain.outputs),
+                )
+                for chain in self.chains
+            ]
+        )
+
+    def validate(self, *, inputs: int, outputs: Iterable[str]) -> None:
+        mapped = set(outputs)
+        produced: Counter[str] = Counter()
+        consumed: Counter[str] = Counter()
+
+        for chain in self.chains:
+            if not chain.inputs or not chain.outputs:
+                raise FilterGraphError(f"Chain needs input and output labels: {chain.compile()}")
+            for label in chain.outputs:
+                if not _LABEL_RE.match(label):
+                    raise FilterGraphError(f"Invalid output label [{label}]")
+                produced[label] += 1
+            for label in chain.inputs:
+                stream = _STREAM_RE.match(label)
+                if stream:
+                    if int(stream.group(1)) >= inputs:
+                        raise FilterGraphError(
+                            f"[{label}] refers to a missing input ({inputs} given)"
+                        )
+                elif _LABEL_RE.match(label):
+                    consumed[label] += 1
+                else:
+                    raise FilterGraphError(f"Invalid input label [{label}]")
+
+            counts = [pad_counts(f) for f in chain.filters] or [(1, 1)]
+            if counts[0][0] != len(chain.inputs):
+                raise FilterGraphError(
+                    f"{chain.filters[0] if chain.filters else 'null'} takes {counts[0][0]} "
+                    f"input(s), got {len(chain.inputs)}: {chain.compile()[:120]}"
+                )
+            if counts[-1][1] != len(chain.outputs):
+                raise FilterGraphError(
+                    f"Chain produces {counts[-1][1]} output(s), labelled "
+                    f"{len(chain.outputs)}: {chain.compile()[:120]}"
+                )
+            if any(c[0] != 1 for c in counts[1:]) or any(c[1] != 1 for c in counts[:-1]):
+                raise FilterGraphError(f"Multi-pad filter inside a chain: {chain.compile()[:120]}")
+
+        for label, count in produced.items():
+            if count > 1:
+                raise FilterGraphError(f"Label [{label}] is produced {count} times")
+        for label, count in consumed.items():
+            if label not in produced:
+                raise FilterGraphError(f"Label [{label}] is used but never produced")
+            if count > 1:
+                raise FilterGraphError(f"Label [{label}] is consumed {count} times")
+            if label in mapped:
+                raise FilterGraphError(f"Mapped output [{label}] is also consumed")
+        for label in produced:
+            if label not in consumed and label not in mapped:
+                raise FilterGraphError(f"Label [{label}] is never used")
+        for label in mapped - produced.keys():
+            raise FilterGraphError(f"Mapped output [{label}] is not produced")
+
+    def compile(self) -> str:
+        return ";".join(chain.compile() for chain in self.chains)
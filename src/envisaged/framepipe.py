@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import contextlib
+import errno
+import fcntl
+import os
+import signal
+import sys
+from pathlib import Path
+
+PIX_FMT = "rgb24"
+BYTES_PER_PIXEL = 3
+PIPE_MAX_SIZE_PATH = Path("/proc/sys/fs/pipe-max-size")
+# Linux's F_SETPIPE_SZ, for Pythons whose fcntl module does not export it.
+F_SETPIPE_SZ = getattr(fcntl, "F_SETPIPE_SZ", 1031)
+# "P6 <w> <h> <maxval>" plus separators; Gource writes "P6\n%d %d\n255\n".
+MAX_HEADER_BYTES = 64
+COPY_CHUNK = 1 << 20
+
+
+class FrameError(RuntimeError):
+    pass
+
+
+def frame_bytes(width: int, height: int) -> int:
+    return width * height * BYTES_PER_PIXEL
+
+
+def pipe_capacity(wanted: int) -> int:
+    try:
+        limit = int(PIPE_MAX_SIZE_PATH.read_text())
+    except (OSError, ValueError):
+        limit = COPY_CHUNK
+    return max(min(wanted, limit), 1 << 16)
+
+
+def enlarge_pipe(fd: int, size: int) -> None:
+    # Not a pipe, not Linux, or above an unprivileged limit: keep the default.
+    with contextlib.suppress(OSError):
+        fcntl.fcntl(fd, F_SETPIPE_SZ, size)
+
+
+def _read_exact(fd: int, count: int) -> bytes:
+    chunks: list[bytes] = []
+    remaining = count
+    while remaining:
+        chunk = os.read(fd, remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def read_header(fd: int) -> bytes:
+    """Read the first PPM header byte by byte; later ones are read whole."""
+    header = bytearray()
+    fields: list[bytes] = []
+    token = bytearray()
+    while len(fields) < 4:
+        byte = os.read(fd, 1)
+        if not byte:
+            if not header:
+                return b""
+            raise FrameError("Gource stream ended inside a frame header")
+        header += byte
+        if byte.isspace():
+            if token:
+                fields.append(bytes(token))
+                token.clear()
+        else:
+            token += byte
+        if len(header) > MAX_HEADER_BYTES:
+            raise FrameError("Gource did not write a PPM stream")
+    if fields[0] != b"P6" or fields[3] != b"255":
+        raise FrameError(f"Unsupported PPM header: {bytes(header)!r}")
+    return bytes(header)
+
+
+def header_size(header: bytes) -> tuple[int, int]:
+    _, width, height, _ = header.split()
+    return int(width), int(height)
+
+
+def _copy(src: int, dst: int, count: int, *, splice: bool) -> int:
+    if splice:
+        return os.splice(src, dst, count)
+    data = os.read(src, min(count, COPY_CHUNK))
+    view = memoryview(data)
+    while view:
+        view = view[os.write(dst, view) :]
+    return len(data)
+
+
+def relay(src: int, dst: int, width: int, height: int) -> int:
+    """Forward Gource's PPM frames from ``src`` to ``dst`` as headerless rawvideo.
+
+    Every frame of one Gource run has the same size, so each header is only
+    compared with the first and the RGB payload is spliced pipe-to-pipe in the
+    kernel where possible. Returns the number of frames relayed.
+    """
+    payload = frame_bytes(width, height)
+    capacity = pipe_capacity(payload)
+    enlarge_pipe(src, capacity)
+    enlarge_pipe(dst, capacity)
+
+    header = read_header(src)
+    if not header:
+        return 0
+    if header_size(header) != (width, height):
+        got = "x".join(map(str, header_size(header)))
+        raise FrameError(f"Gource wrote {got} frames, expected {width}x{height}")
+
+    splice = hasattr(os, "splice")
+    frames = 0
+    while True:
+        remaining = payload
+        while remaining:
+            try:
+                moved = _copy(src, dst, remaining, splice=splice)
+            except OSError as exc:
+                if not splice or exc.errno != errno.EINVAL:
+                    raise
+                splice = False  # e.g. a regular file instead of a pipe
+                continue
+            if not moved:
+                raise FrameError(f"Gource stream ended inside frame {frames + 1}")
+            remaining -= moved
+        frames += 1
+        next_header = _read_exact(src, len(header))
+        if not next_header:
+            return frames
+        if next_header != header:
+            raise FrameError(f"Frame {frames + 1} header changed: {next_header!r}")
+
+
+def main() -> None:
+    # Die of SIGPIPE like Gource would when ffmpeg exits first, so the
+    # supervisor reports ffmpeg's error rather than ours.
+    signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+    try:
+        width, height = (int(v) for v in sys.argv[1].split("x"))
+    except (IndexError, ValueError):
+        sys.exit("usage: python -m envisaged.framepipe WIDTHxHEIGHT")
+    try:
+        relay(sys.stdin.fileno(), sys.stdout.fileno(), width, height)
+    except FrameError as exc:
+        sys.exit(f"frame relay: {exc}")
+
+
+if __name__ == "__main__":
+    main()
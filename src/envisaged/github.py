@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Literal
+
+GITHUB_API_URL = os.environ.get("ENVISAGED_GITHUB_API", "https://api.github.com")
+SEARCH_TTL = 300.0
+SEARCH_CACHE_SIZE = 256
+SEARCH_PER_PAGE = 8
+HTTP_POOL_SIZE = 4
+HTTP_TIMEOUT = 10.0
+
+SearchItem = dict[str, str | int | None]
+ResultSource = Literal["cache", "prefix", "remote"]
+
+
+class GitHubSearchError(RuntimeError):
+    pass
+
+
+class KeepAliveClient:
+    """Small pool of persistent HTTP(S) connections to one host."""
+
+    def __init__(
+        self, base_url: str, *, size: int = HTTP_POOL_SIZE, timeout: float = HTTP_TIMEOUT
+    ) -> None:
+        parsed = urllib.parse.urlsplit(base_url)
+        if parsed.scheme not in {"http", "https"} or not parsed.hostname:
+            raise ValueError(f"Unsupported API base URL: {base_url}")
+        self._https = parsed.scheme == "https"
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._prefix = parsed.path.rstrip("/")
+        self._timeout = timeout
+        self._idle: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=size)
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._https:
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self._timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def get_json(self, path: str, headers: dict[str, str]) -> Any:
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._connect()
+            reused = False
+
+        while True:
+            try:
+                conn.request("GET", self._prefix + path, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                # The server may have dropped an idle keep-alive connection;
+                # retry once on a fresh one.
+                if not reused:
+                    raise
+                conn = self._connect()
+                reused = False
+
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        if response.status >= 400:
+            raise GitHubSearchError(f"GitHub search failed: HTTP {response.status}")
+        return json.loads(body.decode("utf-8"))
+
+
+@dataclass
+class _Entry:
+    items: list[SearchItem]
+    stored: float
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _matches(item: SearchItem, query: str) -> bool:
+    text = f"{item.get('full_name') or ''} {item.get('description') or ''}".lower()
+    return all(word in text for word in query.split())
+
+
+class GitHubSearch:
+    """Repository search with a TTL+LRU cache in front of the GitHub API.
+
+    Identical in-flight queries share one request. A query that extends a
+    cached one ("fast" -> "fastapi") is answered from the cached items while
+    the real search refreshes in the background.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GITHUB_API_URL,
+        *,
+        ttl: float = SEARCH_TTL,
+        max_entries: int = SEARCH_CACHE_SIZE,
+        per_page: int = SEARCH_PER_PAGE,
+    ) -> None:
+        self._client = KeepAliveClient(base_url)
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._per_page = per_page
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, Future[list[SearchItem]]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=HTTP_POOL_SIZE, thread_name_prefix="gh-search")
+
+    def _fresh(self, key: str, now: float) -> _Entry | None:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if now - entry.stored > self._ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return entry
+
+    def _fetch(self, key: str) -> list[SearchItem]:
+        try:
+            q = urllib.parse.quote(key)
+            payload = self._client.get_json(
+                f"/search/repositories?q={q}&sort=stars&order=desc&per_page={self._per_page}",
+                {"Accept": "application/vnd.github+json", "User-Agent": "envisaged-web"},
+            )
+            items: list[SearchItem] = [
+                {
+                    "full_name": item.get("full_name"),
+                    "html_url": item.get("html_url"),
+                    "description": item.get("description"),
+                    "stars": item.get("stargazers_count", 0),
+                }
+                for item in payload.get("items", [])
+            ]
+            with self._lock:
+                self._cache[key] = _Entry(items, time.monotonic())
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._max_entries:
+                    self._cache.popitem(last=False)
+            return items
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _request(self, key: str) -> Future[list[SearchItem]]:
+        # Caller holds the lock.
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = self._pool.submit(self._fetch, key)
+        return future
+
+    def search(self, query: str) -> tuple[list[SearchItem], ResultSource]:
+        key = _normalize(query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._fresh(key, now)
+            if entry is not None:
+                return entry.items, "cache"
+            future = self._request(key)
+            prefixes = [k for k in self._cache if k != key and key.startswith(k)]
+            for prefix in sorted(prefixes, key=len, reverse=True):
+                cached = self._fresh(prefix, now)
+                if cached is None:
+                    continue
+                local = [item for item in cached.items if _matches(item, key)]
+                if local:
+                    return local, "prefix"
+        return future.result(timeout=HTTP_TIMEOUT * 2), "remote"
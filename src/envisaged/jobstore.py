@@ -0,0 +1,522 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections.abc import Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Literal, Protocol
+
+from .cli import OutputVariant, RenderConfig
+
+JobPriority = Literal["preview", "normal", "background"]
+
+PRIORITY_RANK: dict[str, int] = {"preview": 0, "normal": 1, "background": 2}
+FINISHED_STATUSES = ("done", "error", "cancelled")
+RECENT_JOBS = 20
+# Owners heartbeat every POLL_INTERVAL; a job whose lease runs out is re-queued.
+POLL_INTERVAL = 2.0
+LEASE_SECONDS = 60.0
+# Finished jobs beyond this many are dropped from the store.
+KEEP_FINISHED = 200
+HTTP_TIMEOUT = 30.0
+UPLOAD_TIMEOUT = 600.0
+
+_PATH_FIELDS = ("output", "multi_dir", "job_dir")
+
+
+@dataclass
+class RenderJob:
+    id: str
+    title: str
+    template: str
+    status: str
+    output_name: str
+    created_at: str
+    error: str | None = None
+    priority: JobPriority = "normal"
+
+
+@dataclass(frozen=True)
+class RepoSource:
+    mode: str
+    repo: str
+    multi_repos: str
+    multi_dir: str
+
+
+@dataclass(frozen=True)
+class ClaimedJob:
+    job: RenderJob
+    config: RenderConfig
+    source: RepoSource | None
+
+
+@dataclass(frozen=True)
+class HostLoad:
+    """Estimated resources of one running render, shared by every process on its host."""
+
+    job_id: str
+    owner: str
+    host: str
+    cores: float
+    memory_mb: float
+    cpus: tuple[int, ...] = ()
+
+
+def encode_config(config: RenderConfig) -> str:
+    return json.dumps(asdict(config), default=str)
+
+
+def decode_config(text: str) -> RenderConfig:
+    data: dict[str, Any] = json.loads(text)
+    for key in _PATH_FIELDS:
+        if data.get(key) is not None:
+            data[key] = Path(data[key])
+    if data.get("cpus") is not None:
+        data["cpus"] = tuple(data["cpus"])
+    if "multi_ignore" in data:
+        data["multi_ignore"] = tuple(data["multi_ignore"])
+    data["variants"] = [
+        OutputVariant(**{**variant, "output": Path(variant["output"])})
+        for variant in data.get("variants", [])
+    ]
+    return RenderConfig(**data)
+
+
+def encode_claim(claimed: ClaimedJob) -> dict[str, Any]:
+    return {
+        "job": asdict(claimed.job),
+        "config": encode_config(claimed.config),
+        "source": asdict(claimed.source) if claimed.source is not None else None,
+    }
+
+
+def decode_claim(data: dict[str, Any]) -> ClaimedJob:
+    source = data.get("source")
+    return ClaimedJob(
+        job=RenderJob(**data["job"]),
+        config=decode_config(data["config"]),
+        source=RepoSource(**source) if source else None,
+    )
+
+
+class WorkerQueue(Protocol):
+    """The part of the store a render worker needs: lease, report, release."""
+
+    def update(self, job_id: str, *, status: str, error: str | None = None) -> None: ...
+
+    def set_config(self, job_id: str, config: RenderConfig) -> None: ...
+
+    def queued(self, limit: int) -> list[ClaimedJob]: ...
+
+    def claim(
+        self, owner: str, lease: float, *, job_id: str | None = None
+    ) -> ClaimedJob | None: ...
+
+    def heartbeat(self, job_id: str, owner: str, lease: float) -> bool: ...
+
+    def requeue(self, job_id: str, *, error: str | None = None) -> None: ...
+
+    def reap_expired(self) -> list[str]: ...
+
+    def finish(self, job_id: str, *, status: str, error: str | None = None) -> None: ...
+
+    def cancel_requested(self, job_ids: Iterable[str]) -> set[str]: ...
+
+    def host_load(self, host: str) -> list[HostLoad]: ...
+
+    def set_load(self, load: HostLoad) -> None: ...
+
+    def clear_load(self, job_id: str, owner: str) -> None: ...
+
+
+class JobStore(WorkerQueue, Protocol):
+    """Job records plus the priority queue shared by every web/render process."""
+
+    def add(self, job: RenderJob, config: RenderConfig, source: RepoSource | None) -> None: ...
+
+    def recent(self, limit: int = RECENT_JOBS) -> list[RenderJob]: ...
+
+    def cancel_queued(self, job_id: str) -> RenderConfig | None: ...
+
+    def request_cancel(self, job_id: str) -> bool: ...
+
+    def waiting_rank(self) -> int | None: ...
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    template TEXT NOT NULL,
+    status TEXT NOT NULL,
+    output_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    error TEXT,
+    priority TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    source TEXT,
+    owner TEXT,
+    lease_until REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, rank, seq);
+CREATE TABLE IF NOT EXISTS loads (
+    job_id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    host TEXT NOT NULL,
+    cores REAL NOT NULL,
+    memory_mb REAL NOT NULL,
+    cpus TEXT NOT NULL DEFAULT ''
+);
+"""
+
+
+def _job(row: sqlite3.Row) -> RenderJob:
+    return RenderJob(
+        id=row["id"],
+        title=row["title"],
+        template=row["template"],
+        status=row["status"],
+        output_name=row["output_name"],
+        created_at=row["created_at"],
+        error=row["error"],
+        priority=row["priority"],
+    )
+
+
+def _claimed(row: sqlite3.Row) -> ClaimedJob:
+    source = RepoSource(**json.loads(row["source"])) if row["source"] else None
+    return ClaimedJob(job=_job(row), config=decode_config(row["config"]), source=source)
+
+
+class SQLiteJobStore:
+    """JobStore on one SQLite file in WAL mode.
+
+    Every process opens its own connection; claims run in ``BEGIN IMMEDIATE``
+    transactions so two processes can never take the same job.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _next_seq(self, db: sqlite3.Connection) -> int:
+        return db.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs").fetchone()[0]
+
+    def add(self, job: RenderJob, config: RenderConfig, source: RepoSource | None) -> None:
+        with self._tx() as db:
+            db.execute(
+                "INSERT INTO jobs (id, title, template, status, output_name, created_at, error,"
+                " priority, rank, seq, config, source) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job.id,
+                    job.title,
+                    job.template,
+                    job.status,
+                    job.output_name,
+                    job.created_at,
+                    job.error,
+                    job.priority,
+                    PRIORITY_RANK[job.priority],
+                    self._next_seq(db),
+                    encode_config(config),
+                    json.dumps(asdict(source)) if source is not None else None,
+                ),
+            )
+            db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND rowid NOT IN"
+                " (SELECT rowid FROM jobs ORDER BY rowid DESC LIMIT ?)",
+                (*FINISHED_STATUSES, KEEP_FINISHED),
+            )
+
+    def recent(self, limit: int = RECENT_JOBS) -> list[RenderJob]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs ORDER BY rowid DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [_job(row) for row in rows]
+
+    def update(self, job_id: str, *, status: str, error: str | None = None) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ? WHERE id = ?", (status, error, job_id)
+            )
+
+    def set_config(self, job_id: str, config: RenderConfig) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE jobs SET config = ? WHERE id = ?",
+                (encode_config(config), job_id),
+            )
+
+    def queued(self, limit: int) -> list[ClaimedJob]:
+        # Next jobs in claim order, for callers that choose what to claim.
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY rank, seq LIMIT ?", (limit,)
+            ).fetchall()
+        return [_claimed(row) for row in rows]
+
+    def claim(self, owner: str, lease: float, *, job_id: str | None = None) -> ClaimedJob | None:
+        with self._tx() as db:
+            if job_id is None:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' ORDER BY rank, seq LIMIT 1"
+                ).fetchone()
+            else:
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND id = ?", (job_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            status = "fetching" if row["source"] else "collecting logs"
+            db.execute(
+                "UPDATE jobs SET status = ?, error = NULL, owner = ?, lease_until = ?,"
+                " cancel_requested = 0 WHERE id = ?",
+                (status, owner, time.time() + lease, row["id"]),
+            )
+        claimed = _claimed(row)
+        claimed.job.status, claimed.job.error = status, None
+        return claimed
+
+    def heartbeat(self, job_id: str, owner: str, lease: float) -> bool:
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+                (time.time() + lease, job_id, owner),
+            )
+            return cur.rowcount == 1
+
+    def requeue(self, job_id: str, *, error: str | None = None) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', error = ?, owner = NULL, lease_until = NULL,"
+                " cancel_requested = 0, seq = ? WHERE id = ?",
+                (error, self._next_seq(db), job_id),
+            )
+
+    def reap_expired(self) -> list[str]:
+        # Owners that stopped heartbeating (crashed worker, lost host) give
+        # their jobs back to the queue; a pending cancel is honoured instead.
+        with self._tx() as db:
+            rows = db.execute(
+                "SELECT id, cancel_requested FROM jobs"
+                " WHERE owner IS NOT NULL AND lease_until < ? ORDER BY seq",
+                (time.time(),),
+            ).fetchall()
+            for row in rows:
+                if row["cancel_requested"]:
+                    db.execute(
+                        "UPDATE jobs SET status = 'cancelled', owner = NULL, lease_until = NULL,"
+                        " cancel_requested = 0 WHERE id = ?",
+                        (row["id"],),
+                    )
+                    continue
+                db.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, owner = NULL,"
+                    " lease_until = NULL, seq = ? WHERE id = ?",
+                    ("worker lease expired", self._next_seq(db), row["id"]),
+                )
+        return [row["id"] for row in rows if not row["cancel_requested"]]
+
+    def finish(self, job_id: str, *, status: str, error: str | None = None) -> None:
+        with self._tx() as db:
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, owner = NULL, lease_until = NULL,"
+                " cancel_requested = 0 WHERE id = ?",
+                (status, error, job_id),
+            )
+
+    def cancel_queued(self, job_id: str) -> RenderConfig | None:
+        with self._tx() as db:
+            row = db.execute(
+                "SELECT config FROM jobs WHERE id = ? AND status = 'queued'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE jobs SET status = 'cancelled' WHERE id = ?", (job_id,))
+        return decode_config(row["config"])
+
+    def request_cancel(self, job_id: str) -> bool:
+        # The owning process notices the flag on its next poll and stops the job.
+        with self._tx() as db:
+            cur = db.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND owner IS NOT NULL",
+                (job_id,),
+            )
+            return cur.rowcount == 1
+
+    def cancel_requested(self, job_ids: Iterable[str]) -> set[str]:
+        ids = list(job_ids)
+        if not ids:
+            return set()
+        marks = ", ".join("?" * len(ids))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id FROM jobs WHERE cancel_requested = 1 AND id IN ({marks})", ids
+            ).fetchall()
+        return {row["id"] for row in rows}
+
+    def waiting_rank(self) -> int | None:
+        with self._lock:
+            row = self._db.execute("SELECT MIN(rank) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def host_load(self, host: str) -> list[HostLoad]:
+        # Only loads whose owner still holds the job's lease count; a crashed
+        # process's entries stop counting once its lease runs out.
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT loads.* FROM loads JOIN jobs ON jobs.id = loads.job_id"
+                " AND jobs.owner = loads.owner WHERE loads.host = ? AND jobs.lease_until >= ?",
+                (host, time.time()),
+            ).fetchall()
+        return [
+            HostLoad(
+                job_id=row["job_id"],
+                owner=row["owner"],
+                host=row["host"],
+                cores=row["cores"],
+                memory_mb=row["memory_mb"],
+                cpus=tuple(int(cpu) for cpu in row["cpus"].split(",") if cpu),
+            )
+            for row in rows
+        ]
+
+    def set_load(self, load: HostLoad) -> None:
+        with self._tx() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO loads (job_id, owner, host, cores, memory_mb, cpus)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    load.job_id,
+                    load.owner,
+                    load.host,
+                    load.cores,
+                    load.memory_mb,
+                    ",".join(map(str, load.cpus)),
+                ),
+            )
+
+    def clear_load(self, job_id: str, owner: str) -> None:
+        with self._tx() as db:
+            db.execute("DELETE FROM loads WHERE job_id = ? AND owner = ?", (job_id, owner))
+            # Entries left by processes that died without clearing them.
+            db.execute(
+                "DELETE FROM loads WHERE NOT EXISTS (SELECT 1 FROM jobs"
+                " WHERE jobs.id = loads.job_id AND jobs.owner = loads.owner)"
+            )
+
+
+class HTTPJobStore:
+    """WorkerQueue backed by a remote envisaged-web service (``/api/worker``).
+
+    For worker hosts that cannot open the service's SQLite file. Lease expiry
+    is enforced by the service's own poller, and finished videos are uploaded
+    with ``upload_output`` instead of being moved into WEB_OUTPUT_DIR.
+    """
+
+    def __init__(self, base_url: str, *, token: str = "", timeout: float = HTTP_TIMEOUT) -> None:
+        self.base_url = base_url.rstrip("/")
+        self._headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._timeout = timeout
+        self._cancel: set[str] = set()
+
+    def _call(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        request = urllib.request.Request(
+            f"{self.base_url}/api/worker{path}",
+            data=json.dumps(payload).encode("utf-8"),
+            headers={**self._headers, "Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self._timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def update(self, job_id: str, *, status: str, error: str | None = None) -> None:
+        self._call(f"/jobs/{job_id}/status", {"status": status, "error": error})
+
+    def set_config(self, job_id: str, config: RenderConfig) -> None:
+        self._call(f"/jobs/{job_id}/config", {"config": encode_config(config)})
+
+    def queued(self, limit: int) -> list[ClaimedJob]:
+        return [decode_claim(item) for item in self._call("/queued", {"limit": limit})["jobs"]]
+
+    def claim(self, owner: str, lease: float, *, job_id: str | None = None) -> ClaimedJob | None:
+        payload = {"owner": owner, "lease": lease, "job_id": job_id}
+        data = self._call("/claim", payload)["claim"]
+        return decode_claim(data) if data else None
+
+    def heartbeat(self, job_id: str, owner: str, lease: float) -> bool:
+        data = self._call(f"/jobs/{job_id}/heartbeat", {"owner": owner, "lease": lease})
+        if data["cancel"]:
+            self._cancel.add(job_id)
+        return bool(data["held"])
+
+    def requeue(self, job_id: str, *, error: str | None = None) -> None:
+        self._call(
+            f"/jobs/{job_id}/status", {"action": "requeue", "status": "queued", "error": error}
+        )
+
+    def reap_expired(self) -> list[str]:
+        return []
+
+    def finish(self, job_id: str, *, status: str, error: str | None = None) -> None:
+        self._cancel.discard(job_id)
+        self._call(f"/jobs/{job_id}/status", {"action": "finish", "status": status, "error": error})
+
+    def cancel_requested(self, job_ids: Iterable[str]) -> set[str]:
+        # Filled in by heartbeat(), which reports cancellation with the lease.
+        return self._cancel.intersection(job_ids)
+
+    def host_load(self, host: str) -> list[HostLoad]:
+        data = self._call("/loads", {"host": host})
+        return [HostLoad(**{**item, "cpus": tuple(item["cpus"])}) for item in data["loads"]]
+
+    def set_load(self, load: HostLoad) -> None:
+        self._call(f"/jobs/{load.job_id}/load", asdict(load))
+
+    def clear_load(self, job_id: str, owner: str) -> None:
+        self._call(f"/jobs/{job_id}/load", {"owner": owner, "clear": True})
+
+    def upload_output(self, local: Path, output_name: str) -> None:
+        with local.open("rb") as fh:
+            request = urllib.request.Request(
+                f"{self.base_url}/api/worker/outputs/{urllib.parse.quote(output_name)}",
+                data=fh,
+                headers={
+                    **self._headers,
+                    "Content-Type": "video/mp4",
+                    "Content-Length": str(local.stat().st_size),
+                },
+                method="PUT",
+            )
+            with urllib.request.urlopen(request, timeout=UPLOAD_TIMEOUT):
+                pass
+        local.unlink(missing_ok=True)
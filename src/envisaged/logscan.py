@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import mmap
+import os
+from collections import Counter
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Protocol, TypeVar
+
+BLOCK_BYTES = 8 << 20
+# Below this a single pass beats the cost of starting worker processes.
+PARALLEL_MIN_BYTES = 64 << 20
+
+
+class _Partial(Protocol):
+    def merge(self, other: Any) -> Any: ...
+
+
+T = TypeVar("T", bound=_Partial)
+
+
+@dataclass
+class FieldCounts:
+    """Raw byte-keyed tallies; keys are decoded once per distinct value."""
+
+    users: Counter[bytes] = field(default_factory=Counter)
+    actions: Counter[bytes] = field(default_factory=Counter)
+    names: Counter[bytes] = field(default_factory=Counter)  # last path component
+
+    def merge(self, other: FieldCounts) -> FieldCounts:
+        self.users.update(other.users)
+        self.actions.update(other.actions)
+        self.names.update(other.names)
+        return self
+
+
+@dataclass
+class StampScan:
+    stamps: set[int] = field(default_factory=set)
+    events: int = 0
+
+    def merge(self, other: StampScan) -> StampScan:
+        self.stamps |= other.stamps
+        self.events += other.events
+        return self
+
+
+def _blocks(mm: mmap.mmap, start: int, end: int) -> Iterator[bytes]:
+    # Yields whole lines whose first byte lies in [start, end), in blocks.
+    size = len(mm)
+    if start > 0 and mm[start - 1] != 0x0A:
+        nl = mm.find(b"\n", start)
+        start = size if nl < 0 else nl + 1
+    pos = start
+    while pos < end:
+        stop = min(pos + BLOCK_BYTES, end)
+        if stop < size:
+            nl = mm.find(b"\n", max(stop - 1, pos))
+            stop = size if nl < 0 else nl + 1
+        yield mm[pos:stop]
+        pos = stop
+
+
+def _scan_fields(path: str, start: int, end: int) -> FieldCounts:
+    counts = FieldCounts()
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for block in _blocks(mm, start, end):
+            rows = [
+                row for row in (line.split(b"|", 3) for line in block.split(b"\n")) if len(row) == 4
+            ]
+            counts.users.update(row[1] for row in rows)
+            counts.actions.update(row[2] for row in rows)
+            counts.names.update(row[3].rpartition(b"/")[2] for row in rows)
+    return counts
+
+
+def _scan_stamps(path: str, start: int, end: int) -> StampScan:
+    scan = StampScan()
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for block in _blocks(mm, start, end):
+            for line in block.split(b"\n"):
+                try:
+                    scan.stamps.add(int(line.partition(b"|")[0]))
+                except ValueError:
+                    continue
+                scan.events += 1
+    return scan
+
+
+def _ranges(size: int, workers: int) -> list[tuple[int, int]]:
+    step = -(-size // workers)
+    return [(lo, min(lo + step, size)) for lo in range(0, size, step)]
+
+
+def _scan(
+    path: Path,
+    worker: Callable[[str, int, int], T],
+    empty: Callable[[], T],
+    workers: int | None,
+) -> T:
+    size = path.stat().st_size
+    if size == 0:
+        return empty()
+    if workers is None:
+        workers = min(os.cpu_count() or 1, max(size // PARALLEL_MIN_BYTES, 1))
+    if workers <= 1:
+        return worker(str(path), 0, size)
+    result = empty()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, str(path), lo, hi) for lo, hi in _ranges(size, workers)]
+        for future in futures:
+            result.merge(future.result())
+    return result
+
+
+def scan_fields(path: Path, *, workers: int | None = None) -> FieldCounts:
+    """Count users, actions and file names of a ``ts|user|action|path`` log.
+
+    The file is memory-mapped and split on raw bytes; nothing is decoded per
+    row. Logs above ``PARALLEL_MIN_BYTES`` are split at line boundaries and
+    counted by worker processes.
+    """
+    return _scan(path, _scan_fields, FieldCounts, workers)
+
+
+def scan_stamps(path: Path, *, workers: int | None = None) -> StampScan:
+    return _scan(path, _scan_stamps, StampScan, workers)
+
+
+def decoded(counts: Counter[bytes], key: Callable[[str], str]) -> Counter[str]:
+    out: Counter[str] = Counter()
+    for raw, count in counts.items():
+        out[key(raw.decode("utf-8", errors="ignore"))] += count
+    return out
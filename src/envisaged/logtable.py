@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+try:  # NumPy is optional; every operation has a pure-Python fallback.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+WRITE_CHUNK_ROWS = 65536
+
+
+def has_numpy() -> bool:
+    return np is not None
+
+
+@dataclass
+class StringPool:
+    """Dictionary encoding for a string column: each distinct value is stored once."""
+
+    values: list[str] = field(default_factory=list)
+    _ids: dict[str, int] = field(default_factory=dict, repr=False)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, idx: int) -> str:
+        return self.values[idx]
+
+    def intern(self, value: str) -> int:
+        idx = self._ids.get(value)
+        if idx is None:
+            idx = self._ids[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+    def mapped(self, fn: Callable[[str], str]) -> StringPool:
+        # Rewrites every distinct value once instead of once per row; fn is
+        # expected to be injective (e.g. adding a prefix) so ids stay valid.
+        pool = StringPool()
+        for value in self.values:
+            pool.values.append(fn(value))
+        pool._ids = {value: idx for idx, value in enumerate(pool.values)}
+        return pool
+
+
+def _gather(column: array, indices: array) -> array:
+    if np is not None:
+        picked = np.frombuffer(column, dtype=column.typecode)[
+            np.frombuffer(indices, dtype=indices.typecode)
+        ]
+        out = array(column.typecode)
+        out.frombytes(picked.tobytes())
+        return out
+    return array(column.typecode, (column[i] for i in indices))
+
+
+@dataclass
+class LogTable:
+    """Gource custom log (``ts|user|action|path``) held column-wise.
+
+    Timestamps are int64, actions one byte each, and users/paths are ids into
+    shared string pools, so a row costs ~17 bytes instead of a Python string
+    per field. ``column()`` exposes the raw columns as NumPy arrays when NumPy
+    is installed.
+    """
+
+    timestamps: array = field(default_factory=lambda: array("q"))
+    actions: array = field(default_factory=lambda: array("B"))
+    users: array = field(default_factory=lambda: array("I"))
+    paths: array = field(default_factory=lambda: array("I"))
+    user_pool: StringPool = field(default_factory=StringPool)
+    path_pool: StringPool = field(default_factory=StringPool)
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, ts: int, user: str, action: str, path: str) -> None:
+        self.timestamps.append(ts)
+        self.actions.append(ord(action))
+        self.users.append(self.user_pool.intern(user))
+        self.paths.append(self.path_pool.intern(path))
+
+    @classmethod
+    def read(cls, fh: Iterable[str]) -> LogTable:
+        table = cls()
+        ts_col, act_col = table.timestamps, table.actions
+        user_col, path_col = table.users, table.paths
+        intern_user, intern_path = table.user_pool.intern, table.path_pool.intern
+        for raw in fh:
+            parts = raw.rstrip("\n").split("|", 3)
+            if len(parts) != 4:
+                continue
+            try:
+                ts = int(parts[0])
+            except ValueError:
+                continue
+            action = parts[2]
+            if len(action) != 1 or not action.isascii():
+                continue
+            ts_col.append(ts)
+            act_col.append(ord(action))
+            user_col.append(intern_user(parts[1]))
+            path_col.append(intern_path(parts[3]))
+        return table
+
+    @classmethod
+    def load(cls, path: Path) -> LogTable:
+        with path.open("r", encoding="utf-8", errors="ignore") as fh:
+            return cls.read(fh)
+
+    def rows(self) -> Iterator[tuple[int, str, str, str]]:
+        users, paths = self.user_pool.values, self.path_pool.values
+        for ts, act, user, path in zip(
+            self.timestamps, self.actions, self.users, self.paths, strict=True
+        ):
+            yield ts, users[user], chr(act), paths[path]
+
+    def write(self, fh: IO[str]) -> None:
+        users, paths = self.user_pool.values, self.path_pool.values
+        actions = [chr(code) for code in range(256)]
+        n = len(self)
+        for lo in range(0, n, WRITE_CHUNK_ROWS):
+            hi = min(lo + WRITE_CHUNK_ROWS, n)
+            fh.write(
+                "".join(
+                    f"{self.timestamps[i]}|{users[self.users[i]]}|"
+                    f"{actions[self.actions[i]]}|{paths[self.paths[i]]}\n"
+                    for i in range(lo, hi)
+                )
+            )
+
+    def save(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as fh:
+            self.write(fh)
+
+    def column(self, name: str) -> Any:
+        # Zero-copy NumPy view (the table must not be appended to while it is
+        # alive); the plain array when NumPy is unavailable.
+        col: array = getattr(self, name)
+        if np is None:
+            return col
+        return np.frombuffer(col, dtype=col.typecode)
+
+    def span(self) -> tuple[int, int] | None:
+        if not self.timestamps:
+            return None
+        return min(self.timestamps), max(self.timestamps)
+
+    def take(self, indices: array) -> LogTable:
+        return LogTable(
+            timestamps=_gather(self.timestamps, indices),
+            actions=_gather(self.actions, indices),
+            users=_gather(self.users, indices),
+            paths=_gather(self.paths, indices),
+            user_pool=self.user_pool,
+            path_pool=self.path_pool,
+        )
+
+    def time_order(self) -> array:
+        if np is not None:
+            order = np.argsort(self.column("timestamps"), kind="stable")
+            out = array("q")
+            out.frombytes(order.astype(np.int64).tobytes())
+            return out
+        return array("q", sorted(range(len(self)), key=self.timestamps.__getitem__))
+
+    def sorted_by_time(self) -> LogTable:
+        return self.take(self.time_order())
+
+    def between(self, start: int, end: int) -> LogTable:
+        if np is not None:
+            ts = self.column("timestamps")
+            picked = np.flatnonzero((ts >= start) & (ts < end)).astype(np.int64)
+            indices = array("q")
+            indices.frombytes(picked.tobytes())
+        else:
+            indices = array("q", (i for i, ts in enumerate(self.timestamps) if start <= ts < end))
+        return self.take(indices)
+
+    def with_timestamps(self, timestamps: array) -> LogTable:
+        if len(timestamps) != len(self):
+            raise ValueError("timestamp column length does not match the table")
+        return LogTable(
+            timestamps=timestamps,
+            actions=self.actions,
+            users=self.users,
+            paths=self.paths,
+            user_pool=self.user_pool,
+            path_pool=self.path_pool,
+        )
+
+    def with_path_prefix(self, prefix: str) -> LogTable:
+        return LogTable(
+            timestamps=self.timestamps,
+            actions=self.actions,
+            users=self.users,
+            paths=self.paths,
+            user_pool=self.user_pool,
+            path_pool=self.path_pool.mapped(lambda value: prefix + value),
+        )
+
+    def counts(self, name: str) -> dict[str, int]:
+        col: array = getattr(self, name)
+        if name == "actions":
+            labels: Sequence[str] = [chr(code) for code in range(256)]
+            size = 256
+        else:
+            labels = self.user_pool.values if name == "users" else self.path_pool.values
+            size = len(labels)
+        if np is not None:
+            tally = np.bincount(self.column(name), minlength=size).tolist()
+        else:
+            tally = [0] * size
+            for value in col:
+                tally[value] += 1
+        return {labels[idx]: count for idx, count in enumerate(tally) if count}
+
+    def rekeyed(self, user_pool: StringPool, path_pool: StringPool) -> LogTable:
+        # Interns this table's strings into other pools and rewrites the ids to match.
+        users = array("I", (user_pool.intern(v) for v in self.user_pool.values))
+        paths = array("I", (path_pool.intern(v) for v in self.path_pool.values))
+        return LogTable(
+            timestamps=self.timestamps,
+            actions=self.actions,
+            users=_gather(users, self.users),
+            paths=_gather(paths, self.paths),
+            user_pool=user_pool,
+            path_pool=path_pool,
+        )
+
+    @classmethod
+    def concat(cls, tables: Sequence[LogTable]) -> LogTable:
+        merged = cls()
+        for table in tables:
+            part = table.rekeyed(merged.user_pool, merged.path_pool)
+            merged.timestamps.extend(part.timestamps)
+            merged.actions.extend(part.actions)
+            merged.users.extend(part.users)
+            merged.paths.extend(part.paths)
+        return merged
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import contextlib
+import os
+import re
+import time
+from pathlib import Path
+from uuid import uuid4
+
+from .paths import MASTERS_DIR
+
+# Lossless RGB keeps the Gource frames bit-exact; ultrafast keeps the extra
+# encode cheap next to the real outputs.
+MASTER_ENCODER_ARGS = ["-c:v", "libx264rgb", "-qp", "0", "-preset", "ultrafast"]
+
+# Least recently used masters are evicted once the store grows past this.
+MASTERS_MAX_BYTES = int(float(os.environ.get("ENVISAGED_MASTERS_MAX_GB", "20")) * 2**30)
+# Partial masters left behind by a crashed render are dropped after this long.
+STALE_PART_SECONDS = 86400.0
+
+_MASTER_NAME_RE = re.compile(r"^(?P<key>[0-9a-f]+)-(?P<w>\d+)x(?P<h>\d+)\.mkv$")
+
+
+def master_path(key: str, width: int, height: int) -> Path:
+    return MASTERS_DIR / f"{key}-{width}x{height}.mkv"
+
+
+def find_master(
+    key: str, width: int, height: int, *, rescale: bool = False
+) -> tuple[Path, int, int] | None:
+    # Gource lays out the tree, fonts and camera for the size it renders at, so
+    # only a master of exactly the requested size matches a direct render. With
+    # ``rescale`` any larger master will do (scaled down, and cropped when the
+    # aspect ratio differs); masters of the same aspect ratio come first.
+    if not rescale:
+        master = master_path(key, width, height)
+        return (master, width, height) if master.is_file() else None
+    if not MASTERS_DIR.is_dir():
+        return None
+    best: tuple[tuple[bool, int], Path, int, int] | None = None
+    for path in MASTERS_DIR.glob(f"{key}-*.mkv"):
+        match = _MASTER_NAME_RE.match(path.name)
+        if match is None or match["key"] != key:
+            continue
+        w, h = int(match["w"]), int(match["h"])
+        if w < width or h < height:
+            continue
+        rank = (w * height != h * width, w * h)
+        if best is None or rank < best[0]:
+            best = (rank, path, w, h)
+    return best[1:] if best is not None else None
+
+
+def master_part(master: Path) -> Path:
+    # Unique per render, so concurrent renders of one key never share a file;
+    # the finished master is renamed into place.
+    return master.with_name(f".{master.stem}.{os.getpid()}-{uuid4().hex[:8]}.part.mkv")
+
+
+def touch_master(master: Path) -> None:
+    with contextlib.suppress(OSError):
+        os.utime(master)
+
+
+def evict_masters(*, keep: Path | None = None, limit: int = MASTERS_MAX_BYTES) -> list[Path]:
+    """Delete least recently used masters until the store fits in ``limit`` bytes."""
+    if not MASTERS_DIR.is_dir():
+        return []
+    now = time.time()
+    masters: list[tuple[float, int, Path]] = []
+    removed: list[Path] = []
+    for path in MASTERS_DIR.iterdir():
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if path.name.endswith(".part.mkv"):
+            if now - st.st_mtime > STALE_PART_SECONDS:
+                path.unlink(missing_ok=True)
+                removed.append(path)
+        elif _MASTER_NAME_RE.match(path.name):
+            masters.append((st.st_mtime, st.st_size, path))
+    total = sum(size for _, size, _ in masters)
+    for _, size, path in sorted(masters):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        removed.append(path)
+        total -= size
+    return removed
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from array import array
+from collections.abc import Sequence
+from typing import Any, Literal
+
+from .logtable import LogTable, np
+
+SyncMapping = Literal["linear", "rank", "density"]
+
+SYNC_BASE = 946684800  # 2000-01-01; every normalized repo starts here
+SYNC_USER = "_sync_"
+PULSES_PER_SPAN = 8
+DENSITY_BINS = 256
+# Share of the span spread evenly regardless of activity, so quiet stretches
+# compress without collapsing to zero length.
+DENSITY_FLOOR = 0.2
+
+
+def _density_weights(counts: Sequence[int]) -> list[float]:
+    total = sum(counts) or 1
+    bins = len(counts)
+    return [DENSITY_FLOOR / bins + (1 - DENSITY_FLOOR) * count / total for count in counts]
+
+
+def _fractions_numpy(ts: array, mapping: SyncMapping) -> Any:
+    assert np is not None
+    col = np.frombuffer(ts, dtype=np.int64)
+    lo, hi = int(col.min()), int(col.max())
+    width = max(hi - lo, 1)
+    if mapping == "rank":
+        uniq = np.unique(col)
+        if len(uniq) < 2:
+            return np.zeros(len(col))
+        return np.searchsorted(uniq, col) / (len(uniq) - 1)
+    if mapping == "density":
+        bins = np.minimum((col - lo) * DENSITY_BINS // width, DENSITY_BINS - 1)
+        weights = np.array(_density_weights(np.bincount(bins, minlength=DENSITY_BINS).tolist()))
+        knots_y = np.concatenate(([0.0], np.cumsum(weights)))
+        knots_x = lo + width * np.arange(DENSITY_BINS + 1) / DENSITY_BINS
+        return np.interp(col, knots_x, knots_y)
+    return (col - lo) / width
+
+
+def _fractions_python(ts: array, mapping: SyncMapping) -> list[float]:
+    lo, hi = min(ts), max(ts)
+    width = max(hi - lo, 1)
+    if mapping == "rank":
+        uniq = sorted(set(ts))
+        if len(uniq) < 2:
+            return [0.0] * len(ts)
+        rank = {value: idx for idx, value in enumerate(uniq)}
+        last = len(uniq) - 1
+        return [rank[value] / last for value in ts]
+    if mapping == "density":
+        counts = [0] * DENSITY_BINS
+        for value in ts:
+            counts[min((value - lo) * DENSITY_BINS // width, DENSITY_BINS - 1)] += 1
+        weights = _density_weights(counts)
+        cumulative = [0.0]
+        for weight in weights:
+            cumulative.append(cumulative[-1] + weight)
+        bin_width = width / DENSITY_BINS
+        out = []
+        for value in ts:
+            b = min((value - lo) * DENSITY_BINS // width, DENSITY_BINS - 1)
+            offset = (value - lo - b * bin_width) / bin_width
+            out.append(cumulative[b] + weights[b] * offset)
+        return out
+    return [(value - lo) / width for value in ts]
+
+
+def normalize_timestamps(ts: array, sync_span: int, mapping: SyncMapping = "linear") -> array:
+    """Map one repo's timestamps onto ``[SYNC_BASE, SYNC_BASE + sync_span]``.
+
+    ``linear`` rescales the repo's first..last commit; ``rank`` spaces distinct
+    timestamps evenly (equal video time per burst); ``density`` warps time by
+    activity so quiet years shrink.
+    """
+    out = array("q")
+    if not ts:
+        return out
+    if np is not None:
+        frac = _fractions_numpy(ts, mapping)
+        out.frombytes((frac * sync_span + SYNC_BASE).astype(np.int64).tobytes())
+        return out
+    out.extend(int(frac * sync_span + SYNC_BASE) for frac in _fractions_python(ts, mapping))
+    return out
+
+
+def normalize_tables(
+    tables: Sequence[LogTable], sync_span: int, mapping: SyncMapping = "linear"
+) -> list[LogTable]:
+    return [
+        table.with_timestamps(normalize_timestamps(table.timestamps, sync_span, mapping))
+        for table in tables
+    ]
+
+
+def with_sync_pulses(table: LogTable, sync_span: int, repo_name: str) -> LogTable:
+    # Anchor rows at both ends plus evenly spaced pulses keep every repo
+    # visibly alive across the shared timeline in smart sync mode.
+    bounds = table.span()
+    if bounds is None:
+        return table
+    start, end = bounds
+    interval = max(sync_span // PULSES_PER_SPAN, 1)
+    pulses = LogTable()
+    pulses.append(start, SYNC_USER, "M", f"/{repo_name}/.sync/anchor")
+    pulses.append(end, SYNC_USER, "M", f"/{repo_name}/.sync/anchor")
+    for t in range(start + interval, end, interval):
+        pulses.append(t, SYNC_USER, "M", f"/{repo_name}/.sync/pulse")
+    return LogTable.concat([table, pulses]).sorted_by_time()
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import accumulate, pairwise
+from pathlib import Path
+
+from .logscan import scan_stamps
+
+DEFAULT_SECONDS_PER_DAY = 0.12
+DEFAULT_TIME_SCALE = 1.6
+DEFAULT_AUTO_SKIP = 0.5
+DEFAULT_TOLERANCE = 0.1
+
+# Gource clamps --time-scale to this range; seconds-per-day has no hard cap but
+# values outside this window produce unusable videos.
+MIN_TIME_SCALE = 0.1
+MAX_TIME_SCALE = 4.0
+MIN_SECONDS_PER_DAY = 0.001
+MAX_SECONDS_PER_DAY = 60.0
+
+DAY_SECONDS = 86400
+
+
+@dataclass(frozen=True)
+class LogTimeline:
+    start: int
+    end: int
+    events: int
+    active_days: int
+    gaps: tuple[int, ...]  # sorted gaps (seconds) between consecutive distinct timestamps
+
+    @property
+    def span_days(self) -> float:
+        return max(self.end - self.start, 0) / DAY_SECONDS
+
+    @property
+    def density(self) -> float:
+        span = max(self.span_days, 1.0)
+        return min(self.active_days / span, 1.0)
+
+
+@dataclass(frozen=True)
+class Pacing:
+    seconds_per_day: float
+    time_scale: float
+    auto_skip: float
+    estimated_seconds: float
+
+
+def read_log_timeline(log_path: Path) -> LogTimeline:
+    scan = scan_stamps(log_path)
+    stamps, events = scan.stamps, scan.events
+
+    if not stamps:
+        return LogTimeline(start=0, end=0, events=0, active_days=0, gaps=())
+
+    ordered = sorted(stamps)
+    gaps = sorted(b - a for a, b in pairwise(ordered))
+    active_days = len({ts // DAY_SECONDS for ts in ordered})
+    return LogTimeline(
+        start=ordered[0],
+        end=ordered[-1],
+        events=events,
+        active_days=active_days,
+        gaps=tuple(gaps),
+    )
+
+
+class _DurationModel:
+    # Gource advances `seconds_per_day / time_scale` video seconds per day of
+    # history and jumps ahead once nothing has happened for `auto_skip` seconds,
+    # so every idle gap costs min(gap_video_seconds, auto_skip).
+    def __init__(self, timeline: LogTimeline) -> None:
+        self.gaps = timeline.gaps
+        self.prefix = [0, *accumulate(timeline.gaps)]
+
+    def duration(self, video_per_day: float, auto_skip: float) -> float:
+        if not self.gaps or video_per_day <= 0:
+            return 0.0
+        per_second = video_per_day / DAY_SECONDS
+        if auto_skip <= 0:
+            return per_second * self.prefix[-1]
+        threshold = auto_skip / per_second
+        k = bisect_left(self.gaps, threshold)
+        return per_second * self.prefix[k] + auto_skip * (len(self.gaps) - k)
+
+    def ceiling(self, auto_skip: float) -> float:
+        if auto_skip <= 0:
+            return float("inf")
+        return auto_skip * len(self.gaps)
+
+
+def estimate_duration(
+    timeline: LogTimeline,
+    *,
+    seconds_per_day: float,
+    time_scale: float,
+    auto_skip: float,
+) -> float:
+    model = _DurationModel(timeline)
+    return model.duration(seconds_per_day / max(time_scale, 1e-9), auto_skip)
+
+
+def tune_pacing(
+    timeline: LogTimeline,
+    *,
+    target_seconds: float,
+    time_scale: float = DEFAULT_TIME_SCALE,
+    auto_skip: float = DEFAULT_AUTO_SKIP,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> Pacing:
+    if target_seconds <= 0:
+        raise ValueError("Target duration must be > 0")
+    if not timeline.gaps:
+        raise ValueError("Log has fewer than two distinct timestamps; nothing to pace")
+
+    model = _DurationModel(timeline)
+
+    # Every gap is capped at auto_skip, so a long target on a sparse log needs a
+    # larger skip window before any seconds-per-day value can reach it.
+    if model.ceiling(auto_skip) < target_seconds * (1 + tolerance / 2):
+        auto_skip = target_seconds * (1 + tolerance) / len(timeline.gaps)
+
+    lo, hi = 0.0, 1.0
+    while model.duration(hi, auto_skip) < target_seconds and hi < 1e9:
+        hi *= 2
+    for _ in range(100):
+        mid = (lo + hi) / 2
+        if model.duration(mid, auto_skip) < target_seconds:
+            lo = mid
+        else:
+            hi = mid
+        if hi - lo <= hi * 1e-6:
+            break
+    video_per_day = hi
+
+    scale = min(max(time_scale, MIN_TIME_SCALE), MAX_TIME_SCALE)
+    seconds_per_day = video_per_day * scale
+    if seconds_per_day < MIN_SECONDS_PER_DAY:
+        scale = min(MAX_TIME_SCALE, MIN_SECONDS_PER_DAY / video_per_day)
+    elif seconds_per_day > MAX_SECONDS_PER_DAY:
+        scale = max(MIN_TIME_SCALE, MAX_SECONDS_PER_DAY / video_per_day)
+    seconds_per_day = min(max(video_per_day * scale, MIN_SECONDS_PER_DAY), MAX_SECONDS_PER_DAY)
+
+    estimated = model.duration(seconds_per_day / scale, auto_skip)
+    return Pacing(
+        seconds_per_day=round(seconds_per_day, 6),
+        time_scale=round(scale, 4),
+        auto_skip=round(auto_skip, 4),
+        estimated_seconds=estimated,
+    )
+
+
+def within_tolerance(pacing: Pacing, target_seconds: float, tolerance: float) -> bool:
+    return abs(pacing.estimated_seconds - target_seconds) <= target_seconds * tolerance
@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("ENVISAGED_CACHE_DIR") or Path.home() / ".cache" / "envisaged")
+RENDER_JOBS_DIR = CACHE_DIR / "renders"
+MASTERS_DIR = CACHE_DIR / "masters"
+WEB_JOBS_DB = Path(os.environ.get("ENVISAGED_JOB_DB") or CACHE_DIR / "web-jobs.sqlite3")
+WEB_OUTPUT_DIR = Path(
+    os.environ.get("ENVISAGED_WEB_OUTPUT_DIR")
+    or Path.home() / ".openclaw" / "workspace" / "out" / "web"
+)
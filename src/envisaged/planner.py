@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import shlex
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import typer
+from rich.table import Table
+
+from .cli import (
+    ALLOWED_FPS,
+    RESOLUTION_MAP,
+    FilterPlan,
+    RenderConfig,
+    SyncMode,
+    apply_pacing,
+    build_filter_plan,
+    console,
+    filter_args,
+    frame_for_template,
+    load_resumable_logs,
+    pace_for_target,
+    prepare_logs,
+    resolve_sync_timing,
+)
+from .costmodel import CostModel, RenderCost, render_kind
+from .jobstore import RepoSource
+from .pacing import LogTimeline, estimate_duration, read_log_timeline
+from .templates import TEMPLATES
+
+
+@dataclass(frozen=True)
+class RenderPlan:
+    config: RenderConfig  # with --target-duration pacing applied
+    timeline: LogTimeline
+    sync_timing: SyncMode
+    video_seconds: float
+    frames: int
+    filter: FilterPlan
+    kind: str
+    calibration_samples: int
+    cost: RenderCost
+
+    @property
+    def filter_args(self) -> list[str]:
+        return filter_args(self.filter)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "events": self.timeline.events,
+            "span_days": round(self.timeline.span_days, 2),
+            "active_days": self.timeline.active_days,
+            "seconds_per_day": self.config.seconds_per_day,
+            "time_scale": self.config.time_scale,
+            "auto_skip": self.config.auto_skip,
+            "video_seconds": round(self.video_seconds, 1),
+            "frames": self.frames,
+            "resolution": self.config.resolution,
+            "fps": self.config.fps,
+            "sync_timing": self.sync_timing,
+            "kind": self.kind,
+            "calibration_samples": self.calibration_samples,
+            "estimated_seconds": self.cost.seconds,
+            "estimated_output_mb": self.cost.output_mb,
+            "estimated_cores": round(self.cost.cores, 2),
+            "estimated_memory_mb": self.cost.memory_mb,
+            "filter_complex": not self.filter.simple,
+            "filter": self.filter_args[1] if self.filter_args else "",
+        }
+
+
+def plan_render(
+    config: RenderConfig,
+    *,
+    source: RepoSource | None = None,
+    model: CostModel | None = None,
+) -> RenderPlan:
+    """Run only the cheap stages of a render: logs, pacing and the filter graph.
+
+    Nothing is started besides log collection (``git log``, journalctl); the
+    wall time and output size come from the host's calibration table.
+    """
+    if config.fps not in ALLOWED_FPS:
+        raise typer.BadParameter("Unsupported fps (supported: 25, 30, 60)")
+    if config.template not in TEMPLATES:
+        raise typer.BadParameter(f"Unsupported template: {config.template}")
+    model = model or CostModel()
+    width, height = RESOLUTION_MAP[config.resolution]
+    sync_timing = resolve_sync_timing(config)
+
+    with tempfile.TemporaryDirectory(ignore_cleanup_errors=True) as tmp:
+        logs = load_resumable_logs(config) if config.segments > 1 else None
+        if logs is None:
+            logs = prepare_logs(config, Path(tmp), sync_timing)
+        timeline = read_log_timeline(logs.devlog)
+        if config.target_duration:
+            pacing = pace_for_target(config, timeline)
+            config = apply_pacing(config, pacing)
+            video_seconds = pacing.estimated_seconds
+        else:
+            video_seconds = estimate_duration(
+                timeline,
+                seconds_per_day=config.seconds_per_day,
+                time_scale=config.time_scale,
+                auto_skip=config.auto_skip,
+            )
+
+        quad_multi = (
+            config.template == "split-quad"
+            and config.multi_dir is not None
+            and len(logs.repo_logs) >= 4
+        )
+        filter_plan = build_filter_plan(
+            config,
+            width=width,
+            height=height,
+            frame=frame_for_template(config.template),
+            devlog=logs.devlog,
+            repo_names=logs.repo_names[:4] if quad_multi else logs.repo_names,
+            sync_timing=sync_timing,
+            repo_logs=logs.repo_logs,
+            quad_multi=quad_multi,
+            # Only whether there is a logo shapes the graph; it is not fetched.
+            logo_file=Path(config.logo) if config.logo else None,
+        )
+
+    kind = render_kind(config, source)
+    return RenderPlan(
+        config=config,
+        timeline=timeline,
+        sync_timing=sync_timing,
+        video_seconds=video_seconds,
+        frames=round(video_seconds * config.fps),
+        filter=filter_plan,
+        kind=kind,
+        calibration_samples=int(model.kind_stats(kind)["samples"]),
+        cost=model.estimate(config, source, timeline, video_seconds=video_seconds),
+    )
+
+
+def _duration(seconds: float) -> str:
+    minutes, secs = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{secs:02d}s" if hours else f"{minutes}m{secs:02d}s"
+
+
+def print_plan(plan: RenderPlan) -> None:
+    config = plan.config
+    width, height = RESOLUTION_MAP[config.resolution]
+    timeline = plan.timeline
+    calibration = (
+        f"{plan.calibration_samples} past '{plan.kind}' render(s)"
+        if plan.calibration_samples
+        else f"defaults (no '{plan.kind}' renders timed on this host yet)"
+    )
+
+    table = Table(title=f"Plan: {config.output}", show_header=False)
+    table.add_column("Stage")
+    table.add_column("Value")
+    table.add_row("Events", f"{timeline.events}")
+    table.add_row("History", f"{timeline.span_days:.1f} days ({timeline.active_days} active)")
+    table.add_row(
+        "Pacing",
+        f"seconds-per-day={config.seconds_per_day:g}, time-scale={config.time_scale:g}, "
+        f"auto-skip={config.auto_skip:g}",
+    )
+    table.add_row("Video", f"{_duration(plan.video_seconds)} ({plan.frames} frames)")
+    table.add_row(
+        "Output",
+        f"{width}x{height} ({config.resolution}), fps={config.fps}, "
+        f"template={config.template}, sync={plan.sync_timing}",
+    )
+    table.add_row("Wall time", f"~{_duration(plan.cost.seconds)}")
+    table.add_row("Output size", f"~{plan.cost.output_mb:.0f} MB at crf {config.crf}")
+    table.add_row(
+        "Resources", f"~{plan.cost.cores:.1f} cores, ~{plan.cost.memory_mb:.0f} MB memory"
+    )
+    table.add_row("Calibration", calibration)
+    console.print(table)
+
+    if plan.filter_args:
+        console.print("Filter graph:")
+        console.print(shlex.join(plan.filter_args), markup=False, highlight=False, soft_wrap=True)
+    else:
+        console.print("Filter graph: none (frames are encoded as-is)")
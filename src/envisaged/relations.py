@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import functools
+import heapq
+import math
+import re
+from collections import defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from itertools import combinations
+from pathlib import Path
+
+DEFAULT_MAX_RELATIONS = 8
+MIN_SHARED_TOKEN_LEN = 4
+# Keys held by more repos than this (e.g. "src", a bot author) say little about
+# any single pair and would make candidate generation quadratic again.
+MAX_POSTING = 64
+IGNORED_USERS = {"_sync_"}
+FALLBACK_LINE = "- Similar stack family inferred from naming and cadence"
+
+VARIANT_WEIGHT = 3.0
+AUTHOR_WEIGHT = 2.0
+PATH_WEIGHT = 0.5
+WINDOW_WEIGHT = 0.5
+
+_TOKEN_SPLIT_RE = re.compile(r"[^a-z0-9]+")
+
+
+def name_tokens(name: str) -> tuple[str, ...]:
+    base = name.lower().removesuffix("-nix")
+    return tuple(tok for tok in _TOKEN_SPLIT_RE.split(base) if tok)
+
+
+@dataclass
+class RepoProfile:
+    name: str
+    tokens: tuple[str, ...]
+    authors: set[str] = field(default_factory=set)
+    top_paths: set[str] = field(default_factory=set)
+    start: int | None = None
+    end: int | None = None
+
+
+@functools.lru_cache(maxsize=1024)
+def _read_profile(name: str, log: str, _mtime_ns: int, _size: int) -> RepoProfile:
+    profile = RepoProfile(name=name, tokens=name_tokens(name))
+    prefix = f"/{name}/"
+    start = end = None
+    with open(log, encoding="utf-8", errors="ignore") as fh:
+        for raw in fh:
+            parts = raw.rstrip("\n").split("|", 3)
+            if len(parts) != 4 or not parts[0].isdigit():
+                continue
+            user = parts[1].strip()
+            if user in IGNORED_USERS:
+                continue
+            ts = int(parts[0])
+            start = ts if start is None or ts < start else start
+            end = ts if end is None or ts > end else end
+            profile.authors.add(user.lower())
+            top, sep, _ = parts[3].removeprefix(prefix).lstrip("/").partition("/")
+            if sep:
+                profile.top_paths.add(top)
+    profile.start, profile.end = start, end
+    return profile
+
+
+def read_profile(name: str, log: Path) -> RepoProfile:
+    # Fan-out variants and re-renders ask for the same logs; key on mtime/size.
+    st = log.stat()
+    return _read_profile(name, str(log), st.st_mtime_ns, st.st_size)
+
+
+@dataclass(frozen=True)
+class Relation:
+    a: str
+    b: str
+    score: float
+    reason: str
+
+
+def _is_variant(a: tuple[str, ...], b: tuple[str, ...]) -> bool:
+    if a == b:
+        return True
+    short, long = sorted((a, b), key=len)
+    n = len(short)
+    return n > 0 and any(long[i : i + n] == short for i in range(len(long) - n + 1))
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+class RelationEngine:
+    """Ranks repo pairs without comparing every pair.
+
+    Candidate pairs come from inverted indexes over name tokens (and, with
+    signals enabled, authors and top-level paths); only those are scored.
+    """
+
+    def __init__(
+        self,
+        profiles: Sequence[RepoProfile],
+        *,
+        signals: bool = False,
+        windows: bool = True,
+    ) -> None:
+        self.profiles = list(profiles)
+        self.signals = signals
+        self.windows = windows
+        self._token_df: dict[str, int] = defaultdict(int)
+        self._path_df: dict[str, int] = defaultdict(int)
+        for profile in self.profiles:
+            for tok in set(profile.tokens):
+                self._token_df[tok] += 1
+            for top in profile.top_paths:
+                self._path_df[top] += 1
+
+    def _candidates(self) -> set[tuple[int, int]]:
+        postings: dict[tuple[str, str], list[int]] = defaultdict(list)
+        for idx, profile in enumerate(self.profiles):
+            for tok in set(profile.tokens):
+                postings["token", tok].append(idx)
+            if self.signals:
+                for author in profile.authors:
+                    postings["author", author].append(idx)
+                for top in profile.top_paths:
+                    postings["path", top].append(idx)
+
+        pairs: set[tuple[int, int]] = set()
+        for members in postings.values():
+            if len(members) > MAX_POSTING:
+                continue
+            pairs.update(combinations(members, 2))
+        return pairs
+
+    def _idf(self, df: int) -> float:
+        return 1.0 + math.log(len(self.profiles) / df)
+
+    def score(self, a: RepoProfile, b: RepoProfile) -> Relation | None:
+        parts: list[tuple[float, str]] = []
+
+        variant = _is_variant(a.tokens, b.tokens)
+        if variant:
+            parts.append((VARIANT_WEIGHT, "variant line"))
+        shared_tokens = [
+            tok for tok in set(a.tokens) & set(b.tokens) if len(tok) >= MIN_SHARED_TOKEN_LEN
+        ]
+        if shared_tokens:
+            best = max(shared_tokens, key=lambda tok: (self._idf(self._token_df[tok]), tok))
+            weight = sum(self._idf(self._token_df[tok]) for tok in shared_tokens)
+            parts.append((weight, f"shared: {best}"))
+
+        if self.signals:
+            authors = a.authors & b.authors
+            if authors:
+                weight = AUTHOR_WEIGHT * _jaccard(a.authors, b.authors)
+                parts.append((weight, f"shared authors: {len(authors)}"))
+            paths = a.top_paths & b.top_paths
+            if paths:
+                rare = sorted(paths, key=lambda top: (self._path_df[top], top))[:2]
+                weight = PATH_WEIGHT * _jaccard(a.top_paths, b.top_paths)
+                parts.append((weight, f"shared paths: {', '.join(rare)}"))
+            if self.windows and None not in (a.start, a.end, b.start, b.end):
+                assert a.start is not None and a.end is not None
+                assert b.start is not None and b.end is not None
+                overlap = min(a.end, b.end) - max(a.start, b.start)
+                union = max(a.end, b.end) - min(a.start, b.start)
+                if overlap > 0 and union > 0:
+                    parts.append((WINDOW_WEIGHT * overlap / union, "active together"))
+
+        if not parts:
+            return None
+        total = sum(weight for weight, _ in parts)
+        # A variant line is the most specific explanation even when shared
+        # tokens contribute more to the score.
+        reason = parts[0][1] if variant else max(parts, key=lambda part: part[0])[1]
+        return Relation(a=a.name, b=b.name, score=total, reason=reason)
+
+    def top(self, k: int = DEFAULT_MAX_RELATIONS) -> list[Relation]:
+        scored = (self.score(self.profiles[i], self.profiles[j]) for i, j in self._candidates())
+        return heapq.nsmallest(
+            k,
+            (rel for rel in scored if rel is not None),
+            key=lambda rel: (-rel.score, rel.a, rel.b),
+        )
+
+
+def build_relationship_lines(
+    repo_names: Sequence[str],
+    max_rel: int = DEFAULT_MAX_RELATIONS,
+    *,
+    repo_logs: Sequence[Path] = (),
+    signals: bool = False,
+    windows: bool = True,
+) -> list[str]:
+    use_logs = signals and len(repo_logs) == len(repo_names)
+    if use_logs:
+        profiles = [read_profile(n, log) for n, log in zip(repo_names, repo_logs, strict=True)]
+    else:
+        profiles = [RepoProfile(name=n, tokens=name_tokens(n)) for n in repo_names]
+    engine = RelationEngine(profiles, signals=use_logs, windows=windows)
+    lines = ["RELATIONSHIPS", ""]
+    lines += [f"- {rel.a} <-> {rel.b} ({rel.reason})" for rel in engine.top(max_rel)]
+    if len(lines) == 2:
+        lines.append(FALLBACK_LINE)
+    return lines
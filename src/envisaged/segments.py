@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from itertools import pairwise
+from pathlib import Path
+from typing import Any
+
+from .binlog import BinaryLog
+from .pacing import DAY_SECONDS
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+# Everything a segmented render writes into its job dir; nothing else there
+# (it may be a directory the user passed with --job-dir) is ever removed.
+JOB_FILE_PATTERNS = (
+    MANIFEST_NAME,
+    "manifest.tmp",
+    "seg-*.log",
+    "seg-*.mp4",
+    "repo-*.log",
+    "development.log",
+    "development.evlog",
+    "development.evlog.tmp",
+    "concat.txt",
+)
+
+
+@dataclass
+class Segment:
+    index: int
+    start: int
+    end: int
+    log: str
+    file: str
+    done: bool = False
+
+
+@dataclass
+class SegmentManifest:
+    key: str
+    devlog: str
+    repo_names: list[str] = field(default_factory=list)
+    repo_logs: list[str] = field(default_factory=list)  # per-repo logs, for relations
+    segments: list[Segment] = field(default_factory=list)
+    version: int = MANIFEST_VERSION
+
+    def pending(self) -> list[Segment]:
+        return [seg for seg in self.segments if not seg.done]
+
+    def save(self, job_dir: Path) -> None:
+        path = job_dir / MANIFEST_NAME
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self), indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, job_dir: Path) -> SegmentManifest | None:
+        path = job_dir / MANIFEST_NAME
+        try:
+            data: dict[str, Any] = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        segments = [Segment(**seg) for seg in data.pop("segments", [])]
+        manifest = cls(**data, segments=segments)
+        # A segment only counts as done if its file survived the restart.
+        for seg in manifest.segments:
+            if seg.done and not (job_dir / seg.file).is_file():
+                seg.done = False
+        return manifest
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        while chunk := fh.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_key(params: dict[str, Any], log_path: Path) -> str:
+    payload = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode("utf-8"))
+    digest.update(file_digest(log_path).encode("ascii"))
+    return digest.hexdigest()[:20]
+
+
+def plan_boundaries(
+    log: BinaryLog,
+    count: int,
+    *,
+    seconds_per_day: float,
+    time_scale: float,
+    auto_skip: float,
+) -> list[int]:
+    # Split on equal *video* time rather than equal history time so idle years
+    # (which auto-skip collapses) do not produce near-empty segments.
+    ordered = sorted(set(log.timestamps()))
+    if len(ordered) < 2 or count <= 1:
+        return [ordered[0]] if ordered else []
+
+    per_second = seconds_per_day / max(time_scale, 1e-9) / DAY_SECONDS
+    cumulative = [0.0]
+    for a, b in pairwise(ordered):
+        cost = (b - a) * per_second
+        if auto_skip > 0:
+            cost = min(cost, auto_skip)
+        cumulative.append(cumulative[-1] + cost)
+
+    total = cumulative[-1]
+    boundaries = [ordered[0]]
+    idx = 0
+    for k in range(1, count):
+        goal = total * k / count
+        while idx < len(cumulative) - 1 and cumulative[idx] < goal:
+            idx += 1
+        if ordered[idx] > boundaries[-1]:
+            boundaries.append(ordered[idx])
+    return boundaries
+
+
+def write_segment_logs(log: BinaryLog, boundaries: list[int], out_dir: Path) -> list[Segment]:
+    # Each segment log starts with a snapshot of every file alive at its start
+    # time, attributed to its last author, so Gource rebuilds the same tree
+    # instead of starting from empty. Windows are read through the time index
+    # rather than by scanning the log.
+    segments: list[Segment] = []
+    alive: dict[int, int] = {}  # path id -> user id of its last change
+    paths = log.path_pool.values
+    users = log.user_pool.values
+    deletes = {ord("D"), ord("d")}
+
+    for index, start in enumerate(boundaries):
+        end = boundaries[index + 1] if index + 1 < len(boundaries) else None
+        window = log.read(start, end)
+        if not len(window):
+            continue
+        name = f"seg-{index:03d}"
+        with (out_dir / f"{name}.log").open("w", encoding="utf-8") as fh:
+            fh.write(
+                "".join(f"{start}|{users[uid]}|A|{paths[pid]}\n" for pid, uid in alive.items())
+            )
+            window.write(fh)
+        segments.append(
+            Segment(
+                index=index,
+                start=start,
+                end=window.timestamps[-1],
+                log=f"{name}.log",
+                file=f"{name}.mp4",
+            )
+        )
+        for action, uid, pid in zip(window.actions, window.users, window.paths, strict=True):
+            if action in deletes:
+                alive.pop(pid, None)
+            else:
+                alive[pid] = uid
+    return segments
+
+
+def concat_list(job_dir: Path, manifest: SegmentManifest) -> Path:
+    listing = job_dir / "concat.txt"
+    lines = [f"file '{(job_dir / seg.file).as_posix()}'" for seg in manifest.segments]
+    listing.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return listing
+
+
+def segment_files(job_dir: Path) -> list[Path]:
+    return [*job_dir.glob("seg-*.log"), *job_dir.glob("seg-*.mp4")]
+
+
+def remove_job_files(job_dir: Path) -> None:
+    for pattern in JOB_FILE_PATTERNS:
+        for path in job_dir.glob(pattern):
+            path.unlink(missing_ok=True)
+    # Only removed when nothing else lives there.
+    with contextlib.suppress(OSError):
+        job_dir.rmdir()
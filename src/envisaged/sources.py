@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import shutil
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+
+from .cli import RenderConfig
+from .jobstore import RepoSource
+from .supervisor import ProcessSpec, Runner, run_process
+
+FETCH_WORKERS = max(1, int(os.environ.get("ENVISAGED_FETCH_WORKERS", "4")))
+
+REPO_CACHE_DIR = Path("/tmp/envisaged-web-repos")
+MULTI_REPO_WORK_DIR = Path("/tmp/envisaged-web-multi")
+
+REPO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+MULTI_REPO_WORK_DIR.mkdir(parents=True, exist_ok=True)
+
+auth_repo_re = re.compile(r"^[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+$")
+
+_LOCK = threading.Lock()
+_REPO_LOCKS: dict[Path, threading.Lock] = {}
+
+
+def _repo_lock(local_dir: Path) -> threading.Lock:
+    # Two jobs (or two entries of one multi-repo job) may fetch the same repo.
+    with _LOCK:
+        return _REPO_LOCKS.setdefault(local_dir, threading.Lock())
+
+
+def _clone_or_update(remote_url: str, local_dir: Path, runner: Runner) -> None:
+    with _repo_lock(local_dir):
+        if (local_dir / ".git").is_dir():
+            git = ["git", "-C", str(local_dir)]
+            runner(ProcessSpec("git", [*git, "remote", "set-url", "origin", remote_url]))
+            runner(ProcessSpec("git", [*git, "fetch", "origin", "--prune"]))
+            runner(ProcessSpec("git", [*git, "pull", "--ff-only"]))
+        else:
+            runner(ProcessSpec("git", ["git", "clone", remote_url, str(local_dir)]))
+
+
+def _repo_owner_name(repo_input: str) -> tuple[str, str] | None:
+    raw = repo_input.strip()
+
+    if auth_repo_re.match(raw):
+        owner, name = raw.split("/", 1)
+        return owner, name.removesuffix(".git")
+
+    if raw.startswith("git@github.com:"):
+        path = raw.split("git@github.com:", 1)[1]
+        if "/" in path:
+            owner, name = path.split("/", 1)
+            return owner, name.removesuffix(".git")
+
+    if raw.startswith("http://") or raw.startswith("https://"):
+        parsed = urllib.parse.urlparse(raw)
+        if parsed.netloc.lower() in {"github.com", "www.github.com"}:
+            parts = [p for p in parsed.path.split("/") if p]
+            if len(parts) >= 2:
+                return parts[0], parts[1].removesuffix(".git")
+
+    return None
+
+
+def _normalize_github_url(repo_input: str) -> str:
+    owner_name = _repo_owner_name(repo_input)
+    if owner_name is None:
+        return repo_input
+    owner, name = owner_name
+    return f"https://github.com/{owner}/{name}.git"
+
+
+def _ensure_local_repo(repo_input: str, runner: Runner) -> str:
+    owner_name = _repo_owner_name(repo_input)
+    if owner_name is None:
+        return repo_input
+
+    owner, name = owner_name
+    local_dir = REPO_CACHE_DIR / f"{owner}__{name}"
+    _clone_or_update(_normalize_github_url(repo_input), local_dir, runner)
+    return str(local_dir)
+
+
+def _resolve_repo_to_local(repo_input: str, runner: Runner) -> Path:
+    raw = repo_input.strip()
+    if not raw:
+        raise ValueError("Empty repository entry")
+
+    # Local path
+    local_path = Path(raw).expanduser()
+    if local_path.exists():
+        resolved = local_path.resolve()
+        if not (resolved / ".git").is_dir():
+            raise ValueError(f"Not a git repo: {resolved}")
+        return resolved
+
+    # GitHub shorthand/url → cached clone
+    owner_name = _repo_owner_name(raw)
+    if owner_name is not None:
+        return Path(_ensure_local_repo(raw, runner))
+
+    # Generic git URL clone cache
+    if raw.startswith("http://") or raw.startswith("https://") or raw.startswith("git@"):
+        slug = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+        local_dir = REPO_CACHE_DIR / f"remote__{slug}"
+        _clone_or_update(raw, local_dir, runner)
+        return local_dir
+
+    raise ValueError(f"Unsupported repository input: {raw}")
+
+
+def _prepare_multi_repo_dir(job_id: str, repos_text: str, multi_dir: str, runner: Runner) -> Path:
+    entries = [line.strip() for line in repos_text.splitlines() if line.strip()]
+
+    # Fallback to directory scanning if no explicit list provided.
+    if not entries:
+        base = Path(multi_dir).expanduser().resolve()
+        if not base.is_dir():
+            raise ValueError(f"Multi dir does not exist: {base}")
+        return base
+
+    job_dir = MULTI_REPO_WORK_DIR / job_id
+    job_dir.mkdir(parents=True, exist_ok=True)
+
+    # Distinct entries are fetched in parallel; order is kept for naming.
+    unique = list(dict.fromkeys(entries))
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(unique))) as pool:
+        fetched = pool.map(lambda entry: _resolve_repo_to_local(entry, runner), unique)
+        resolved = dict(zip(unique, fetched, strict=True))
+
+    used_names: set[str] = set()
+    for idx, entry in enumerate(entries, start=1):
+        repo_path = resolved[entry]
+        base_name = re.sub(r"[^A-Za-z0-9_.-]", "-", repo_path.name) or f"repo-{idx}"
+        name = base_name
+        n = 2
+        while name in used_names:
+            name = f"{base_name}-{n}"
+            n += 1
+        used_names.add(name)
+
+        link = job_dir / name
+        if link.exists() or link.is_symlink():
+            link.unlink()
+        link.symlink_to(repo_path, target_is_directory=True)
+
+    return job_dir
+
+
+def acquire_source(
+    job_id: str,
+    source: RepoSource,
+    config: RenderConfig,
+    *,
+    runner: Runner = run_process,
+) -> RenderConfig:
+    # A re-queued job that lands on the host which already fetched it reuses
+    # the checkout; any other host fetches it again.
+    if config.input_repo is not None and Path(config.input_repo).is_dir():
+        return config
+    if config.multi_dir is not None and config.multi_dir.is_dir():
+        return config
+    if source.mode == "single":
+        return replace(config, input_repo=str(_resolve_repo_to_local(source.repo, runner)))
+    if source.mode == "multi":
+        multi_dir = _prepare_multi_repo_dir(job_id, source.multi_repos, source.multi_dir, runner)
+        return replace(config, multi_dir=multi_dir)
+    return config
+
+
+def cleanup_job_files(job_id: str, config: RenderConfig, *, keep_output: bool) -> None:
+    shutil.rmtree(MULTI_REPO_WORK_DIR / job_id, ignore_errors=True)
+    if config.job_dir is not None:
+        shutil.rmtree(config.job_dir, ignore_errors=True)
+    if not keep_output:
+        config.output.unlink(missing_ok=True)
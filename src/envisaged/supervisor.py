@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import re
+import signal
+import sys
+from collections import deque
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+
+from .affinity import pinned_argv, set_affinity
+
+STDERR_RING_LINES = 200
+STDERR_LINE_LIMIT = 2000
+TERMINATE_GRACE_SECONDS = 5.0
+
+_LINE_SPLIT_RE = re.compile(rb"[\r\n]+")
+
+T = TypeVar("T")
+
+
+class ProcessFailed(RuntimeError):
+    def __init__(self, name: str, returncode: int, stderr_tail: list[str]) -> None:
+        self.name = name
+        self.returncode = returncode
+        self.stderr_tail = stderr_tail
+        message = f"{name} exited with status {returncode}"
+        if stderr_tail:
+            message += ":\n" + "\n".join(stderr_tail[-20:])
+        super().__init__(message)
+
+
+@dataclass
+class ProcessSpec:
+    name: str
+    argv: list[str]
+    env: dict[str, str] | None = None  # merged over os.environ
+    cwd: Path | None = None
+    stdout: Path | None = None  # file for the last stage's output instead of /dev/null
+
+
+# Starts one process and waits for it; raises ProcessFailed on a non-zero exit.
+Runner = Callable[[ProcessSpec], None]
+
+
+class StderrRing:
+    def __init__(self, maxlen: int = STDERR_RING_LINES) -> None:
+        self.lines: deque[str] = deque(maxlen=maxlen)
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> None:
+        data = self._partial + chunk
+        parts = _LINE_SPLIT_RE.split(data)
+        self._partial = parts.pop()[-STDERR_LINE_LIMIT:]
+        for part in parts:
+            if part:
+                self.lines.append(part[:STDERR_LINE_LIMIT].decode("utf-8", errors="replace"))
+
+    def close(self) -> None:
+        if self._partial:
+            self.lines.append(self._partial.decode("utf-8", errors="replace"))
+            self._partial = b""
+
+    def tail(self, n: int = 20) -> list[str]:
+        return list(self.lines)[-n:]
+
+
+@dataclass
+class _Running:
+    spec: ProcessSpec
+    proc: asyncio.subprocess.Process
+    ring: StderrRing
+    reader: asyncio.Task[None]
+
+
+class Supervisor:
+    """Runs Gource/ffmpeg style process chains without a shell.
+
+    Stages are connected with plain OS pipes, so a slow consumer blocks the producer
+    in the kernel instead of buffering frames in Python. Every child gets its own
+    process group; a failure, timeout or cancellation tears the whole chain down.
+    With ``cpus`` set, every child is pinned to that core set.
+    """
+
+    def __init__(
+        self,
+        *,
+        echo_stderr: bool = True,
+        grace: float = TERMINATE_GRACE_SECONDS,
+        cpus: Sequence[int] | None = None,
+    ) -> None:
+        self.echo_stderr = echo_stderr
+        self.grace = grace
+        self.cpus = tuple(cpus) if cpus else None
+        self._threaded: set[asyncio.Task[None]] = set()
+        self._stopped = False
+
+    async def run(self, spec: ProcessSpec, *, timeout: float | None = None) -> None:
+        await self.run_pipeline([spec], timeout=timeout)
+
+    async def run_in_thread(self, func: Callable[..., T], *args: Any) -> T:
+        """``asyncio.to_thread(func, *args, runner=...)`` for blocking code that starts processes.
+
+        The runner starts each process on this event loop, so cancelling the
+        caller kills the process groups still running (a clone, a log
+        collection) instead of leaving them behind, and refuses new ones.
+        """
+        loop = asyncio.get_running_loop()
+
+        def runner(spec: ProcessSpec) -> None:
+            asyncio.run_coroutine_threadsafe(self._run_threaded(spec), loop).result()
+
+        try:
+            return await asyncio.to_thread(func, *args, runner=runner)
+        except asyncio.CancelledError:
+            self._stopped = True
+            tasks = list(self._threaded)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _run_threaded(self, spec: ProcessSpec) -> None:
+        if self._stopped:
+            raise asyncio.CancelledError
+        task = asyncio.current_task()
+        assert task is not None
+        self._threaded.add(task)
+        try:
+            await self.run(spec)
+        finally:
+            self._threaded.discard(task)
+
+    async def run_pipeline(
+        self,
+        stages: Sequence[ProcessSpec],
+        *,
+        timeout: float | None = None,
+    ) -> None:
+        if not stages:
+            return
+        running: list[_Running] = []
+        try:
+            async with asyncio.timeout(timeout):
+                await self._spawn_chain(stages, running)
+                await self._wait(running)
+        except BaseException:
+            await self._terminate(running)
+            raise
+        finally:
+            for item in running:
+                if not item.reader.done():
+                    item.reader.cancel()
+
+    async def _spawn_chain(self, stages: Sequence[ProcessSpec], running: list[_Running]) -> None:
+        read_fd: int | None = None
+        try:
+            for idx, spec in enumerate(stages):
+                write_fd: int | None = None
+                next_read: int | None = None
+                if idx < len(stages) - 1:
+                    next_read, write_fd = os.pipe()
+                elif spec.stdout is not None:
+                    write_fd = os.open(spec.stdout, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    running.append(await self._spawn(spec, stdin=read_fd, stdout=write_fd))
+                finally:
+                    if read_fd is not None:
+                        os.close(read_fd)
+                    if write_fd is not None:
+                        os.close(write_fd)
+                read_fd = next_read
+        finally:
+            if read_fd is not None:
+                os.close(read_fd)
+
+    async def _spawn(self, spec: ProcessSpec, *, stdin: int | None, stdout: int | None) -> _Running:
+        env = None
+        if spec.env:
+            env = {**os.environ, **spec.env}
+        argv, pinned = pinned_argv(spec.argv, self.cpus)
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *argv,
+                stdin=stdin if stdin is not None else asyncio.subprocess.DEVNULL,
+                stdout=stdout if stdout is not None else asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                cwd=spec.cwd,
+                start_new_session=True,
+            )
+        except OSError as exc:
+            raise ProcessFailed(spec.name, 127, [str(exc)]) from exc
+        if not pinned and self.cpus:
+            with contextlib.suppress(OSError):
+                set_affinity(proc.pid, self.cpus)
+
+        ring = StderrRing()
+        reader = asyncio.create_task(self._pump_stderr(proc, ring))
+        return _Running(spec=spec, proc=proc, ring=ring, reader=reader)
+
+    async def _pump_stderr(self, proc: asyncio.subprocess.Process, ring: StderrRing) -> None:
+        assert proc.stderr is not None
+        while chunk := await proc.stderr.read(65536):
+            ring.feed(chunk)
+            if self.echo_stderr:
+                sys.stderr.buffer.write(chunk)
+                sys.stderr.buffer.flush()
+        ring.close()
+
+    async def _wait(self, running: list[_Running]) -> None:
+        waiters = {asyncio.ensure_future(item.proc.wait()): item for item in running}
+        broken_pipe: _Running | None = None
+        pending = set(waiters)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                item = waiters[fut]
+                code = fut.result()
+                if code == 0:
+                    continue
+                # A producer killed by SIGPIPE is a symptom of its consumer dying;
+                # keep waiting so the consumer's error is the one reported.
+                if code == -signal.SIGPIPE:
+                    broken_pipe = broken_pipe or item
+                    continue
+                for other in pending:
+                    other.cancel()
+                raise await self._failure(item, code)
+        if broken_pipe is not None:
+            raise await self._failure(broken_pipe, -signal.SIGPIPE)
+        for item in running:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(asyncio.shield(item.reader), timeout=1.0)
+
+    async def _failure(self, item: _Running, code: int) -> ProcessFailed:
+        with contextlib.suppress(TimeoutError):
+            await asyncio.wait_for(asyncio.shield(item.reader), timeout=1.0)
+        return ProcessFailed(item.spec.name, code, item.ring.tail())
+
+    async def _terminate(self, running: list[_Running]) -> None:
+        for item in running:
+            _signal_group(item.proc.pid, signal.SIGTERM)
+        for item in running:
+            if item.proc.returncode is not None:
+                continue
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(asyncio.shield(item.proc.wait()), timeout=self.grace)
+        for item in running:
+            # SIGKILL the group even if the leader exited; grandchildren may linger.
+            _signal_group(item.proc.pid, signal.SIGKILL)
+            if item.proc.returncode is None:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(asyncio.shield(item.proc.wait()), timeout=self.grace)
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, sig)
+
+
+def run_process(spec: ProcessSpec) -> None:
+    """Runner for synchronous callers without an event loop (e.g. the planner)."""
+    asyncio.run(Supervisor().run(spec))
@@ -1,236 +1,256 @@
 from __future__ import annotations
 
-import hashlib
-import json
-import re
-import subprocess
-import threading
+import asyncio
+import contextlib
+import hmac
+import os
 import urllib.parse
-import urllib.request
-from dataclasses import dataclass
+from collections.abc import AsyncIterator
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
 from pathlib import Path
 from typing import Literal
 from uuid import uuid4
 
 import uvicorn
-from fastapi import FastAPI, Form, Query, Request
+from fastapi import Depends, FastAPI, Form, HTTPException, Query, Request
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-
-from .cli import RenderConfig, render
+from pydantic import BaseModel
+
+from .cli import RESOLUTION_MAP, RenderConfig, render_async
+from .costmodel import ADMISSION_LOOKAHEAD, Admission, Budget, CostModel
+from .github import GitHubSearch
+from .jobstore import (
+    LEASE_SECONDS,
+    POLL_INTERVAL,
+    PRIORITY_RANK,
+    ClaimedJob,
+    HostLoad,
+    JobPriority,
+    JobStore,
+    RenderJob,
+    RepoSource,
+    SQLiteJobStore,
+    decode_config,
+    encode_claim,
+)
+from .pacing import DEFAULT_AUTO_SKIP, DEFAULT_SECONDS_PER_DAY, DEFAULT_TIME_SCALE
+from .paths import RENDER_JOBS_DIR, WEB_JOBS_DB, WEB_OUTPUT_DIR
+from .planner import RenderPlan, plan_render
+from .sources import acquire_source, cleanup_job_files
+from .supervisor import Supervisor
 from .templates import DEFAULT_TEMPLATE, TEMPLATES
+from .xvfb import DISPLAY_POOL, XvfbError
 
 OutputResolution = Literal["2160p", "1440p", "1080p", "720p"]
 SyncMode = Literal["auto", "true", "false", "smart"]
 LegendMode = Literal["auto", "none", "repos", "files", "actions", "services", "all"]
 SystemLogSource = Literal["journal", "kernel", "auth"]
 
+# Upper bound on concurrent renders; within it the cost model admits jobs
+# against the host's CPU/memory budget. 0 makes this a web-only process and
+# renders then run in envisaged-worker processes.
+RENDER_WORKERS = max(0, int(os.environ.get("ENVISAGED_RENDER_WORKERS", "4")))
+# Renders split into more segments than this are rejected.
+MAX_RENDER_SEGMENTS = 16
+WEB_WORKERS = max(1, int(os.environ.get("ENVISAGED_WEB_WORKERS", "1")))
+# Shared secret for the /api/worker endpoints used by remote envisaged-worker
+# hosts; without it those endpoints are disabled.
+WORKER_TOKEN = os.environ.get("ENVISAGED_WORKER_TOKEN", "")
+# Reject renders whose estimated wall time exceeds this many seconds (0: no limit).
+MAX_RENDER_SECONDS = max(0.0, float(os.environ.get("ENVISAGED_MAX_RENDER_SECONDS", "0")))
+
 BASE_DIR = Path(__file__).resolve().parent
 TEMPLATES_DIR = BASE_DIR / "web_templates"
-WEB_OUTPUT_DIR = Path.home() / ".openclaw" / "workspace" / "out" / "web"
-REPO_CACHE_DIR = Path("/tmp/envisaged-web-repos")
-MULTI_REPO_WORK_DIR = Path("/tmp/envisaged-web-multi")
 
 WEB_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-REPO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
-MULTI_REPO_WORK_DIR.mkdir(parents=True, exist_ok=True)
 
-app = FastAPI(title="Envisaged Web")
+# Job records and the queue live in the shared store; only the tasks running
+# in this process are tracked here.
+STORE: JobStore = SQLiteJobStore(WEB_JOBS_DB)
+_OWNER = f"web-{os.getpid()}-{uuid4().hex[:6]}"
+ADMISSION = Admission(
+    CostModel(), Budget.from_host(), slots=max(RENDER_WORKERS, 1), ledger=STORE, owner=_OWNER
+)
+_TASKS: dict[str, asyncio.Task[None]] = {}
+_CLAIMED: dict[str, ClaimedJob] = {}
+_PREEMPTED: set[str] = set()
+# Jobs whose lease expired and were handed to another owner.
+_LOST: set[str] = set()
+# Jobs stopped by an explicit user cancel, as opposed to preemption or shutdown.
+_CANCELLED: set[str] = set()
+_SHUTTING_DOWN = False
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Pre-start a display for the default 720p preview so the first render
+    # does not pay Xvfb startup.
+    with contextlib.suppress(XvfbError, OSError):
+        await asyncio.to_thread(DISPLAY_POOL.warm, *RESOLUTION_MAP["720p"])
+    poller = asyncio.create_task(_poll())
+    yield
+    global _SHUTTING_DOWN
+    _SHUTTING_DOWN = True
+    poller.cancel()
+    # Cancelling tears down each render's Gource/Xvfb/ffmpeg chain instead of
+    # leaving orphaned processes behind when the server stops.
+    tasks = list(_TASKS.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await asyncio.to_thread(DISPLAY_POOL.close)
+
+
+app = FastAPI(title="Envisaged Web", lifespan=_lifespan)
 templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 app.mount("/videos", StaticFiles(directory=str(WEB_OUTPUT_DIR)), name="videos")
 
 
-auth_repo_re = re.compile(r"^[A-Za-z0-9_.-]+/[A-Za-z0-9_.-]+$")
-
-
-@dataclass
-class RenderJob:
-    id: str
-    title: str
-    template: str
-    status: str
-    output_name: str
-    created_at: str
-    error: str | None = None
-
-
-_JOBS: list[RenderJob] = []
-_LOCK = threading.Lock()
-
-
-def _run(cmd: list[str]) -> None:
-    subprocess.run(cmd, check=True)
-
-
-def _add_job(job: RenderJob) -> None:
-    with _LOCK:
-        _JOBS.insert(0, job)
-        del _JOBS[20:]
-
-
-def _update_job(job_id: str, *, status: str, error: str | None = None) -> None:
-    with _LOCK:
-        for job in _JOBS:
-            if job.id == job_id:
-                job.status = status
-                job.error = error
-                return
-
-
-def _jobs_snapshot() -> list[RenderJob]:
-    with _LOCK:
-        return [RenderJob(**job.__dict__) for job in _JOBS]
-
-
-def _repo_owner_name(repo_input: str) -> tuple[str, str] | None:
-    raw = repo_input.strip()
-
-    if auth_repo_re.match(raw):
-        owner, name = raw.split("/", 1)
-        return owner, name.removesuffix(".git")
-
-    if raw.startswith("git@github.com:"):
-        path = raw.split("git@github.com:", 1)[1]
-        if "/" in path:
-            owner, name = path.split("/", 1)
-            return owner, name.removesuffix(".git")
-
-    if raw.startswith("http://") or raw.startswith("https://"):
-        parsed = urllib.parse.urlparse(raw)
-        if parsed.netloc.lower() in {"github.com", "www.github.com"}:
-            parts = [p for p in parsed.path.split("/") if p]
-            if len(parts) >= 2:
-                return parts[0], parts[1].removesuffix(".git")
+GITHUB_SEARCH = GitHubSearch()
 
-    return None
 
+class WorkerLease(BaseModel):
+    owner: str
+    lease: float = LEASE_SECONDS
+    job_id: str | None = None
 
-def _normalize_github_url(repo_input: str) -> str:
-    owner_name = _repo_owner_name(repo_input)
-    if owner_name is None:
-        return repo_input
-    owner, name = owner_name
-    return f"https://github.com/{owner}/{name}.git"
 
+class WorkerPeek(BaseModel):
+    limit: int = ADMISSION_LOOKAHEAD
 
-def _ensure_local_repo(repo_input: str) -> str:
-    owner_name = _repo_owner_name(repo_input)
-    if owner_name is None:
-        return repo_input
 
-    owner, name = owner_name
-    local_dir = REPO_CACHE_DIR / f"{owner}__{name}"
-    remote_url = _normalize_github_url(repo_input)
-
-    if (local_dir / ".git").is_dir():
-        _run(["git", "-C", str(local_dir), "remote", "set-url", "origin", remote_url])
-        _run(["git", "-C", str(local_dir), "fetch", "origin", "--prune"])
-        _run(["git", "-C", str(local_dir), "pull", "--ff-only"])
-    else:
-        _run(["git", "clone", remote_url, str(local_dir)])
-
-    return str(local_dir)
-
-
-def _resolve_repo_to_local(repo_input: str) -> Path:
-    raw = repo_input.strip()
-    if not raw:
-        raise ValueError("Empty repository entry")
-
-    # Local path
-    local_path = Path(raw).expanduser()
-    if local_path.exists():
-        resolved = local_path.resolve()
-        if not (resolved / ".git").is_dir():
-            raise ValueError(f"Not a git repo: {resolved}")
-        return resolved
-
-    # GitHub shorthand/url → cached clone
-    owner_name = _repo_owner_name(raw)
-    if owner_name is not None:
-        return Path(_ensure_local_repo(raw))
-
-    # Generic git URL clone cache
-    if raw.startswith("http://") or raw.startswith("https://") or raw.startswith("git@"):
-        slug = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
-        local_dir = REPO_CACHE_DIR / f"remote__{slug}"
-        if (local_dir / ".git").is_dir():
-            _run(["git", "-C", str(local_dir), "remote", "set-url", "origin", raw])
-            _run(["git", "-C", str(local_dir), "fetch", "origin", "--prune"])
-            _run(["git", "-C", str(local_dir), "pull", "--ff-only"])
-        else:
-            _run(["git", "clone", raw, str(local_dir)])
-        return local_dir
-
-    raise ValueError(f"Unsupported repository input: {raw}")
-
-
-def _prepare_multi_repo_dir(job_id: str, repos_text: str, multi_dir: str) -> Path:
-    entries = [line.strip() for line in repos_text.splitlines() if line.strip()]
-
-    # Fallback to directory scanning if no explicit list provided.
-    if not entries:
-        base = Path(multi_dir).expanduser().resolve()
-        if not base.is_dir():
-            raise ValueError(f"Multi dir does not exist: {base}")
-        return base
-
-    job_dir = MULTI_REPO_WORK_DIR / job_id
-    job_dir.mkdir(parents=True, exist_ok=True)
-
-    used_names: set[str] = set()
-    for idx, entry in enumerate(entries, start=1):
-        repo_path = _resolve_repo_to_local(entry)
-        base_name = re.sub(r"[^A-Za-z0-9_.-]", "-", repo_path.name) or f"repo-{idx}"
-        name = base_name
-        n = 2
-        while name in used_names:
-            name = f"{base_name}-{n}"
-            n += 1
-        used_names.add(name)
-
-        link = job_dir / name
-        if link.exists() or link.is_symlink():
-            link.unlink()
-        link.symlink_to(repo_path, target_is_directory=True)
-
-    return job_dir
-
-
-def _search_github_repos(query: str, per_page: int = 8) -> list[dict[str, str | int | None]]:
-    q = urllib.parse.quote(query)
-    url = f"https://api.github.com/search/repositories?q={q}&sort=stars&order=desc&per_page={per_page}"
-    req = urllib.request.Request(
-        url,
-        headers={
-            "Accept": "application/vnd.github+json",
-            "User-Agent": "envisaged-web",
-        },
-    )
-    with urllib.request.urlopen(req, timeout=10) as response:
-        payload = json.loads(response.read().decode("utf-8"))
-
-    items: list[dict[str, str | int | None]] = []
-    for item in payload.get("items", []):
-        items.append(
-            {
-                "full_name": item.get("full_name"),
-                "html_url": item.get("html_url"),
-                "description": item.get("description"),
-                "stars": item.get("stargazers_count", 0),
-            }
-        )
-    return items
+class WorkerStatus(BaseModel):
+    action: Literal["update", "finish", "requeue"] = "update"
+    status: str
+    error: str | None = None
 
 
-def _render_in_background(job_id: str, config: RenderConfig) -> None:
+class WorkerConfig(BaseModel):
+    config: str
+
+
+class WorkerHost(BaseModel):
+    host: str
+
+
+class WorkerLoad(BaseModel):
+    owner: str
+    clear: bool = False
+    host: str = ""
+    cores: float = 0.0
+    memory_mb: float = 0.0
+    cpus: list[int] = []
+
+
+def _schedule() -> None:
+    if _SHUTTING_DOWN:
+        return
+    while len(_TASKS) < RENDER_WORKERS:
+        picked = ADMISSION.select(STORE.queued(ADMISSION_LOOKAHEAD))
+        if picked is None:
+            break
+        candidate, cost = picked
+        claimed = STORE.claim(_OWNER, LEASE_SECONDS, job_id=candidate.job.id)
+        if claimed is None:
+            continue  # taken by another process; look again
+        ADMISSION.start(claimed.job.id, cost)
+        _CLAIMED[claimed.job.id] = claimed
+        _TASKS[claimed.job.id] = asyncio.create_task(_render_job(claimed))
+
+    waiting_rank = STORE.waiting_rank()
+    if waiting_rank is not None:
+        _maybe_preempt(waiting_rank)
+
+
+def _maybe_preempt(waiting_rank: int) -> None:
+    # Only background renders are preemptible: they go back to the queue and the
+    # freed worker picks up the higher-priority job.
+    candidates = [
+        (PRIORITY_RANK[claimed.job.priority], job_id)
+        for job_id, claimed in _CLAIMED.items()
+        if job_id not in _PREEMPTED and claimed.job.priority == "background"
+    ]
+    if not candidates:
+        return
+    rank, job_id = max(candidates)
+    if rank > waiting_rank:
+        _PREEMPTED.add(job_id)
+        _TASKS[job_id].cancel()
+
+
+async def _poll() -> None:
+    while True:
+        await asyncio.sleep(POLL_INTERVAL)
+        for job_id in list(_TASKS):
+            if not STORE.heartbeat(job_id, _OWNER, LEASE_SECONDS):
+                _LOST.add(job_id)
+                _TASKS[job_id].cancel()
+        for job_id in STORE.cancel_requested(_TASKS):
+            _CANCELLED.add(job_id)
+            _TASKS[job_id].cancel()
+        STORE.reap_expired()
+        _schedule()
+
+
+async def _render_job(claimed: ClaimedJob) -> None:
+    job_id = claimed.job.id
+    config = claimed.config
+    requeue = False
+    keep_output = False
     try:
-        render(config)
-        _update_job(job_id, status="done")
+        if claimed.source is not None:
+            # Through a supervisor, so cancelling the job kills a clone in flight.
+            supervisor = Supervisor(echo_stderr=False)
+            config = await supervisor.run_in_thread(acquire_source, job_id, claimed.source, config)
+            # A preempted job is re-queued with the fetched repos, not refetched.
+            STORE.set_config(job_id, config)
+
+        def on_stage(stage: str) -> None:
+            STORE.update(job_id, status=stage)
+
+        ADMISSION.begin(job_id)
+        await render_async(
+            replace(config, cpus=ADMISSION.cpus(job_id)),
+            echo_stderr=False,
+            on_stage=on_stage,
+            on_logs=ADMISSION.on_logs(job_id, config, claimed.source),
+        )
+        STORE.finish(job_id, status="done")
+        ADMISSION.finish(job_id, config=config, source=claimed.source)
+        keep_output = True
+    except asyncio.CancelledError:
+        if job_id in _LOST:
+            # Another owner has the job now; leave its record and files alone.
+            requeue = True
+        elif job_id not in _CANCELLED and (_SHUTTING_DOWN or job_id in _PREEMPTED):
+            # Back to the queue with its job dir, so finished segments survive
+            # a service restart as they do a preemption.
+            requeue = True
+            reason = (
+                "service restarted" if _SHUTTING_DOWN else "preempted by a higher-priority render"
+            )
+            STORE.requeue(job_id, error=reason)
+        else:
+            STORE.finish(job_id, status="cancelled")
+            raise
     except Exception as exc:
-        _update_job(job_id, status="error", error=str(exc))
+        STORE.finish(job_id, status="error", error=str(exc))
+    finally:
+        _TASKS.pop(job_id, None)
+        _CLAIMED.pop(job_id, None)
+        _PREEMPTED.discard(job_id)
+        _CANCELLED.discard(job_id)
+        ADMISSION.finish(job_id)
+        if job_id in _LOST:
+            _LOST.discard(job_id)
+        elif requeue:
+            config.output.unlink(missing_ok=True)
+        else:
+            cleanup_job_files(job_id, config, keep_output=keep_output)
+        _schedule()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -245,7 +265,7 @@ def index(
         {
             "templates": sorted(TEMPLATES.keys()),
             "default_template": DEFAULT_TEMPLATE,
-            "jobs": _jobs_snapshot(),
+            "jobs": STORE.recent(),
             "default_multi_dir": "/tmp/envisaged-compare-src",
             "default_multi_repos": default_multi_repos,
             "message": message,
@@ -256,14 +276,159 @@ def index(
 @app.get("/api/github-search", response_class=JSONResponse)
 def github_search(q: str = Query(min_length=2, max_length=100)) -> JSONResponse:
     try:
-        results = _search_github_repos(q)
-        return JSONResponse({"ok": True, "results": results})
+        results, source = GITHUB_SEARCH.search(q)
+        return JSONResponse({"ok": True, "results": results, "source": source})
     except Exception as exc:
         return JSONResponse({"ok": False, "error": str(exc), "results": []}, status_code=502)
 
 
-@app.post("/render")
-def create_render(
+@app.get("/api/jobs", response_class=JSONResponse)
+def list_jobs() -> JSONResponse:
+    return JSONResponse({"ok": True, "jobs": [job.__dict__ for job in STORE.recent()]})
+
+
+def _check_worker_token(request: Request) -> None:
+    if not WORKER_TOKEN:
+        raise HTTPException(status_code=404, detail="Remote workers are not enabled")
+    given = request.headers.get("authorization", "")
+    if not hmac.compare_digest(given.encode("utf-8"), f"Bearer {WORKER_TOKEN}".encode()):
+        raise HTTPException(status_code=403, detail="Invalid worker token")
+
+
+@app.post("/api/worker/claim", response_class=JSONResponse)
+def worker_claim(request: Request, body: WorkerLease) -> JSONResponse:
+    _check_worker_token(request)
+    claimed = STORE.claim(body.owner, body.lease, job_id=body.job_id)
+    return JSONResponse({"ok": True, "claim": encode_claim(claimed) if claimed else None})
+
+
+@app.post("/api/worker/queued", response_class=JSONResponse)
+def worker_queued(request: Request, body: WorkerPeek) -> JSONResponse:
+    _check_worker_token(request)
+    jobs = [encode_claim(claimed) for claimed in STORE.queued(min(body.limit, 50))]
+    return JSONResponse({"ok": True, "jobs": jobs})
+
+
+@app.post("/api/worker/jobs/{job_id}/heartbeat", response_class=JSONResponse)
+def worker_heartbeat(request: Request, job_id: str, body: WorkerLease) -> JSONResponse:
+    _check_worker_token(request)
+    held = STORE.heartbeat(job_id, body.owner, body.lease)
+    cancel = bool(STORE.cancel_requested([job_id]))
+    return JSONResponse({"ok": True, "held": held, "cancel": cancel})
+
+
+@app.post("/api/worker/jobs/{job_id}/status", response_class=JSONResponse)
+def worker_status(request: Request, job_id: str, body: WorkerStatus) -> JSONResponse:
+    _check_worker_token(request)
+    if body.action == "requeue":
+        STORE.requeue(job_id, error=body.error)
+    elif body.action == "finish":
+        STORE.finish(job_id, status=body.status, error=body.error)
+    else:
+        STORE.update(job_id, status=body.status, error=body.error)
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/worker/jobs/{job_id}/config", response_class=JSONResponse)
+def worker_config(request: Request, job_id: str, body: WorkerConfig) -> JSONResponse:
+    _check_worker_token(request)
+    STORE.set_config(job_id, decode_config(body.config))
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/worker/loads", response_class=JSONResponse)
+def worker_loads(request: Request, body: WorkerHost) -> JSONResponse:
+    _check_worker_token(request)
+    return JSONResponse(
+        {"ok": True, "loads": [asdict(load) for load in STORE.host_load(body.host)]}
+    )
+
+
+@app.post("/api/worker/jobs/{job_id}/load", response_class=JSONResponse)
+def worker_load(request: Request, job_id: str, body: WorkerLoad) -> JSONResponse:
+    _check_worker_token(request)
+    if body.clear:
+        STORE.clear_load(job_id, body.owner)
+    else:
+        STORE.set_load(
+            HostLoad(
+                job_id=job_id,
+                owner=body.owner,
+                host=body.host,
+                cores=body.cores,
+                memory_mb=body.memory_mb,
+                cpus=tuple(body.cpus),
+            )
+        )
+    return JSONResponse({"ok": True})
+
+
+@app.put("/api/worker/outputs/{output_name}", response_class=JSONResponse)
+async def worker_upload(request: Request, output_name: str) -> JSONResponse:
+    _check_worker_token(request)
+    if Path(output_name).name != output_name or not output_name.endswith(".mp4"):
+        raise HTTPException(status_code=400, detail=f"Invalid output name: {output_name}")
+    # Streamed to a hidden file and renamed, so /videos never serves a partial MP4.
+    partial = WEB_OUTPUT_DIR / f".{output_name}.part"
+    try:
+        with partial.open("wb") as fh:
+            async for chunk in request.stream():
+                # Off the event loop, so a large upload does not stall the scheduler.
+                await asyncio.to_thread(fh.write, chunk)
+        os.replace(partial, WEB_OUTPUT_DIR / output_name)
+    except BaseException:
+        # A dropped connection or a cancelled request leaves no partial file behind.
+        partial.unlink(missing_ok=True)
+        raise
+    return JSONResponse({"ok": True})
+
+
+@app.post("/api/jobs/{job_id}/cancel", response_class=JSONResponse)
+async def cancel_job(job_id: str) -> JSONResponse:
+    task = _TASKS.get(job_id)
+    if task is not None:
+        _CANCELLED.add(job_id)
+        task.cancel()
+        # Wait for the supervisor to tear down the process chain before replying.
+        await asyncio.wait([task])
+        return JSONResponse({"ok": True, "status": "cancelled"})
+
+    config = STORE.cancel_queued(job_id)
+    if config is not None:
+        cleanup_job_files(job_id, config, keep_output=False)
+        return JSONResponse({"ok": True, "status": "cancelled"})
+
+    # Running in another process: its poller sees the flag and stops the job.
+    if STORE.request_cancel(job_id):
+        return JSONResponse({"ok": True, "status": "cancelling"})
+
+    return JSONResponse(
+        {"ok": False, "error": f"Job is not queued or running: {job_id}"}, status_code=404
+    )
+
+
+@dataclass
+class RenderForm:
+    mode: str
+    repo: str
+    multi_dir: str
+    multi_repos: str
+    title: str
+    template: str
+    resolution: OutputResolution
+    fps: int
+    sync_timing: SyncMode
+    legend: LegendMode
+    legend_limit: int
+    target_duration: float
+    segments: int
+    priority: JobPriority
+    system_log: SystemLogSource
+    system_log_since: str
+    system_log_limit: int
+
+
+def render_form(
     mode: str = Form("single"),
     repo: str = Form("."),
     multi_dir: str = Form("/tmp/envisaged-compare-src"),
@@ -275,75 +440,143 @@ def create_render(
     sync_timing: SyncMode = Form("auto"),
     legend: LegendMode = Form("auto"),
     legend_limit: int = Form(8),
+    target_duration: float = Form(0),
+    segments: int = Form(1),
+    priority: JobPriority = Form("normal"),
     system_log: SystemLogSource = Form("journal"),
     system_log_since: str = Form("24 hours ago"),
     system_log_limit: int = Form(5000),
-) -> RedirectResponse:
+) -> RenderForm:
+    return RenderForm(
+        mode=mode,
+        repo=repo,
+        multi_dir=multi_dir,
+        multi_repos=multi_repos,
+        title=title,
+        template=template,
+        resolution=resolution,
+        fps=fps,
+        sync_timing=sync_timing,
+        legend=legend,
+        legend_limit=legend_limit,
+        target_duration=target_duration,
+        segments=segments,
+        priority=priority,
+        system_log=system_log,
+        system_log_since=system_log_since,
+        system_log_limit=system_log_limit,
+    )
+
+
+def _form_config(form: RenderForm, job_id: str, output_path: Path) -> RenderConfig:
+    if form.mode not in {"single", "multi", "system"}:
+        raise ValueError(f"Unsupported mode: {form.mode}")
+    if form.mode == "single" and not form.repo.strip():
+        raise ValueError("Empty repository entry")
+    if not 1 <= form.segments <= MAX_RENDER_SEGMENTS:
+        raise ValueError(f"Segments must be between 1 and {MAX_RENDER_SEGMENTS}")
+
+    return RenderConfig(
+        output=output_path,
+        resolution=form.resolution,
+        fps=form.fps,
+        title=form.title,
+        template=form.template,
+        logo=None,
+        multi_dir=None,
+        input_repo=None,
+        system_log=form.system_log if form.mode == "system" else None,
+        system_log_since=form.system_log_since,
+        system_log_limit=form.system_log_limit,
+        sync_timing=form.sync_timing,
+        sync_span=31536000,
+        legend=form.legend,
+        legend_limit=form.legend_limit,
+        seconds_per_day=DEFAULT_SECONDS_PER_DAY,
+        time_scale=DEFAULT_TIME_SCALE,
+        user_scale=1.35,
+        auto_skip=DEFAULT_AUTO_SKIP,
+        crf=22,
+        preset="medium",
+        target_duration=form.target_duration if form.target_duration > 0 else None,
+        segments=form.segments,
+        job_dir=RENDER_JOBS_DIR / f"web-{job_id}",
+    )
+
+
+def _form_source(form: RenderForm) -> RepoSource | None:
+    if form.mode == "system":
+        return None
+    return RepoSource(
+        mode=form.mode, repo=form.repo, multi_repos=form.multi_repos, multi_dir=form.multi_dir
+    )
+
+
+def _plan_job(job_id: str, config: RenderConfig, source: RepoSource | None) -> RenderPlan:
+    try:
+        if source is not None:
+            config = acquire_source(job_id, source, config)
+        # A fresh model picks up calibration written by other processes.
+        return plan_render(config, source=source, model=CostModel())
+    finally:
+        cleanup_job_files(job_id, config, keep_output=False)
+
+
+@app.post("/api/estimate", response_class=JSONResponse)
+async def estimate_render(form: RenderForm = Depends(render_form)) -> JSONResponse:
+    job_id = f"plan-{uuid4().hex[:8]}"
+    try:
+        cfg = _form_config(form, job_id, WEB_OUTPUT_DIR / f"{job_id}.mp4")
+        plan = await asyncio.to_thread(_plan_job, job_id, cfg, _form_source(form))
+    except Exception as exc:
+        return JSONResponse({"ok": False, "error": str(exc)}, status_code=400)
+    return JSONResponse(
+        {"ok": True, "plan": plan.as_dict(), "max_render_seconds": MAX_RENDER_SECONDS or None}
+    )
+
+
+@app.post("/render")
+async def create_render(form: RenderForm = Depends(render_form)) -> RedirectResponse:
     job_id = uuid4().hex[:8]
     output_name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{job_id}.mp4"
-    output_path = WEB_OUTPUT_DIR / output_name
+    repos_q = urllib.parse.quote(form.multi_repos)
 
     try:
-        repo_source = repo
-        multi_source: Path | None = None
-        system_source: SystemLogSource | None = None
-
-        if mode == "single":
-            repo_source = str(_resolve_repo_to_local(repo))
-        elif mode == "multi":
-            multi_source = _prepare_multi_repo_dir(job_id, multi_repos, multi_dir)
-        elif mode == "system":
-            system_source = system_log
-        else:
-            raise ValueError(f"Unsupported mode: {mode}")
-
-        cfg = RenderConfig(
-            output=output_path,
-            resolution=resolution,
-            fps=fps,
-            title=title,
-            template=template,
-            logo=None,
-            multi_dir=multi_source if mode == "multi" else None,
-            input_repo=repo_source if mode == "single" else None,
-            system_log=system_source,
-            system_log_since=system_log_since,
-            system_log_limit=system_log_limit,
-            sync_timing=sync_timing,
-            sync_span=31536000,
-            legend=legend,
-            legend_limit=legend_limit,
-            seconds_per_day=0.12,
-            time_scale=1.6,
-            user_scale=1.35,
-            auto_skip=0.5,
-            crf=22,
-            preset="medium",
-        )
+        cfg = _form_config(form, job_id, WEB_OUTPUT_DIR / output_name)
+        # Cloning happens in the job itself so the request returns immediately.
+        source = _form_source(form)
+        if MAX_RENDER_SECONDS:
+            # Costed from the remembered log size of the source, if any.
+            cost = CostModel().estimate(cfg, source)
+            if cost.seconds > MAX_RENDER_SECONDS:
+                raise ValueError(
+                    f"estimated render time ~{cost.seconds:.0f}s exceeds the "
+                    f"{MAX_RENDER_SECONDS:.0f}s limit; lower the resolution or fps, "
+                    "or set a target duration"
+                )
     except Exception as exc:
         message = urllib.parse.quote(f"Error: {exc}")
-        repos_q = urllib.parse.quote(multi_repos)
         return RedirectResponse(
             url=f"/?message={message}&default_multi_repos={repos_q}",
             status_code=303,
         )
 
-    _add_job(
+    STORE.add(
         RenderJob(
             id=job_id,
-            title=title,
-            template=template,
-            status="running",
+            title=form.title,
+            template=form.template,
+            status="queued",
             output_name=output_name,
             created_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        )
+            priority=form.priority,
+        ),
+        cfg,
+        source,
     )
+    _schedule()
 
-    thread = threading.Thread(target=_render_in_background, args=(job_id, cfg), daemon=True)
-    thread.start()
-
-    message = urllib.parse.quote(f"Render started: {output_name}")
-    repos_q = urllib.parse.quote(multi_repos)
+    message = urllib.parse.quote(f"Render queued: {output_name} (job {job_id})")
     return RedirectResponse(
         url=f"/?message={message}&default_multi_repos={repos_q}",
         status_code=303,
@@ -351,4 +584,5 @@ def create_render(
 
 
 def main() -> None:
-    uvicorn.run("envisaged.web:app", host="0.0.0.0", port=8787, reload=False)
+    # Every worker process shares the job store, so the web tier can scale out.
+    uvicorn.run("envisaged.web:app", host="0.0.0.0", port=8787, reload=False, workers=WEB_WORKERS)
@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import shutil
+import signal
+import socket
+from collections.abc import Callable
+from dataclasses import replace
+from pathlib import Path
+from uuid import uuid4
+
+import typer
+
+from .cli import console, render_async
+from .costmodel import ADMISSION_LOOKAHEAD, Admission, Budget, CostModel
+from .jobstore import (
+    LEASE_SECONDS,
+    POLL_INTERVAL,
+    ClaimedJob,
+    HTTPJobStore,
+    SQLiteJobStore,
+    WorkerQueue,
+)
+from .paths import CACHE_DIR, RENDER_JOBS_DIR, WEB_JOBS_DB, WEB_OUTPUT_DIR
+from .sources import acquire_source, cleanup_job_files
+from .supervisor import Supervisor
+from .xvfb import DISPLAY_POOL
+
+# Renders are written here first and only moved into WEB_OUTPUT_DIR once
+# complete, so the web server never serves a partial MP4.
+WORKER_OUTPUT_DIR = CACHE_DIR / "worker-out"
+
+worker_app = typer.Typer(add_completion=False, rich_markup_mode="rich")
+
+
+def publish_output(local: Path, output_name: str, output_dir: Path = WEB_OUTPUT_DIR) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    target = output_dir / output_name
+    try:
+        os.replace(local, target)
+    except OSError:
+        # WEB_OUTPUT_DIR on another filesystem (e.g. a shared mount): copy next
+        # to the target, then rename into place.
+        partial = output_dir / f".{output_name}.part"
+        shutil.copyfile(local, partial)
+        os.replace(partial, target)
+        local.unlink(missing_ok=True)
+    return target
+
+
+class Worker:
+    """Claims queued web jobs from the shared store and renders them locally."""
+
+    def __init__(
+        self,
+        store: WorkerQueue,
+        *,
+        slots: int,
+        once: bool = False,
+        publish: Callable[[Path, str], object] = publish_output,
+        admission: Admission | None = None,
+    ) -> None:
+        self.store = store
+        self.owner = f"worker-{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:6]}"
+        self.admission = admission or Admission(
+            CostModel(), Budget.from_host(), slots=slots, ledger=store, owner=self.owner
+        )
+        self.publish = publish
+        self.slots = slots
+        self.once = once
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+        self._lost: set[str] = set()
+        self._draining = False
+
+    def drain(self) -> None:
+        # Stop claiming and hand running jobs back to the queue.
+        self._draining = True
+        for task in self._tasks.values():
+            task.cancel()
+
+    def _claim(self) -> None:
+        while not self._draining and len(self._tasks) < self.slots:
+            picked = self.admission.select(self.store.queued(ADMISSION_LOOKAHEAD))
+            if picked is None:
+                break
+            candidate, cost = picked
+            claimed = self.store.claim(self.owner, LEASE_SECONDS, job_id=candidate.job.id)
+            if claimed is None:
+                continue  # taken by another worker; look again
+            self.admission.start(claimed.job.id, cost)
+            console.print(f"[cyan]claimed[/cyan] {claimed.job.id} ({claimed.job.title})")
+            self._tasks[claimed.job.id] = asyncio.create_task(self._run(claimed))
+
+    def _tend(self) -> None:
+        for job_id, task in list(self._tasks.items()):
+            if not self.store.heartbeat(job_id, self.owner, LEASE_SECONDS):
+                self._lost.add(job_id)
+                task.cancel()
+        for job_id in self.store.cancel_requested(self._tasks):
+            self._tasks[job_id].cancel()
+
+    async def serve(self) -> None:
+        while True:
+            self._tend()
+            self.store.reap_expired()
+            self._claim()
+            if not self._tasks:
+                if self._draining or self.once:
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+                continue
+            await asyncio.wait(
+                list(self._tasks.values()),
+                timeout=POLL_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+
+    async def _run(self, claimed: ClaimedJob) -> None:
+        job = claimed.job
+        config = claimed.config
+        local = {
+            "output": WORKER_OUTPUT_DIR / job.output_name,
+            "variants": [],
+            "job_dir": RENDER_JOBS_DIR / f"web-{job.id}",
+        }
+        WORKER_OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        lost = requeued = False
+        try:
+            if claimed.source is not None:
+                supervisor = Supervisor(echo_stderr=False)
+                config = await supervisor.run_in_thread(
+                    acquire_source, job.id, claimed.source, config
+                )
+                # The stored config keeps the web service's output paths so
+                # whoever claims the job next still publishes to the same place.
+                self.store.set_config(job.id, config)
+            config = replace(config, **local)
+
+            def on_stage(stage: str) -> None:
+                self.store.update(job.id, status=stage)
+
+            self.admission.begin(job.id)
+            await render_async(
+                replace(config, cpus=self.admission.cpus(job.id)),
+                echo_stderr=False,
+                on_stage=on_stage,
+                on_logs=self.admission.on_logs(job.id, config, claimed.source),
+            )
+            self.admission.finish(job.id, config=config, source=claimed.source)
+            await asyncio.to_thread(self.publish, config.output, job.output_name)
+            self.store.finish(job.id, status="done")
+            console.print(f"[green]done[/green] {job.id} -> {job.output_name}")
+        except asyncio.CancelledError:
+            lost = job.id in self._lost
+            if lost:
+                console.print(f"[yellow]lease lost[/yellow] {job.id}")
+            elif self._draining:
+                requeued = True
+                self.store.requeue(job.id, error="worker stopped")
+            else:
+                self.store.finish(job.id, status="cancelled")
+        except Exception as exc:
+            console.print(f"[red]failed[/red] {job.id}: {exc}")
+            self.store.finish(job.id, status="error", error=str(exc))
+        finally:
+            self._tasks.pop(job.id, None)
+            self._lost.discard(job.id)
+            self.admission.finish(job.id)
+            if requeued:
+                # Keep the job dir: whoever claims it next on this host
+                # resumes from the finished segments.
+                (WORKER_OUTPUT_DIR / job.output_name).unlink(missing_ok=True)
+            elif not lost:
+                cleanup_job_files(job.id, replace(config, **local), keep_output=False)
+
+
+async def _serve(worker: Worker) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.drain)
+    try:
+        await worker.serve()
+    finally:
+        await asyncio.to_thread(DISPLAY_POOL.close)
+
+
+@worker_app.command()
+def worker(
+    slots: int = typer.Option(
+        int(os.environ.get("ENVISAGED_WORKER_SLOTS", "4")),
+        "--slots",
+        "-j",
+        help="Most renders to run at once; the cost model admits within the host budget",
+    ),
+    once: bool = typer.Option(False, "--once", help="Exit when the queue is empty"),
+    db: Path = typer.Option(WEB_JOBS_DB, "--db", help="Shared job store (SQLite)"),
+    server: str | None = typer.Option(
+        os.environ.get("ENVISAGED_WORKER_SERVER"),
+        "--server",
+        help="envisaged-web URL to pull jobs from instead of the SQLite store",
+    ),
+) -> None:
+    """Render jobs queued through envisaged-web.
+
+    Workers on the web host share its SQLite job store and move finished
+    videos into WEB_OUTPUT_DIR; workers on other hosts use --server and upload
+    them. Each job is leased and heartbeated; if a worker dies its jobs return
+    to the queue once the lease expires. SIGINT/SIGTERM re-queue the jobs in
+    flight and exit.
+    """
+    if slots < 1:
+        raise typer.BadParameter("--slots must be >= 1")
+    if server:
+        remote = HTTPJobStore(server, token=os.environ.get("ENVISAGED_WORKER_TOKEN", ""))
+        runner = Worker(remote, slots=slots, once=once, publish=remote.upload_output)
+    else:
+        runner = Worker(SQLiteJobStore(db), slots=slots, once=once)
+    console.print(f"[bold]{runner.owner}[/bold] serving {server or db} with {slots} slot(s)")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(_serve(runner))
+
+
+def main() -> None:
+    worker_app()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import atexit
+import contextlib
+import os
+import select
+import signal
+import socket
+import subprocess
+import threading
+import time
+from collections.abc import AsyncIterator
+
+XVFB_START_TIMEOUT = 15.0
+POOL_SIZE_PER_SCREEN = int(os.environ.get("ENVISAGED_XVFB_POOL_SIZE", "2"))
+POOL_IDLE_TIMEOUT = float(os.environ.get("ENVISAGED_XVFB_IDLE_TIMEOUT", "600"))
+POOL_HEALTH_INTERVAL = 10.0
+
+
+class XvfbError(RuntimeError):
+    pass
+
+
+class XvfbDisplay:
+    def __init__(self, width: int, height: int, depth: int = 24) -> None:
+        self.width = width
+        self.height = height
+        self.depth = depth
+        self.number: int | None = None
+        self.proc: subprocess.Popen[bytes] | None = None
+
+    @property
+    def display(self) -> str:
+        if self.number is None:
+            raise XvfbError("Xvfb display is not running")
+        return f":{self.number}"
+
+    def env(self) -> dict[str, str]:
+        return {"DISPLAY": self.display, "SDL_VIDEODRIVER": "x11"}
+
+    def start(self, timeout: float = XVFB_START_TIMEOUT) -> None:
+        # -displayfd lets Xvfb pick a free display and report it once it accepts
+        # connections, replacing xvfb-run's lock-file scan and sleep loop.
+        read_fd, write_fd = os.pipe()
+        try:
+            self.proc = subprocess.Popen(
+                [
+                    "Xvfb",
+                    "-displayfd",
+                    str(write_fd),
+                    "-screen",
+                    "0",
+                    f"{self.width}x{self.height}x{self.depth}",
+                    "-nolisten",
+                    "tcp",
+                    "-noreset",
+                ],
+                pass_fds=(write_fd,),
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        finally:
+            os.close(write_fd)
+
+        try:
+            self.number = _read_display_number(read_fd, self.proc, timeout)
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            os.close(read_fd)
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def healthy(self) -> bool:
+        if not self.alive() or self.number is None:
+            return False
+        # Connecting to the X socket is enough to prove the server is accepting
+        # clients without pulling in xdpyinfo.
+        sock_path = f"/tmp/.X11-unix/X{self.number}"
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(1.0)
+                sock.connect(sock_path)
+        except OSError:
+            return False
+        return True
+
+    def stop(self) -> None:
+        proc = self.proc
+        self.proc = None
+        self.number = None
+        if proc is None:
+            return
+        with contextlib.suppress(ProcessLookupError, PermissionError):
+            os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            with contextlib.suppress(ProcessLookupError, PermissionError):
+                os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+
+def _read_display_number(fd: int, proc: subprocess.Popen[bytes], timeout: float) -> int:
+    deadline = time.monotonic() + timeout
+    buf = b""
+    while not buf.endswith(b"\n"):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise XvfbError("Timed out waiting for Xvfb to start")
+        ready, _, _ = select.select([fd], [], [], min(remaining, 0.25))
+        if not ready:
+            if proc.poll() is not None:
+                raise XvfbError(f"Xvfb exited during startup (status {proc.returncode})")
+            continue
+        chunk = os.read(fd, 64)
+        if not chunk:
+            raise XvfbError(f"Xvfb exited during startup (status {proc.poll()})")
+        buf += chunk
+    return int(buf.strip())
+
+
+class DisplayPool:
+    """Long-lived Xvfb servers keyed by screen size, leased out per render."""
+
+    def __init__(
+        self,
+        *,
+        size_per_screen: int = POOL_SIZE_PER_SCREEN,
+        idle_timeout: float = POOL_IDLE_TIMEOUT,
+        health_interval: float = POOL_HEALTH_INTERVAL,
+    ) -> None:
+        self.size_per_screen = size_per_screen
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self._idle: dict[tuple[int, int], list[tuple[XvfbDisplay, float]]] = {}
+        self._leased: set[XvfbDisplay] = set()
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._monitor: threading.Thread | None = None
+
+    def acquire(self, width: int, height: int) -> XvfbDisplay:
+        self._ensure_monitor()
+        key = (width, height)
+        while True:
+            with self._lock:
+                idle = self._idle.get(key, [])
+                display = idle.pop()[0] if idle else None
+                if display is not None:
+                    self._leased.add(display)
+            if display is None:
+                break
+            if display.healthy():
+                return display
+            with self._lock:
+                self._leased.discard(display)
+            display.stop()
+
+        display = XvfbDisplay(width, height)
+        display.start()
+        with self._lock:
+            self._leased.add(display)
+        return display
+
+    def release(self, display: XvfbDisplay) -> None:
+        with self._lock:
+            self._leased.discard(display)
+            key = (display.width, display.height)
+            idle = self._idle.setdefault(key, [])
+            keep = (
+                not self._closed.is_set() and len(idle) < self.size_per_screen and display.alive()
+            )
+            if keep:
+                idle.append((display, time.monotonic()))
+        if not keep:
+            display.stop()
+
+    def warm(self, width: int, height: int, count: int = 1) -> None:
+        started = [self.acquire(width, height) for _ in range(count)]
+        for display in started:
+            self.release(display)
+
+    def close(self) -> None:
+        self._closed.set()
+        with self._lock:
+            displays = [d for idle in self._idle.values() for d, _ in idle]
+            displays += list(self._leased)
+            self._idle.clear()
+            self._leased.clear()
+        for display in displays:
+            display.stop()
+
+    @contextlib.asynccontextmanager
+    async def lease(self, width: int, height: int) -> AsyncIterator[XvfbDisplay]:
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire, width, height))
+        try:
+            display = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The worker thread keeps starting Xvfb; hand the display back once it lands.
+            acquiring.add_done_callback(self._release_abandoned)
+            raise
+        try:
+            yield display
+        finally:
+            await asyncio.to_thread(self.release, display)
+
+    def _release_abandoned(self, acquiring: asyncio.Future[XvfbDisplay]) -> None:
+        if acquiring.cancelled() or acquiring.exception() is not None:
+            return
+        threading.Thread(
+            target=self.release, args=(acquiring.result(),), name="xvfb-pool-release", daemon=True
+        ).start()
+
+    def _ensure_monitor(self) -> None:
+        with self._lock:
+            if self._monitor is not None or self._closed.is_set():
+                return
+            self._monitor = threading.Thread(
+                target=self._watch, name="xvfb-pool-monitor", daemon=True
+            )
+            self._monitor.start()
+
+    def _watch(self) -> None:
+        while not self._closed.wait(self.health_interval):
+            self._check_idle()
+
+    def _check_idle(self) -> None:
+        now = time.monotonic()
+        expired: list[XvfbDisplay] = []
+        broken: list[tuple[int, int]] = []
+        with self._lock:
+            for key, idle in self._idle.items():
+                keep: list[tuple[XvfbDisplay, float]] = []
+                for display, since in idle:
+                    if now - since > self.idle_timeout:
+                        expired.append(display)
+                    elif not display.alive():
+                        expired.append(display)
+                        broken.append(key)
+                    else:
+                        keep.append((display, since))
+                idle[:] = keep
+        for display in expired:
+            display.stop()
+        # Replace crashed servers so the next lease does not pay startup cost.
+        for width, height in broken:
+            with contextlib.suppress(XvfbError, OSError):
+                self.warm(width, height)
+
+
+DISPLAY_POOL = DisplayPool()
+atexit.register(DISPLAY_POOL.close)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from pathlib import Path
+
+# envisaged.paths resolves its cache directories at import time.
+os.environ.setdefault("ENVISAGED_CACHE_DIR", tempfile.mkdtemp(prefix="envisaged-tests-"))
+
+import pytest
+
+from envisaged.cli import RenderConfig
+
+
+@pytest.fixture
+def render_config(tmp_path: Path) -> RenderConfig:
+    return RenderConfig(
+        output=tmp_path / "out.mp4",
+        resolution="720p",
+        fps=30,
+        title="Test",
+        template="none",
+        logo=None,
+        multi_dir=None,
+        input_repo=".",
+        system_log=None,
+        system_log_since="24 hours ago",
+        system_log_limit=5000,
+        sync_timing="false",
+        sync_span=31536000,
+        legend="none",
+        legend_limit=8,
+        seconds_per_day=0.12,
+        time_scale=1.6,
+        user_scale=1.35,
+        auto_skip=0.5,
+        crf=22,
+        preset="medium",
+    )
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import pytest
+
+from envisaged.affinity import CoreAllocator, format_cpu_list, parse_cpu_list
+
+
+def test_parse_cpu_list_round_trips() -> None:
+    assert parse_cpu_list("0-3, 8,10-11") == (0, 1, 2, 3, 8, 10, 11)
+    assert format_cpu_list(parse_cpu_list("2,0-1")) == "0,1,2"
+
+
+@pytest.mark.parametrize("text", ["", "a", "3-1", "1-"])
+def test_parse_cpu_list_rejects_bad_entries(text: str) -> None:
+    with pytest.raises(ValueError):
+        parse_cpu_list(text)
+
+
+def test_allocate_hands_out_disjoint_shares() -> None:
+    cores = CoreAllocator(range(8), slots=4)
+
+    sets = [cores.allocate(key) for key in "abcd"]
+
+    assert all(len(cpus) == 2 for cpus in sets)
+    assert sorted(cpu for cpus in sets for cpu in cpus) == list(range(8))
+    assert cores.owned("b") == sets[1]
+
+
+def test_allocate_grows_to_the_wanted_size() -> None:
+    cores = CoreAllocator(range(8), slots=4)
+
+    assert cores.allocate("big", wanted=5) == (0, 1, 2, 3, 4)
+    assert cores.allocate("huge", wanted=20) == tuple(range(8))
+
+
+def test_allocate_avoids_busy_cores() -> None:
+    cores = CoreAllocator(range(8), slots=2)
+
+    assert cores.allocate("job", busy=[(0, 1, 2, 3)]) == (4, 5, 6, 7)
+
+
+def test_allocate_shares_least_loaded_cores_once_full() -> None:
+    cores = CoreAllocator(range(4), slots=2)
+    cores.allocate("a")
+    cores.allocate("b")
+
+    assert cores.allocate("c") == (0, 1)
+    assert cores.allocate("d") == (2, 3)
+
+
+def test_release_frees_the_set() -> None:
+    cores = CoreAllocator(range(4), slots=2)
+    first = cores.allocate("a")
+    cores.allocate("b")
+
+    cores.release("a")
+    cores.release("missing")
+
+    assert cores.owned("a") is None
+    assert cores.allocate("c") == first
+
+
+def test_allocate_again_replaces_the_keys_set() -> None:
+    cores = CoreAllocator(range(4), slots=2)
+    cores.allocate("a")
+
+    cores.allocate("a", wanted=4)
+    cores.release("a")
+
+    assert cores.allocate("b", wanted=4) == (0, 1, 2, 3)
+    assert cores.allocate("c") == (0, 1)
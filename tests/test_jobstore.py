@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from envisaged.cli import RenderConfig
+from envisaged.jobstore import JobPriority, RenderJob, SQLiteJobStore
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> SQLiteJobStore:
+    return SQLiteJobStore(tmp_path / "jobs.sqlite3")
+
+
+def add_job(
+    store: SQLiteJobStore, config: RenderConfig, job_id: str, priority: JobPriority = "normal"
+) -> None:
+    job = RenderJob(
+        id=job_id,
+        title=job_id,
+        template=config.template,
+        status="queued",
+        output_name=f"{job_id}.mp4",
+        created_at="2026-01-01 00:00:00",
+        priority=priority,
+    )
+    store.add(job, config, None)
+
+
+def test_claim_follows_priority_then_arrival(
+    store: SQLiteJobStore, render_config: RenderConfig
+) -> None:
+    add_job(store, render_config, "first")
+    add_job(store, render_config, "later", priority="background")
+    add_job(store, render_config, "preview", priority="preview")
+    add_job(store, render_config, "second")
+
+    claimed = [store.claim("w1", lease=60) for _ in range(4)]
+
+    assert [c.job.id for c in claimed if c is not None] == ["preview", "first", "second", "later"]
+    assert store.claim("w1", lease=60) is None
+
+
+def test_claim_takes_each_job_once(store: SQLiteJobStore, render_config: RenderConfig) -> None:
+    add_job(store, render_config, "only")
+
+    claimed = store.claim("w1", lease=60)
+
+    assert claimed is not None
+    assert claimed.job.status == "collecting logs"
+    assert claimed.config == render_config
+    assert store.claim("w2", lease=60) is None
+    assert store.claim("w2", lease=60, job_id="only") is None
+
+
+def test_claim_by_id_skips_the_queue_order(
+    store: SQLiteJobStore, render_config: RenderConfig
+) -> None:
+    add_job(store, render_config, "head")
+    add_job(store, render_config, "picked")
+
+    claimed = store.claim("w1", lease=60, job_id="picked")
+
+    assert claimed is not None and claimed.job.id == "picked"
+    assert [c.job.id for c in store.queued(10)] == ["head"]
+
+
+def test_heartbeat_only_extends_the_owners_lease(
+    store: SQLiteJobStore, render_config: RenderConfig
+) -> None:
+    add_job(store, render_config, "job")
+    store.claim("w1", lease=60)
+
+    assert store.heartbeat("job", "w1", lease=60)
+    assert not store.heartbeat("job", "w2", lease=60)
+
+
+def test_reap_expired_requeues_lost_jobs(
+    store: SQLiteJobStore, render_config: RenderConfig
+) -> None:
+    add_job(store, render_config, "lost")
+    add_job(store, render_config, "alive")
+    store.claim("w1", lease=-1)
+    store.claim("w2", lease=60)
+
+    assert store.reap_expired() == ["lost"]
+    assert store.reap_expired() == []
+    # The reaped job lost its owner, so that worker can no longer heartbeat it.
+    assert not store.heartbeat("lost", "w1", lease=60)
+
+    requeued = store.claim("w3", lease=60)
+    assert requeued is not None and requeued.job.id == "lost"
+    statuses = {job.id: (job.status, job.error) for job in store.recent()}
+    assert statuses["alive"] == ("collecting logs", None)
+
+
+def test_reap_expired_honours_pending_cancel(
+    store: SQLiteJobStore, render_config: RenderConfig
+) -> None:
+    add_job(store, render_config, "job")
+    store.claim("w1", lease=-1)
+    assert store.request_cancel("job")
+
+    assert store.reap_expired() == []
+    assert [(job.id, job.status) for job in store.recent()] == [("job", "cancelled")]
+    assert store.claim("w2", lease=60) is None
+
+
+def test_reaped_job_records_why(store: SQLiteJobStore, render_config: RenderConfig) -> None:
+    add_job(store, render_config, "job")
+    store.claim("w1", lease=-1)
+
+    store.reap_expired()
+
+    [job] = store.recent()
+    assert (job.status, job.error) == ("queued", "worker lease expired")
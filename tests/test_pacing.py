@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import pytest
+
+from envisaged.pacing import (
+    DAY_SECONDS,
+    MAX_TIME_SCALE,
+    MIN_TIME_SCALE,
+    LogTimeline,
+    estimate_duration,
+    tune_pacing,
+    within_tolerance,
+)
+
+
+def timeline(gaps: list[int]) -> LogTimeline:
+    return LogTimeline(
+        start=0,
+        end=sum(gaps),
+        events=len(gaps) + 1,
+        active_days=len(gaps),
+        gaps=tuple(sorted(gaps)),
+    )
+
+
+def test_tune_pacing_hits_the_target() -> None:
+    log = timeline([DAY_SECONDS] * 365)
+
+    pacing = tune_pacing(log, target_seconds=60)
+
+    assert within_tolerance(pacing, 60, 0.1)
+    assert MIN_TIME_SCALE <= pacing.time_scale <= MAX_TIME_SCALE
+    assert pacing.estimated_seconds == pytest.approx(
+        estimate_duration(
+            log,
+            seconds_per_day=pacing.seconds_per_day,
+            time_scale=pacing.time_scale,
+            auto_skip=pacing.auto_skip,
+        ),
+        rel=1e-3,
+    )
+
+
+def test_tune_pacing_widens_auto_skip_for_sparse_logs() -> None:
+    # Ten commits a year apart: with the default skip window the video could
+    # never be longer than ten skips.
+    log = timeline([365 * DAY_SECONDS] * 10)
+
+    pacing = tune_pacing(log, target_seconds=60, auto_skip=0.5)
+
+    assert pacing.auto_skip > 0.5
+    assert within_tolerance(pacing, 60, 0.1)
+
+
+def test_tune_pacing_reports_what_it_reached() -> None:
+    # One second of history cannot fill a minute at Gource's slowest pace.
+    log = timeline([1])
+
+    pacing = tune_pacing(log, target_seconds=60)
+
+    assert pacing.estimated_seconds < 60
+    assert not within_tolerance(pacing, 60, 0.1)
+
+
+def test_tune_pacing_rejects_empty_timelines() -> None:
+    with pytest.raises(ValueError):
+        tune_pacing(timeline([]), target_seconds=60)
+    with pytest.raises(ValueError):
+        tune_pacing(timeline([DAY_SECONDS]), target_seconds=0)
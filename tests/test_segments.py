@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from envisaged.binlog import BinaryLog
+from envisaged.logtable import LogTable
+from envisaged.pacing import DAY_SECONDS
+from envisaged.segments import (
+    MANIFEST_NAME,
+    Segment,
+    SegmentManifest,
+    plan_boundaries,
+    remove_job_files,
+    write_segment_logs,
+)
+
+
+def binlog(tmp_path: Path, rows: list[tuple[int, str, str, str]]) -> BinaryLog:
+    table = LogTable()
+    for row in rows:
+        table.append(*row)
+    return BinaryLog.write(tmp_path / "development.evlog", table)
+
+
+def daily(days: int, start: int = 0) -> list[tuple[int, str, str, str]]:
+    return [(start + day * DAY_SECONDS, "ann", "M", f"f{day}.py") for day in range(days)]
+
+
+def test_plan_boundaries_split_on_equal_video_time(tmp_path: Path) -> None:
+    log = binlog(tmp_path, daily(100))
+
+    boundaries = plan_boundaries(log, 4, seconds_per_day=1.0, time_scale=1.0, auto_skip=0)
+
+    assert boundaries == [0, 25 * DAY_SECONDS, 50 * DAY_SECONDS, 75 * DAY_SECONDS]
+
+
+def test_plan_boundaries_collapse_skipped_gaps(tmp_path: Path) -> None:
+    # A ten-year gap costs one auto-skip, so it does not swallow a segment.
+    rows = [*daily(10), *daily(10, start=3650 * DAY_SECONDS)]
+    log = binlog(tmp_path, rows)
+
+    boundaries = plan_boundaries(log, 2, seconds_per_day=1.0, time_scale=1.0, auto_skip=1.0)
+
+    assert boundaries == [0, 3650 * DAY_SECONDS]
+
+
+def test_plan_boundaries_single_segment(tmp_path: Path) -> None:
+    log = binlog(tmp_path, daily(5, start=DAY_SECONDS))
+
+    assert plan_boundaries(log, 1, seconds_per_day=1.0, time_scale=1.0, auto_skip=0) == [
+        DAY_SECONDS
+    ]
+
+
+def test_segment_logs_start_from_the_alive_tree(tmp_path: Path) -> None:
+    log = binlog(
+        tmp_path,
+        [
+            (10, "ann", "A", "keep.py"),
+            (11, "bob", "A", "gone.py"),
+            (12, "bob", "M", "keep.py"),
+            (13, "ann", "D", "gone.py"),
+            (20, "cid", "M", "new.py"),
+        ],
+    )
+
+    segments = write_segment_logs(log, [10, 20], tmp_path)
+
+    assert [(seg.start, seg.end) for seg in segments] == [(10, 13), (20, 20)]
+    lines = (tmp_path / segments[1].log).read_text(encoding="utf-8").splitlines()
+    assert lines == ["20|bob|A|keep.py", "20|cid|M|new.py"]
+
+
+def test_manifest_round_trip(tmp_path: Path) -> None:
+    manifest = SegmentManifest(
+        key="abc",
+        devlog="development.log",
+        repo_names=["one", "two"],
+        repo_logs=["repo-00.log", "repo-01.log"],
+        segments=[
+            Segment(index=0, start=0, end=9, log="seg-000.log", file="seg-000.mp4", done=True),
+            Segment(index=1, start=10, end=19, log="seg-001.log", file="seg-001.mp4"),
+        ],
+    )
+    (tmp_path / "seg-000.mp4").write_bytes(b"")
+
+    manifest.save(tmp_path)
+
+    assert SegmentManifest.load(tmp_path) == manifest
+    assert not (tmp_path / "manifest.tmp").exists()
+
+
+def test_manifest_forgets_segments_whose_file_is_gone(tmp_path: Path) -> None:
+    segment = Segment(index=0, start=0, end=9, log="seg-000.log", file="seg-000.mp4", done=True)
+    SegmentManifest(key="abc", devlog="development.log", segments=[segment]).save(tmp_path)
+
+    loaded = SegmentManifest.load(tmp_path)
+
+    assert loaded is not None
+    assert [seg.index for seg in loaded.pending()] == [0]
+
+
+def test_manifest_ignores_other_versions(tmp_path: Path) -> None:
+    (tmp_path / MANIFEST_NAME).write_text(
+        json.dumps({"key": "abc", "devlog": "development.log", "version": 0}), encoding="utf-8"
+    )
+
+    assert SegmentManifest.load(tmp_path) is None
+    assert SegmentManifest.load(tmp_path / "missing") is None
+
+
+def test_remove_job_files_leaves_foreign_files(tmp_path: Path) -> None:
+    job_dir = tmp_path / "job"
+    job_dir.mkdir()
+    for name in (MANIFEST_NAME, "seg-000.log", "seg-000.mp4", "repo-00.log", "notes.txt"):
+        (job_dir / name).write_text("", encoding="utf-8")
+
+    remove_job_files(job_dir)
+
+    assert [path.name for path in job_dir.iterdir()] == ["notes.txt"]
+    (job_dir / "notes.txt").unlink()
+    remove_job_files(job_dir)
+    assert not job_dir.exists()